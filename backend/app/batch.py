@@ -0,0 +1,214 @@
+import os
+import json
+import asyncio
+from app.executor import run_io
+from app.llm import get_llm
+from app.cache import resolve_short_link, canonicalize_url, url_key, text_key, lookup_many
+from app.core import (
+    GEMINI_INLINE_MAX_BYTES,
+    IMAGE_RULES,
+    analyze_video_logic,
+    analyze_text_logic,
+    prepare_image,
+    finish_image,
+    ask_gemini_image,
+    image_part,
+    image_evidence,
+    packed_answers,
+    text_error
+)
+
+# largest batch one request may submit
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 100))
+# how many images share one Gemini generate_content call (texts are packed by core.text_batcher)
+BATCH_PACK_IMAGES = int(os.getenv("BATCH_PACK_IMAGES", 8))
+
+BATCH_IMAGE_PROMPT = f"""
+    You are a Digital Forensics Expert. You will receive several IMAGES. Each one is preceded
+    by a line "[IMAGE <id>]" and its own hard evidence. Judge EACH image independently,
+    never let one image influence another.
+    {IMAGE_RULES}
+    Return a JSON array ONLY, one object per image:
+    [
+        {{
+            "id": "<id from the [IMAGE <id>] line>",
+            "thinking_process": "Reasoning...",
+            "ai_probability": int (0-100),
+            "verdict": "Real" | "Fake" | "Uncertain",
+            "forensics": {{ "visual_anomalies": [] }}
+        }}
+    ]
+    """
+
+def item_kind(item: dict):
+    # same field names as POST /jobs: url = video, image_url = image
+    if item.get("url"):
+        return "video"
+    if item.get("image_url"):
+        return "image"
+    if item.get("text"):
+        return "text"
+    return None
+
+async def item_key(item: dict, kind: str):
+    if kind == "text":
+        return "text", text_key(item["text"])
+    url = item["url"] if kind == "video" else item["image_url"]
+    canonical_url = canonicalize_url(await run_io(resolve_short_link, url))
+    return "url", url_key(kind, canonical_url)
+
+class Batch:
+    """
+    One POST /analyze/batch. Items are deduplicated by cache key, looked up with a single
+    MGET, and the misses analyzed concurrently; images that need Gemini are packed several
+    to a call (texts get the same from the text micro-batcher). Finished items are put on a queue that the NDJSON response drains,
+    so each line goes out as soon as its item is done.
+    """
+    def __init__(self, items: list):
+        self.items = items
+        self.queue = asyncio.Queue()
+        self.tasks = []
+        self.done = set()
+
+    def emit(self, indices: list, kind: str, result: dict):
+        for i in indices:
+            if i in self.done:
+                continue
+            self.done.add(i)
+            self.queue.put_nowait({
+                "index": i,
+                "id": self.items[i].get("id") or str(i),
+                "type": kind,
+                "result": result
+            })
+
+    def spawn(self, indices: list, kind: str, coro):
+        async def guarded():
+            try:
+                await coro
+            except Exception as e:
+                # anything the item code didn't catch still owes the client a line per item
+                print(f"Batch {kind} error: {e}")
+                self.emit(indices, kind, text_error(e) if kind == "text" else {"verdict": "Error", "error": str(e)})
+        self.tasks.append(asyncio.create_task(guarded()))
+
+    async def run(self):
+        try:
+            await self.dispatch()
+        except Exception as e:
+            print(f"Batch error: {e}")
+            self.emit(range(len(self.items)), "batch", {"verdict": "Error", "error": str(e)})
+
+    async def dispatch(self):
+        kinds = [item_kind(item) for item in self.items]
+        for i, kind in enumerate(kinds):
+            if kind is None:
+                self.emit([i], "invalid", {"verdict": "Error", "error": "Please provide 'url', 'image_url' or 'text'"})
+
+        valid = [i for i, kind in enumerate(kinds) if kind]
+        keys = await asyncio.gather(*(item_key(self.items[i], kinds[i]) for i in valid))
+
+        # the same post shows up more than once in a feed -> analyze it once
+        groups = {}
+        for i, key in zip(valid, keys):
+            groups.setdefault(key, []).append(i)
+
+        # level 1 cache for the whole batch in one round-trip; video and text misses go
+        # through analyze_*_logic, whose own lookup counts them, images are counted here
+        hits = await run_io(lookup_many, [(level, [key], kinds[indices[0]] == "image") for (level, key), indices in groups.items()])
+        misses = {"video": [], "image": [], "text": []}
+        for (level, key), indices, hit in zip(groups, groups.values(), hits):
+            kind = kinds[indices[0]]
+            if hit:
+                self.emit(indices, kind, hit)
+            else:
+                misses[kind].append((key, indices))
+        print(f"Batch: {len(self.items)} items, {len(groups)} unique, {sum(h is not None for h in hits)} cached")
+
+        for key, indices in misses["video"]:
+            # videos need their own upload and prompt, nothing to pack
+            self.spawn(indices, "video", self.video(indices))
+        if misses["image"]:
+            self.spawn([i for _, indices in misses["image"] for i in indices], "image", self.images(misses["image"]))
+        for key, indices in misses["text"]:
+            # concurrent texts are packed into shared calls by core.text_batcher
+            self.spawn(indices, "text", self.text(indices))
+
+    async def video(self, indices: list):
+        self.emit(indices, "video", await analyze_video_logic(self.items[indices[0]]["url"]))
+
+    async def text(self, indices: list):
+        self.emit(indices, "text", await analyze_text_logic(self.items[indices[0]]["text"]))
+
+    # ---- images ----
+    async def images(self, groups: list):
+        """
+        Forensics for every image in parallel; the ones that still need Gemini are packed
+        (by count and inline bytes) as they become ready.
+        """
+        async def prepare(key, indices):
+            try:
+                return key, indices, await prepare_image(self.items[indices[0]]["image_url"], [key])
+            except Exception as e:
+                print(f"Batch image error: {e}")
+                return key, indices, {"cached": {"verdict": "Error", "error": str(e)}}
+
+        pack, pack_bytes = [], 0
+        for ready in asyncio.as_completed([prepare(key, indices) for key, indices in groups]):
+            key, indices, state = await ready
+            if "cached" in state:
+                self.emit(indices, "image", state["cached"])
+            elif state["local_verdict"]:
+                self.emit(indices, "image", await finish_image(state, dict(state["local_verdict"])))
+            elif len(state["data"]) > GEMINI_INLINE_MAX_BYTES:
+                # too big to ride inline, goes through the Files API alone
+                self.spawn(indices, "image", self.single_image(indices, state))
+            else:
+                if pack and (len(pack) >= BATCH_PACK_IMAGES or pack_bytes + len(state["data"]) > GEMINI_INLINE_MAX_BYTES):
+                    self.spawn([i for _, idx in pack for i in idx], "image", self.image_pack(pack))
+                    pack, pack_bytes = [], 0
+                pack.append((indices, state))
+                pack_bytes += len(state["data"])
+        if pack:
+            self.spawn([i for _, idx in pack for i in idx], "image", self.image_pack(pack))
+
+    async def single_image(self, indices: list, state: dict):
+        self.emit(indices, "image", await finish_image(state, await ask_gemini_image(state)))
+
+    async def image_pack(self, pack: list):
+        if len(pack) == 1:
+            return await self.single_image(*pack[0])
+
+        contents = [BATCH_IMAGE_PROMPT]
+        for n, (_, state) in enumerate(pack):
+            contents.append(f"[IMAGE {n}]\n[HARD EVIDENCE]:\n    {image_evidence(state['metadata'], state['ela'])}")
+            contents.append(image_part(state))
+
+        print(f"Running Gemini Vision on {len(pack)} packed images...")
+        try:
+            answers = packed_answers(await get_llm().generate(contents))
+        except Exception as e:
+            print(f"Packed image call failed: {e}")
+            answers = {}
+
+        for n, (indices, state) in enumerate(pack):
+            if (result := answers.get(str(n))) is not None:
+                self.emit(indices, "image", await finish_image(state, result))
+            else:
+                # dropped from the answer: fall back to the single-image prompt
+                self.spawn(indices, "image", self.single_image(indices, state))
+
+async def stream_batch(items: list):
+    """
+    NDJSON lines ({"index", "id", "type", "result"}) in completion order.
+    Closing the generator (client went away) cancels whatever is still running.
+    """
+    batch = Batch(items)
+    runner = asyncio.create_task(batch.run())
+    try:
+        for _ in range(len(items)):
+            line = await batch.queue.get()
+            yield json.dumps(line) + "\n"
+    finally:
+        for task in [runner, *batch.tasks]:
+            task.cancel()
@@ -0,0 +1,228 @@
+import os
+import json
+import hashlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from app.http_client import get_session
+from app.timings import timed
+from app.telemetry import count_cache, count_fast_path
+
+CACHE_TTL = int(os.getenv("CACHE_TTL", 86400))
+
+# init redis
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+try:
+    import redis
+    cache = redis.from_url(redis_url, decode_responses=True)
+    cache.ping()
+    print("Connected to Real Redis")
+except:
+    print("Using Fake Redis (In-Memory)")
+    from fakeredis import FakeRedis
+    cache = FakeRedis(decode_responses=True)
+
+# query params that never change which media a link points to, on the platforms we know;
+# anywhere else a param like `s` or `t` may well pick the content, so those are kept
+PLATFORM_TRACKING_PARAMS = {
+    "youtube.com": {"si", "feature", "pp", "ab_channel", "embeds_referring_euri", "t", "hl", "vl"},
+    "tiktok.com": {"is_from_webapp", "sender_device", "sender_web_id", "is_copy_url", "refer", "_r", "_t", "lang"},
+    "instagram.com": {"igshid", "igsh", "hl"},
+    "x.com": {"s", "t", "ref_src", "ref_url"},
+    "facebook.com": {"mibextid", "rdid", "ref", "sfnsn"},
+}
+# campaign / click trackers that get appended to any link (plus every utm_*)
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_eid"}
+
+# hosts that are just different names for the same site
+HOST_ALIASES = {
+    "twitter.com": "x.com",
+    "mobile.twitter.com": "x.com",
+    "m.youtube.com": "youtube.com",
+    "music.youtube.com": "youtube.com",
+    "m.facebook.com": "facebook.com",
+}
+
+# redirectors we have to follow to find the real link
+SHORT_LINK_HOSTS = {"t.co", "bit.ly", "tinyurl.com", "vm.tiktok.com", "vt.tiktok.com", "fb.watch", "ow.ly", "buff.ly"}
+
+def _normalize_host(host: str) -> str:
+    host = host.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return HOST_ALIASES.get(host, host)
+
+def resolve_short_link(url: str) -> str:
+    """
+    Follows redirects for known link shorteners (t.co, bit.ly, ...). Blocking, run it in the IO pool.
+    Returns the original URL if the shortener can't be reached.
+    """
+    if _normalize_host(urlsplit(url).hostname or "") not in SHORT_LINK_HOSTS:
+        return url
+    try:
+        response = get_session().head(url, allow_redirects=True, timeout=5)
+        return response.url or url
+    except Exception:
+        return url
+
+def _platform(host: str):
+    return next((p for p in PLATFORM_TRACKING_PARAMS if host == p or host.endswith("." + p)), None)
+
+def canonicalize_url(url: str) -> str:
+    """
+    Strips tracking params and cosmetic differences so the same post shares one cache key.
+    youtu.be/<id> and /shorts/<id> both become youtube.com/watch?v=<id>.
+    Only the known platforms get their own params stripped, the trailing slash dropped and
+    https forced; other URLs (image CDNs, ...) just lose utm_* style trackers.
+    """
+    parts = urlsplit(url.strip())
+    host = _normalize_host(parts.hostname or "")
+    platform = _platform(host) or ("youtube.com" if host == "youtu.be" else None)
+    stripped = PLATFORM_TRACKING_PARAMS.get(platform, set()) | TRACKING_PARAMS
+    path = (parts.path.rstrip("/") or "/") if platform else (parts.path or "/")
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in stripped and not k.lower().startswith("utm_")
+    ]
+
+    if host == "youtu.be" and path != "/":
+        host, query, path = "youtube.com", [("v", path.lstrip("/"))] + query, "/watch"
+    elif host == "youtube.com" and path.startswith("/shorts/"):
+        query, path = [("v", path.split("/")[2])] + query, "/watch"
+
+    scheme = "https" if platform else (parts.scheme.lower() or "https")
+    netloc = host if not parts.port else f"{host}:{parts.port}"
+    return urlunsplit((scheme, netloc, path, urlencode(sorted(query)), ""))
+
+def platform_key(info: dict):
+    """
+    yt-dlp knows the platform's own id for the video, which survives any URL variation.
+    The generic extractor just makes an id up from the URL, so it's no use as a key.
+    """
+    extractor = info.get("extractor_key")
+    if not extractor or extractor == "Generic" or not info.get("id"):
+        return None
+    return f"video:{extractor}:{info['id']}"
+
+def url_key(kind: str, canonical_url: str) -> str:
+    return f"url:{kind}:{hashlib.md5(canonical_url.encode()).hexdigest()}"
+
+def text_key(text: str) -> str:
+    # whitespace-only differences are the same text
+    normalized = " ".join(text.split())
+    return f"text:{hashlib.md5(normalized.encode()).hexdigest()}"
+
+def content_keys(kind: str, fingerprint: dict) -> list:
+    """
+    Level 2 keys: exact bytes first, then the perceptual fingerprint (survives re-muxing/re-encoding).
+    """
+    keys = [f"content:{fingerprint['digest']}"]
+    if fingerprint.get("dhash"):
+        keys.append(f"perceptual:{kind}:{fingerprint['dhash']}")
+    return keys
+
+def content_key(keys: list):
+    """
+    The exact-bytes key out of a request's key list (where the full result is stored).
+    """
+    return next((k for k in keys if k and k.startswith("content:")), None)
+
+def lookup(level: str, keys: list):
+    """
+    Checks every key in one MGET, records a hit/miss for the level and returns the first hit.
+    """
+    keys = [k for k in keys if k]
+    with timed("cache", level):
+        cached = next((value for value in cache.mget(keys) if value), None) if keys else None
+    record_cache(level, cached is not None)
+    return json.loads(cached) if cached else None
+
+def lookup_many(requests: list) -> list:
+    """
+    lookup() for a whole batch in a single MGET. Takes (level, keys, count_miss) triples
+    and returns the first hit (or None) for each, in order. Hits are always counted, a
+    miss only with count_miss: a miss that is looked up again on its way to the
+    analysis (analyze_video_logic, analyze_text_logic) gets counted there.
+    """
+    flat = list(dict.fromkeys(k for _, keys, _ in requests for k in keys if k))
+    with timed("cache", "batch"):
+        values = dict(zip(flat, cache.mget(flat))) if flat else {}
+
+    results = []
+    pipe = cache.pipeline()
+    for level, keys, count_miss in requests:
+        cached = next((values[k] for k in keys if k and values.get(k)), None)
+        if cached or count_miss:
+            pipe.hincrby("stats:cache", f"{level}:{'hit' if cached else 'miss'}", 1)
+            count_cache(level, cached is not None)
+        results.append(json.loads(cached) if cached else None)
+    pipe.execute()
+    return results
+
+def store(keys: list, result: dict, ttl: int = CACHE_TTL):
+    payload = json.dumps(result)
+    pipe = cache.pipeline()
+    for key in keys:
+        if key:
+            pipe.setex(key, ttl, payload)
+    pipe.execute()
+
+def get_validators(url: str) -> dict:
+    """
+    ETag / Last-Modified seen the last time we downloaded this URL, plus the content
+    keys its bytes hashed to. Empty when we've never fetched it.
+    """
+    raw = cache.hgetall(f"http:validators:{hashlib.md5(url.encode()).hexdigest()}")
+    if not raw:
+        return {}
+    return {
+        "etag": raw.get("etag"),
+        "last_modified": raw.get("last_modified"),
+        "content_keys": json.loads(raw.get("content_keys", "[]"))
+    }
+
+def store_validators(url: str, etag: str, last_modified: str, keys: list):
+    if not etag and not last_modified:
+        return # nothing to revalidate with
+    key = f"http:validators:{hashlib.md5(url.encode()).hexdigest()}"
+    fields = {"content_keys": json.dumps([k for k in keys if k])}
+    if etag:
+        fields["etag"] = etag
+    if last_modified:
+        fields["last_modified"] = last_modified
+    pipe = cache.pipeline()
+    pipe.delete(key)
+    pipe.hset(key, mapping=fields)
+    # outlive the results so a 304 can still find them through the content keys
+    pipe.expire(key, CACHE_TTL * 7)
+    pipe.execute()
+
+def record_cache(level: str, hit: bool):
+    # counters live in redis so every uvicorn worker reports into the same numbers
+    cache.hincrby("stats:cache", f"{level}:{'hit' if hit else 'miss'}", 1)
+    count_cache(level, hit)
+
+def cache_stats() -> dict:
+    raw = cache.hgetall("stats:cache")
+    stats = {}
+    for field, count in raw.items():
+        level, outcome = field.split(":")
+        stats.setdefault(level, {"hits": 0, "misses": 0})["hits" if outcome == "hit" else "misses"] = int(count)
+    for level in stats.values():
+        total = level["hits"] + level["misses"]
+        level["hit_rate"] = round(level["hits"] / total, 4) if total else 0.0
+    return stats
+
+def record_fast_path(kind: str, local: bool):
+    # which share of traffic the local classifier answers without a Gemini round-trip
+    cache.hincrby("stats:fast_path", f"{kind}:{'local' if local else 'gemini'}", 1)
+    count_fast_path(kind, local)
+
+def fast_path_stats() -> dict:
+    raw = cache.hgetall("stats:fast_path")
+    stats = {}
+    for field, count in raw.items():
+        kind, route = field.split(":")
+        stats.setdefault(kind, {"local": 0, "gemini": 0})[route] = int(count)
+    for kind in stats.values():
+        total = kind["local"] + kind["gemini"]
+        kind["local_fraction"] = round(kind["local"] / total, 4) if total else 0.0
+    return stats
@@ -1,178 +1,417 @@
 import os
+import io
 import json
-import hashlib
+import asyncio
 import time
+from functools import partial
 from pathlib import Path
 from dotenv import load_dotenv
-from google import genai
+
+# force load env (before the app modules below read their settings)
+BASE_DIR = Path(__file__).resolve().parent.parent 
+ENV_PATH = BASE_DIR / ".env"
+load_dotenv(dotenv_path=ENV_PATH, verbose=True)
+
 from app.utils import (
+    probe_video,
     download_and_process_video, 
     extract_video_metadata, 
-    perform_ela_analysis, 
-    analyze_frame_consistency,
-    download_image, 
+    analyze_video_frames,
+    hash_file,
+    fetch_image_async, 
     extract_image_metadata, 
-    perform_image_ela
+    perform_image_ela,
+    fingerprint_image
+)
+from app.executor import run_cpu, run_io, run_io_owned
+from app.cache import (
+    cache,
+    resolve_short_link,
+    canonicalize_url,
+    platform_key,
+    url_key,
+    text_key,
+    content_keys,
+    content_key,
+    lookup,
+    store,
+    record_cache,
+    record_fast_path,
+    get_validators,
+    store_validators
 )
+from app.phash_index import near_duplicates, compact_verdict, save_index
+from app.singleflight import SingleFlight
+from app.llm import get_llm
+from app.microbatch import MicroBatcher
+from app.timings import timed
+from app.media import remove_media
+from app.local_model import load_model, score_image, classify, FrameClassifier
+from app.text_model import score_text, classify_text, TEXT_PRESCREEN_INLINE_BYTES
+
+# images up to this size ride inline with the prompt (Gemini's inline limit is 20 MB per request)
+GEMINI_INLINE_MAX_BYTES = int(os.getenv("GEMINI_INLINE_MAX_BYTES", 15 * 1024 * 1024))
+
+# in-flight deduplication of identical analyses (coordinated through redis across workers)
+flights = SingleFlight(cache)
+
+class ShortCircuit(Exception):
+    """
+    Raised by a stage that already has the final answer (e.g. a cache hit).
+    StageGraph cancels everything still running and re-raises it to the caller.
+    """
+    short_circuit = True
+
+    def __init__(self, result):
+        super().__init__("short-circuit")
+        self.result = result
+
+class StageGraph:
+    """
+    Tiny DAG scheduler for the analysis pipeline.
+    Each stage is an async function that receives its dependencies' results (in order)
+    and starts as soon as all of them have finished, so independent stages overlap.
+    """
+    def __init__(self, on_stage=None, kind: str = "pipeline"):
+        """
+        on_stage(name, result) is called as each stage succeeds (progress reporting).
+        kind labels the stage durations reported to app.timings observers.
+        """
+        self.stages = {}
+        self.timings = {}
+        self.on_stage = on_stage
+        self.kind = kind
 
-# force load env
-BASE_DIR = Path(__file__).resolve().parent.parent 
-ENV_PATH = BASE_DIR / ".env"
-load_dotenv(dotenv_path=ENV_PATH, verbose=True)
+    def add(self, name: str, func, deps=(), after=()):
+        """
+        deps: stages whose results are passed to func, in order.
+        after: stages that must finish first, but whose results func doesn't need.
+        """
+        for dep in (*deps, *after):
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.stages[name] = (func, tuple(deps), tuple(after))
+
+    async def run(self) -> dict:
+        origin = time.perf_counter()
+        tasks = {}
+
+        async def run_stage(name):
+            func, deps, after = self.stages[name]
+            for dep in after:
+                await tasks[dep]
+            inputs = [await tasks[dep] for dep in deps]
+            started = time.perf_counter()
+            try:
+                with timed(self.kind, name):
+                    result = await func(*inputs)
+            finally:
+                finished = time.perf_counter()
+                self.timings[name] = {
+                    "start": round(started - origin, 4),
+                    "end": round(finished - origin, 4),
+                    "duration": round(finished - started, 4)
+                }
+            if self.on_stage:
+                self.on_stage(name, result)
+            return result
+
+        # stages are added in dependency order, so every dep task exists before it is awaited
+        for name in self.stages:
+            tasks[name] = asyncio.ensure_future(run_stage(name))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return {name: task.result() for name, task in tasks.items()}
+
+    def critical_path(self) -> list:
+        """
+        Walks back from the last stage to finish, always following the dependency
+        that finished last (the one the stage was actually waiting on).
+        """
+        if not self.timings:
+            return []
+        path = [max(self.timings, key=lambda n: self.timings[n]["end"])]
+        while deps := [d for d in (*self.stages[path[-1]][1], *self.stages[path[-1]][2]) if d in self.timings]:
+            path.append(max(deps, key=lambda d: self.timings[d]["end"]))
+        return path[::-1]
+
+    def report(self) -> dict:
+        return {
+            "stages": self.timings,
+            "critical_path": self.critical_path(),
+            "total": max((t["end"] for t in self.timings.values()), default=0.0)
+        }
 
-# configure the key 
-api_key = os.getenv("GEMINI_API_KEY")
-print(f"DEBUG: Loaded API Key? {'YES' if api_key else 'NO'}") # print statement for testing
-
-if not api_key:
-    raise ValueError("CRITICAL: GEMINI_API_KEY not found in .env file.")
-
-# init gemini client
-client = genai.Client(api_key=api_key)
-
-# init redis
-redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-try:
-    import redis
-    cache = redis.from_url(redis_url, decode_responses=True)
-    cache.ping()
-    print("Connected to Real Redis")
-except:
-    print("Using Fake Redis (In-Memory)")
-    from fakeredis import FakeRedis
-    cache = FakeRedis(decode_responses=True)
-
-async def analyze_video_logic(video_url: str):
-    # cache check
-    video_id = hashlib.md5(video_url.encode()).hexdigest()
+async def find_near_duplicate(phashes: list):
+    """
+    Looks up re-encodes/crops/resizes of media we already judged in the pHash index.
+    Returns the stored verdict annotated with the match distance, or None.
+    """
+    item, distance = near_duplicates.query(phashes)
+    await run_io(record_cache, "near_duplicate", item is not None)
+    if item is None:
+        return None
+
+    # full result if it's still in redis, otherwise the compact verdict the index keeps
+    stored = await run_io(cache.get, item["key"])
+    result = json.loads(stored) if stored else dict(item["verdict"])
+    result["near_duplicate"] = {"distance": round(distance, 2), "matched": item["key"]}
+    return result
+
+async def remember_near_duplicate(phashes: list, key: str, result: dict):
+    near_duplicates.add(phashes, key, compact_verdict(result))
+    # only one periodic save in flight; overlapping requests leave it to that one
+    if near_duplicates.claim_save():
+        await run_io(save_index)
+
+def build_video_prompt(metadata_result: dict, ela_result: dict, movement_result: dict) -> str:
+    # store summary of metadata, so gemini has more to work off of
+    metadata_summary = f"Metadata Findings: Encoder={metadata_result.get('encoder')}, Suspicious Flags={metadata_result.get('suspicious_indicators')}"
+
+    # store summary of ela, so gemini has even more to go off of
+    ela_summary = f"ELA Analysis: Score={ela_result.get('ela_score')} (mean of {ela_result.get('frames_analyzed')} frames, spread {ela_result.get('score_spread')}), Interpretation={ela_result.get('interpretation')}"
+
+    # store summary of frame movement
+    segments = ", ".join(f"{seg['start']}-{seg['end']}s" for seg in movement_result.get("unstable_segments", []))
+    movement_summary = f"Movement Stability: Variance={movement_result.get('flux_score')}, AvgFlux={movement_result.get('avg_movement')}, PeakVariance={movement_result.get('peak_flux')}, Least stable segments: {segments or 'n/a'}"
+
+    return f"""
+    You are a Digital Forensics Expert. Your job is to distinguish between AI-generated videos (Sora, Runway, Pika) and Real videos.
+    
+    [HARD EVIDENCE]:
+    1. {metadata_summary}
+    2. {ela_summary}
+    3. {movement_summary}
     
-    if cached := cache.get(video_id):
+    [CRITICAL RULES]:
+    1. **The "Watermark" Kill Switch:** If you see a watermark or text saying "Sora", "OpenAI", "Runway", "Pika", or "Kling" -> IT IS 100% FAKE. Do not overthink it.
+    2. **ELA Thresholds:**
+       - Score < 1.0: EXTREMELY suspicious. Likely AI (Sora/Runway) or heavy blur.
+       - Score 1.2 - 2.0: Common for compressed YouTube videos (Real).
+       - Score > 2.0: Natural camera noise (Real).
+    3. **Physics vs. Texture:**
+       - Sora/Gen-3 models have PERFECT physics (gravity, collisions). Do not be fooled by good physics.
+       - Look closer at TEXTURES: Is the skin waxy? Do background text characters morph?
+    
+    [THE LOGIC TRAP]:
+    - Do not assume a video is "Real" just because the physics are good. Current AI (Sora) has mastered physics.
+    - Instead, look for "Dream Logic" (e.g., a trash can appearing out of nowhere, or a cat melting into a wall).
+    
+    Step 1: SEARCH FOR WATERMARKS. If found, verdict is FAKE immediately.
+    Step 2: Analyze Textures & ELA. Is ELA < 1.1? If so, be very skeptical.
+    Step 3: Analyze Physics.
+    Step 4: Synthesize Verdict.
+
+    Return JSON ONLY:
+    {{
+        "thinking_process": "Step-by-step reasoning...",
+        "ai_probability": int (0-100, where 100 is DEFINITELY AI. If 'Sora' watermark found, set 100.),
+        "verdict": "Real" | "Fake" | "Uncertain",
+        "forensics": {{ "visual_anomalies": [], "audio_anomalies": [] }},
+        "content_analysis": {{ "logical_flaws": [], "sentiment": "" }}
+    }}
+    """
+
+def report_progress(progress, stage: str, data: dict = None):
+    """
+    Sends a stage event to a job's progress callback. Reporting must never break an analysis.
+    """
+    if progress is None:
+        return
+    try:
+        progress(stage, data)
+    except Exception as e:
+        print(f"Progress report failed ({stage}): {e}")
+
+def video_stage_events(progress):
+    """
+    Maps StageGraph stage completions to the public job events (and their partial results).
+    """
+    def on_stage(name, result):
+        if name == "download":
+            report_progress(progress, "downloaded")
+        elif name == "metadata":
+            report_progress(progress, "metadata", {"metadata_scan": result})
+        elif name == "frames":
+            report_progress(progress, "ela", {"ela_scan": result["ela"]})
+            report_progress(progress, "movement", {"movement_scan": result["movement"]})
+        elif name == "upload":
+            report_progress(progress, "uploaded")
+    return on_stage
+
+async def analyze_video_logic(video_url: str, progress=None):
+    """
+    progress(stage, data), if given, is called as the pipeline advances (used by the job API).
+    """
+    with timed("analysis", "video"):
+        # level 1 cache: canonical URL (tracking params stripped, short links resolved)
+        with timed("video", "resolve"):
+            canonical_url = canonicalize_url(await run_io(resolve_short_link, video_url))
+        # a viral clip gets requested many times at once -> one analysis per cluster
+        return await flights.run(url_key("video", canonical_url), partial(_analyze_video, video_url, canonical_url, progress))
+
+async def _analyze_video(video_url: str, canonical_url: str, progress=None):
+    keys = [url_key("video", canonical_url)]
+
+    # redis is a blocking client: every call goes through the IO pool, off the event loop
+    if cached := await run_io(lookup, "url", keys):
         print(f"Cache hit: {video_url}")
-        return json.loads(cached)
+        return cached
 
     print(f"Cache miss: {video_url}. Starting analysis...")
 
     video_path = None
-    try:
-        video_path = download_and_process_video(video_url)
-
-        # metadata scan
+    fingerprints = {}
+    phashes = []
+    # the local classifier scores frames from the shared decode pass; without it the
+    # upload doesn't have to wait for that pass
+    local_enabled = load_model() is not None
+
+    # pipeline:
+    #   probe -> download -> digest -> metadata --------------\
+    #                              -> frames -> local -> upload -+-> gemini analysis
+    #                                        \-----------------/
+    # frames = one decode pass for the perceptual fingerprint, ELA, movement and the local
+    # classifier. probe, digest and frames short-circuit the whole graph on a cache hit,
+    # a confident local classifier skips the upload and the Gemini call
+    async def probe():
+        try:
+            info = await run_io(probe_video, video_url)
+        except RuntimeError as e:
+            # not fatal, the download will retry the extraction and report properly
+            print(f"Probe failed, skipping platform cache: {e}")
+            return None
+
+        # level 1 cache: same video on the platform, whatever URL it was shared under
+        if pkey := platform_key(info):
+            if cached := await run_io(lookup, "platform", [pkey]):
+                print(f"Platform cache hit: {pkey}")
+                await run_io(store, keys, cached)
+                raise ShortCircuit(cached)
+            keys.append(pkey)
+        return info
+
+    async def download(info):
+        nonlocal video_path
+        # download + ffprobe just wait on network/subprocess -> thread pool; if the client
+        # leaves mid-download the file is removed when the download thread finishes
+        video_path = await run_io_owned(remove_media, download_and_process_video, video_url, info)
+        return video_path
+
+    async def check_content(level: str, content: list):
+        if content and (cached := await run_io(lookup, level, content)):
+            print(f"{level.capitalize()} cache hit: {video_url}")
+            await run_io(store, keys, cached)
+            raise ShortCircuit(cached)
+        keys.extend(content)
+
+    async def digest(path):
+        # level 2 cache, exact bytes: only hashing, so it settles before the heavy stages start
+        fingerprints["digest"] = await run_io(hash_file, path)
+        await check_content("content", content_keys("video", fingerprints))
+
+    async def scan_metadata(path):
         print("Scanning Metadata...")
-        metadata_result = extract_video_metadata(video_path)
+        return await run_io(extract_video_metadata, path)
+
+    # fingerprint + ELA + flux (+ local classifier frames) are OpenCV/numpy heavy -> process pool, one decode pass
+    async def scan_frames(path):
+        print("Running Error Level Analysis (ELA) + Movement Consistency...")
+        extra = {"local": FrameClassifier()} if local_enabled else None
+        frames_result = await run_cpu(analyze_video_frames, path, extra)
+
+        # level 2 cache: what the frames look like (survives re-encoding)
+        fingerprints.update(frames_result["fingerprint"])
+        await check_content("perceptual", content_keys("video", fingerprints)[1:])
+
+        # re-encodes / crops of a clip we already judged (sampled keyframe pHashes)
+        phashes.extend(fingerprints["phashes"])
+        if near := await find_near_duplicate(phashes):
+            print(f"Near-duplicate hit (distance {near['near_duplicate']['distance']}): {video_url}")
+            raise ShortCircuit(near)
+        return frames_result
+
+    async def local(frames_result=None):
+        # local FFT classifier: confident cases never reach Gemini
+        if not local_enabled:
+            return None
+        local_verdict = classify(frames_result.get("local", {}).get("probability"))
+        await run_io(record_fast_path, "video", local_verdict is not None)
+        return local_verdict
+
+    async def upload(path, local_verdict):
+        if local_verdict:
+            print("Local classifier is confident, skipping Gemini...")
+            return None
 
-        # error level analysis scan
-        print("Running Error Level Analysis (ELA)...")
-        ela_result = perform_ela_analysis(video_path)
-
-        # frame consistency 
-        print("Analyzing Movement Consistency...")
-        movement_result = analyze_frame_consistency(video_path)
-
-        # store summary of metadata, so gemini has more to work off of
-        metadata_summary = f"Metadata Findings: Encoder={metadata_result.get('encoder')}, Suspicious Flags={metadata_result.get('suspicious_indicators')}"
-
-        # store summary of ela, so gemini has even more to go off of
-        ela_summary = f"ELA Analysis: Score={ela_result.get('ela_score')}, Interpretation={ela_result.get('interpretation')}"
-
-        # store summary of frame movement
-        movement_summary = f"Movement Stability: Variance={movement_result.get('flux_score')}, AvgFlux={movement_result.get('avg_movement')}"
-
-        # send to gemini
         print("Uploading to Gemini...")
-        video_file = client.files.upload(file=video_path)
-
-        while video_file.state.name == "PROCESSING":
-            time.sleep(2)
-            video_file = client.files.get(name=video_file.name)
+        # returns once the file is processed and can be referenced
+        return await get_llm().upload(path)
 
-        if video_file.state.name == "FAILED":
-            raise ValueError("Gemini failed to process video.")
+    async def analyze(metadata_result, frames_result, video_file, local_verdict):
+        if local_verdict:
+            return dict(local_verdict)
 
-        if video_file.state.name == "FAILED":
-            raise ValueError("Gemini failed to process video.")
-
-        # analysis
         print("Running Analysis...")
-        prompt = f"""
-        You are a Digital Forensics Expert. Your job is to distinguish between AI-generated videos (Sora, Runway, Pika) and Real videos.
-        
-        [HARD EVIDENCE]:
-        1. {metadata_summary}
-        2. {ela_summary}
-        3. {movement_summary}
-        
-        [CRITICAL RULES]:
-        1. **The "Watermark" Kill Switch:** If you see a watermark or text saying "Sora", "OpenAI", "Runway", "Pika", or "Kling" -> IT IS 100% FAKE. Do not overthink it.
-        2. **ELA Thresholds:**
-           - Score < 1.0: EXTREMELY suspicious. Likely AI (Sora/Runway) or heavy blur.
-           - Score 1.2 - 2.0: Common for compressed YouTube videos (Real).
-           - Score > 2.0: Natural camera noise (Real).
-        3. **Physics vs. Texture:**
-           - Sora/Gen-3 models have PERFECT physics (gravity, collisions). Do not be fooled by good physics.
-           - Look closer at TEXTURES: Is the skin waxy? Do background text characters morph?
-        
-        [THE LOGIC TRAP]:
-        - Do not assume a video is "Real" just because the physics are good. Current AI (Sora) has mastered physics.
-        - Instead, look for "Dream Logic" (e.g., a trash can appearing out of nowhere, or a cat melting into a wall).
-        
-        Step 1: SEARCH FOR WATERMARKS. If found, verdict is FAKE immediately.
-        Step 2: Analyze Textures & ELA. Is ELA < 1.1? If so, be very skeptical.
-        Step 3: Analyze Physics.
-        Step 4: Synthesize Verdict.
-
-        Return JSON ONLY:
-        {{
-            "thinking_process": "Step-by-step reasoning...",
-            "ai_probability": int (0-100, where 100 is DEFINITELY AI. If 'Sora' watermark found, set 100.),
-            "verdict": "Real" | "Fake" | "Uncertain",
-            "forensics": {{ "visual_anomalies": [], "audio_anomalies": [] }},
-            "content_analysis": {{ "logical_flaws": [], "sentiment": "" }}
-        }}
-        """
+        prompt = build_video_prompt(metadata_result, frames_result["ela"], frames_result["movement"])
+        return parse_json(await get_llm().generate([prompt, video_file]))
+
+    graph = StageGraph(on_stage=video_stage_events(progress), kind="video")
+    graph.add("probe", probe)
+    graph.add("download", download, deps=["probe"])
+    graph.add("digest", digest, deps=["download"])
+    graph.add("metadata", scan_metadata, deps=["download"], after=["digest"])
+    graph.add("frames", scan_frames, deps=["download"], after=["digest"])
+    graph.add("local", local, deps=["frames"] if local_enabled else [])
+    graph.add("upload", upload, deps=["download", "local"], after=["digest"])
+    graph.add("analysis", analyze, deps=["metadata", "frames", "upload", "local"])
 
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[prompt, video_file]
-        )
-        
-        raw_text = response.text.replace("```json", "").replace("```", "").strip()
-        result = json.loads(raw_text)
+    try:
+        stages = await graph.run()
+        result = stages["analysis"]
 
         # put metadata into final JSON
         result["hard_science"] = {
-            "metadata_scan": metadata_result,
-            "ela_scan": ela_result,
-            "movement_scan": movement_result
+            "metadata_scan": stages["metadata"],
+            "ela_scan": stages["frames"]["ela"],
+            "movement_scan": stages["frames"]["movement"]
         }
 
-        cache.setex(video_id, 86400, json.dumps(result))
+        await run_io(store, keys, result)
+        await remember_near_duplicate(phashes, content_key(keys), result)
+
+        # timings describe this run only, so they are not cached
+        result["timings"] = graph.report()
         return result
 
+    except ShortCircuit as hit:
+        return hit.result
+
     except Exception as e:
         print(f"Error: {e}")
         return {
             "Detector_score": 0, "verdict": "Error",
             "forensics": {"error": str(e)},
-            "content_analysis": {}
+            "content_analysis": {},
+            "timings": graph.report()
         }
     finally:
-        if video_path and os.path.exists(video_path):
-            os.remove(video_path)
+        if video_path:
+            await run_io(remove_media, video_path)
 
 # analyze text
 async def analyze_text_logic(text_content: str):
-    # cache test
-    text_id = hashlib.md5(text_content.encode()).hexdigest()
-    
-    if cached := cache.get(text_id):
-        print(f"Text Cache HIT")
-        return json.loads(cached)
+    with timed("analysis", "text"):
+        return await flights.run(text_key(text_content), partial(_analyze_text, text_content))
 
-    print(f"Text Cache MISS. Analyzing...")
-
-    try:
-        # gemini analysis
-        prompt = """
+TEXT_PROMPT = """
         You are an AI-Detector. Analyze this text to determine if it was generated by an AI/LLM.
         Look for: overly formal tone, lack of personal anecdote, repetitive sentence structure, and 'hallucination' patterns.
 
@@ -187,112 +426,273 @@ async def analyze_text_logic(text_content: str):
         }
         """
 
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[prompt, text_content]
-        )
-        
-        # clean JSON
-        raw_text = response.text.replace("```json", "").replace("```", "").strip()
-        result = json.loads(raw_text)
+# same task as TEXT_PROMPT for many texts at once (the micro-batcher's prompt)
+TEXT_BATCH_PROMPT = """
+        You are an AI-Detector. You will receive several texts, each starting with a line
+        "[TEXT <id>]" and ending with "[END <id>]". Analyze EACH text independently to determine
+        if it was generated by an AI/LLM.
+        Look for: overly formal tone, lack of personal anecdote, repetitive sentence structure, and 'hallucination' patterns.
+
+        Return a JSON array ONLY, one object per text:
+        [
+            {
+                "id": "<id from the [TEXT <id>] line>",
+                "Detector_score": int (0-100, where 100 is definitely AI),
+                "verdict": "Human" | "AI-Generated" | "Mixed",
+                "content_analysis": {
+                    "writing_style": "Formal/Casual/Robotic",
+                    "indicators": ["list of specific phrases or patterns found"]
+                }
+            }
+        ]
+        """
+
+def parse_json(text: str):
+    # clean JSON
+    return json.loads(text.replace("```json", "").replace("```", "").strip())
+
+def packed_answers(text: str) -> dict:
+    """
+    id -> result out of a packed response. Anything malformed is simply missing,
+    and the caller re-runs those items on their own.
+    """
+    try:
+        answers = parse_json(text)
+    except Exception as e:
+        print(f"Batch response was not JSON: {e}")
+        return {}
+    if not isinstance(answers, list):
+        return {}
+    return {str(a.pop("id")): a for a in answers if isinstance(a, dict) and "id" in a}
+
+async def ask_gemini_text(text_content: str) -> dict:
+    return parse_json(await get_llm().generate([TEXT_PROMPT, text_content]))
+
+async def ask_gemini_texts(texts: list) -> list:
+    """
+    One call for a whole micro-batch. Returns a result per text, None where the answer is missing.
+    """
+    body = "\n\n".join(f"[TEXT {n}]\n{text}\n[END {n}]" for n, text in enumerate(texts))
+    print(f"Running Gemini on {len(texts)} batched texts...")
+    answers = packed_answers(await get_llm().generate([TEXT_BATCH_PROMPT, body]))
+    return [answers.get(str(n)) for n in range(len(texts))]
+
+# concurrent text requests share Gemini calls (and the instruction prompt)
+text_batcher = MicroBatcher(ask_gemini_texts, ask_gemini_text)
+
+async def _analyze_text(text_content: str):
+    # cache test
+    text_id = text_key(text_content)
+    
+    if cached := await run_io(lookup, "text", [text_id]):
+        print(f"Text Cache HIT")
+        return cached
+
+    print(f"Text Cache MISS. Analyzing...")
+
+    try:
+        # stylometric pre-screen: obvious cases never reach Gemini
+        with timed("text", "prescreen"):
+            if len(text_content) <= TEXT_PRESCREEN_INLINE_BYTES:
+                local_verdict = classify_text(score_text(text_content))
+            else:
+                local_verdict = classify_text(await run_cpu(score_text, text_content))
+        await run_io(record_fast_path, "text", local_verdict is not None)
+
+        if local_verdict:
+            print("Text pre-screener is confident, skipping Gemini...")
+            result = local_verdict
+        else:
+            # gemini analysis (including the wait for the micro-batch to fill)
+            with timed("text", "analysis"):
+                result = await text_batcher.submit(text_content)
 
         # cache result :)
-        cache.setex(text_id, 86400, json.dumps(result))
+        await run_io(store, [text_id], result)
         return result
 
     except Exception as e:
         print(f"Text Error: {e}")
-        return {
-            "Detector_score": 0, "verdict": "Error",
-            "content_analysis": {"error": str(e)}
-        }
+        return text_error(e)
+
+def text_error(e: Exception) -> dict:
+    return {
+        "Detector_score": 0, "verdict": "Error",
+        "content_analysis": {"error": str(e)}
+    }
+    
+# what to look for in an image; shared by the single-image and the packed batch prompt
+IMAGE_RULES = """
+    [CRITICAL CONTEXT]:
+    1. **Stock Photo Warning:** High-quality stock photos (Unsplash, Pexels, Getty) often have STRIPPED metadata and LOW ELA scores due to compression/editing.
+       - DO NOT assume "No Metadata" + "Smoothness" = AI automatically.
+    2. **The "Anatomy" Check:** AI generation fails at details. Look for:
+       - Animal paws (fused toes, wrong number of claws).
+       - Text (gibberish/alien symbols).
+       - Eyes (pupils that aren't round, mismatched reflections).
+       - Blending (objects melting into each other).
+    3. **Verdict Logic:**
+       - If Anatomy/Physics is FLAWLESS -> Verdict is REAL (likely a Stock Photo), even if ELA is low.
+       - If Anatomy has errors (6 fingers, floating objects, weird paws) -> Verdict is FAKE.
+       - If ELA is Low (< 1.5) AND you see "Glossy/Plastic" skin/fur -> Verdict is FAKE.
+
+    Step 1: Analyze Anatomy (Hands, Paws, Eyes). Any errors?
+    Step 2: Analyze Textures. Is it "Plastic" (AI) or "Natural" (Real)?
+    Step 3: Synthesize Verdict.
+       - Perfect Anatomy + Low ELA = likely Real (Processed/Stock).
+       - Flawed Anatomy + Low ELA = definitely AI.
+"""
+
+def image_evidence(meta_result: dict, ela_result: dict) -> str:
+    # Summaries for Gemini
+    meta_summary = f"Metadata: Camera={meta_result.get('make')} {meta_result.get('model')}, Software={meta_result.get('software')}"
+    ela_summary = f"ELA Score: {ela_result.get('ela_score')} ({ela_result.get('interpretation')})"
+    return f"1. {meta_summary}\n    2. {ela_summary}"
+
+def build_image_prompt(meta_result: dict, ela_result: dict) -> str:
+    return f"""
+    You are a Digital Forensics Expert. Analyze this IMAGE for AI generation.
+    
+    [HARD EVIDENCE]:
+    {image_evidence(meta_result, ela_result)}
+    {IMAGE_RULES}
+    Return JSON ONLY:
+    {{
+        "thinking_process": "Reasoning...",
+        "ai_probability": int (0-100),
+        "verdict": "Real" | "Fake" | "Uncertain",
+        "forensics": {{ "visual_anomalies": [] }}
+    }}
+    """
+
+def image_part(state: dict):
+    return get_llm().inline(state["data"], state["mime_type"])
+
+async def prepare_image(image_url: str, keys: list, progress=None) -> dict:
+    """
+    Everything an image analysis does before asking Gemini. Returns {"cached": result}
+    when the answer is already known (304, content cache, near-duplicate); otherwise the
+    bytes, fingerprints and forensics, plus the local classifier's verdict (None when
+    Gemini has to decide).
+    """
+    # conditional GET: if the server says the image hasn't changed since we last
+    # fetched it, the result stored under its content keys is still good
+    validators = await run_io(get_validators, image_url)
+    with timed("image", "download"):
+        fetched = await fetch_image_async(image_url, validators)
+    if fetched.not_modified:
+        if cached := await run_io(lookup, "revalidated", validators["content_keys"]):
+            print(f"Image Not Modified (304): {image_url}")
+            await run_io(store, keys, cached)
+            return {"cached": cached}
+        with timed("image", "download"):
+            fetched = await fetch_image_async(image_url) # results expired, need the bytes after all
+
+    # the image stays in memory: every stage below reads the same buffer
+    image_data = fetched.data
+    report_progress(progress, "downloaded")
+
+    # level 2 cache: same bytes / same picture under another URL
+    with timed("image", "fingerprint"):
+        fingerprints = await run_cpu(fingerprint_image, image_data)
+    content = content_keys("image", fingerprints)
+    if cached := await run_io(lookup, "content", content):
+        print(f"Image Content Cache HIT: {image_url}")
+        await run_io(store, keys, cached)
+        return {"cached": cached}
+    keys = keys + content
+    await run_io(store_validators, image_url, fetched.etag, fetched.last_modified, content)
+
+    # crops / resizes / re-encodes of an image we already judged
+    if near := await find_near_duplicate(fingerprints["phashes"]):
+        print(f"Image Near-duplicate HIT (distance {near['near_duplicate']['distance']}): {image_url}")
+        return {"cached": near}
+    
+    # 2. Hard Science (Metadata + ELA)
+    print("Scanning Image Metadata...")
+    with timed("image", "metadata"):
+        meta_result = await run_io(extract_image_metadata, image_data)
+    report_progress(progress, "metadata", {"metadata": meta_result})
+    
+    print("Running Image ELA...")
+    with timed("image", "ela"):
+        ela_result = await run_cpu(perform_image_ela, image_data)
+    report_progress(progress, "ela", {"ela": ela_result})
     
-async def analyze_image_logic(image_url: str):
-    # cache check
-    image_id = hashlib.md5(image_url.encode()).hexdigest()
-    if cached := cache.get(image_id):
+    # local FFT classifier: confident cases never reach Gemini (no model -> nothing to ship to the pool)
+    local_verdict = None
+    if load_model() is not None:
+        with timed("image", "local"):
+            local_verdict = classify(await run_cpu(score_image, image_data))
+        await run_io(record_fast_path, "image", local_verdict is not None)
+
+    return {
+        "keys": keys,
+        "data": image_data,
+        "mime_type": fetched.mime_type,
+        "phashes": fingerprints["phashes"],
+        "metadata": meta_result,
+        "ela": ela_result,
+        "local_verdict": local_verdict
+    }
+
+async def finish_image(state: dict, result: dict) -> dict:
+    # Inject Hard Science
+    result["hard_science"] = {
+        "metadata": state["metadata"],
+        "ela": state["ela"]
+    }
+    
+    await run_io(store, state["keys"], result)
+    await remember_near_duplicate(state["phashes"], content_key(state["keys"]), result)
+    return result
+
+async def analyze_image_logic(image_url: str, progress=None):
+    with timed("analysis", "image"):
+        # level 1 cache: canonical URL
+        with timed("image", "resolve"):
+            canonical_url = canonicalize_url(await run_io(resolve_short_link, image_url))
+        return await flights.run(url_key("image", canonical_url), partial(_analyze_image, image_url, canonical_url, progress))
+
+async def ask_gemini_image(state: dict, progress=None) -> dict:
+    # 3. Hand the image to Gemini: inline with the request when it's small enough
+    # (no separate upload round-trip), through the Files API otherwise
+    if len(state["data"]) <= GEMINI_INLINE_MAX_BYTES:
+        image_file = image_part(state)
+    else:
+        print("Uploading to Gemini...")
+        with timed("image", "upload"):
+            image_file = await get_llm().upload(io.BytesIO(state["data"]), state["mime_type"])
+    report_progress(progress, "uploaded")
+
+    # 4. Analysis Prompt (to add: trained LLM input on the matter - or rather, replacing this section as a whole with the trained LLM)
+    print("Running Gemini Vision...")
+    prompt = build_image_prompt(state["metadata"], state["ela"])
+
+    with timed("image", "analysis"):
+        return parse_json(await get_llm().generate([prompt, image_file]))
+
+async def _analyze_image(image_url: str, canonical_url: str, progress=None):
+    keys = [url_key("image", canonical_url)]
+    if cached := await run_io(lookup, "url", keys):
         print(f"Image Cache HIT: {image_url}")
-        return json.loads(cached)
+        return cached
 
     print(f"Image Cache MISS: {image_url}. Starting analysis...")
     
-    image_path = None
     try:
-        image_path = download_image(image_url)
-        
-        # 2. Hard Science (Metadata + ELA)
-        print("Scanning Image Metadata...")
-        meta_result = extract_image_metadata(image_path)
-        
-        print("Running Image ELA...")
-        ela_result = perform_image_ela(image_path)
-        
-        # Summaries for Gemini
-        meta_summary = f"Metadata: Camera={meta_result.get('make')} {meta_result.get('model')}, Software={meta_result.get('software')}"
-        ela_summary = f"ELA Score: {ela_result.get('ela_score')} ({ela_result.get('interpretation')})"
-        
-        # 3. Upload to Gemini
-        print("Uploading to Gemini...")
-        image_file = client.files.upload(file=image_path)
-        
-        # 4. Analysis Prompt (to add: trained LLM input on the matter - or rather, replacing this section as a whole with the trained LLM)
-        print("Running Gemini Vision...")
-        prompt = f"""
-        You are a Digital Forensics Expert. Analyze this IMAGE for AI generation.
-        
-        [HARD EVIDENCE]:
-        1. {meta_summary}
-        2. {ela_summary}
+        state = await prepare_image(image_url, keys, progress)
+        if "cached" in state:
+            return state["cached"]
+
+        if state["local_verdict"]:
+            print("Local classifier is confident, skipping Gemini...")
+            result = dict(state["local_verdict"])
+        else:
+            result = await ask_gemini_image(state, progress)
         
-        [CRITICAL CONTEXT]:
-        1. **Stock Photo Warning:** High-quality stock photos (Unsplash, Pexels, Getty) often have STRIPPED metadata and LOW ELA scores due to compression/editing.
-           - DO NOT assume "No Metadata" + "Smoothness" = AI automatically.
-        2. **The "Anatomy" Check:** AI generation fails at details. Look for:
-           - Animal paws (fused toes, wrong number of claws).
-           - Text (gibberish/alien symbols).
-           - Eyes (pupils that aren't round, mismatched reflections).
-           - Blending (objects melting into each other).
-        3. **Verdict Logic:**
-           - If Anatomy/Physics is FLAWLESS -> Verdict is REAL (likely a Stock Photo), even if ELA is low.
-           - If Anatomy has errors (6 fingers, floating objects, weird paws) -> Verdict is FAKE.
-           - If ELA is Low (< 1.5) AND you see "Glossy/Plastic" skin/fur -> Verdict is FAKE.
-
-        Step 1: Analyze Anatomy (Hands, Paws, Eyes). Any errors?
-        Step 2: Analyze Textures. Is it "Plastic" (AI) or "Natural" (Real)?
-        Step 3: Synthesize Verdict.
-           - Perfect Anatomy + Low ELA = likely Real (Processed/Stock).
-           - Flawed Anatomy + Low ELA = definitely AI.
-
-        Return JSON ONLY:
-        {{
-            "thinking_process": "Reasoning...",
-            "ai_probability": int (0-100),
-            "verdict": "Real" | "Fake" | "Uncertain",
-            "forensics": {{ "visual_anomalies": [] }}
-        }}
-        """
-        
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[prompt, image_file]
-        )
-        
-        raw_text = response.text.replace("```json", "").replace("```", "").strip()
-        result = json.loads(raw_text)
-        
-        # Inject Hard Science
-        result["hard_science"] = {
-            "metadata": meta_result,
-            "ela": ela_result
-        }
-        
-        cache.setex(image_id, 86400, json.dumps(result))
-        return result
+        return await finish_image(state, result)
 
     except Exception as e:
         print(f"Image Error: {e}")
-        return {"verdict": "Error", "error": str(e)}
-        
-    finally:
-        if image_path and os.path.exists(image_path):
-            os.remove(image_path)
\ No newline at end of file
+        return {"verdict": "Error", "error": str(e)}
\ No newline at end of file
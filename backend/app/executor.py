@@ -0,0 +1,76 @@
+import os
+import asyncio
+import contextvars
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# pool sizes (override in .env)
+# CPU pool -> OpenCV / numpy forensics (ELA, flux), one process per core by default
+# IO pool -> yt-dlp downloads, ffprobe, image downloads, anything that just waits
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", os.cpu_count() or 2))
+IO_WORKERS = int(os.getenv("IO_WORKERS", 16))
+
+_cpu_pool = None
+_io_pool = None
+
+def get_cpu_pool() -> ProcessPoolExecutor:
+    """
+    Lazily creates the process pool, so importing the app never forks.
+    """
+    global _cpu_pool
+    if _cpu_pool is None:
+        _cpu_pool = ProcessPoolExecutor(max_workers=CPU_WORKERS)
+    return _cpu_pool
+
+def get_io_pool() -> ThreadPoolExecutor:
+    global _io_pool
+    if _io_pool is None:
+        _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="verifai-io")
+    return _io_pool
+
+async def run_cpu(func, *args, **kwargs):
+    """
+    Runs a CPU-bound function in the process pool without blocking the event loop.
+    func and its arguments must be picklable (module-level functions, plain data).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_pool(), partial(func, *args, **kwargs))
+
+async def run_io(func, *args, **kwargs):
+    """
+    Runs a blocking I/O function in the thread pool without blocking the event loop.
+    Like asyncio.to_thread, func runs in a copy of the caller's context, so the spans
+    and timings it opens nest under the caller's.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_pool(), partial(contextvars.copy_context().run, func, *args, **kwargs))
+
+async def run_io_owned(cleanup, func, *args, **kwargs):
+    """
+    run_io() for a function that creates something the caller must release (a downloaded
+    file...). A running thread can't be stopped, so if the caller is cancelled meanwhile
+    (client gone) `cleanup(result)` runs once the function finishes instead of leaking it.
+    """
+    future = get_io_pool().submit(partial(contextvars.copy_context().run, func, *args, **kwargs))
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(partial(_release, cleanup))
+        raise
+
+def _release(cleanup, future):
+    if future.cancelled() or future.exception() is not None:
+        return # never started, or failed without producing anything
+    try:
+        cleanup(future.result())
+    except Exception as e:
+        print(f"Cleanup after cancelled {cleanup.__name__} failed: {e}")
+
+def shutdown_pools():
+    global _cpu_pool, _io_pool
+    if _cpu_pool is not None:
+        _cpu_pool.shutdown(wait=False, cancel_futures=True)
+        _cpu_pool = None
+    if _io_pool is not None:
+        _io_pool.shutdown(wait=False, cancel_futures=True)
+        _io_pool = None
@@ -0,0 +1,152 @@
+import os
+import asyncio
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.media import sniff_mime
+
+# keep-alive pools shared by every request instead of a new connection (and TLS handshake) each time
+HTTP_MAX_HOSTS = int(os.getenv("HTTP_MAX_HOSTS", 32))                # hosts with pooled connections
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", 8))           # open connections per host
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10))
+
+# imitate a real person on a browser
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# image types PIL decodes out of the box
+IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp", "image/bmp", "image/tiff"}
+
+class TooLarge(RuntimeError):
+    pass
+
+class Fetched:
+    """
+    A downloaded body plus what we learned about it. `not_modified` is set when a
+    conditional request came back 304 (then there is no body).
+    """
+    def __init__(self, data: bytes = None, mime_type: str = None, etag: str = None,
+                 last_modified: str = None, not_modified: bool = False):
+        self.data = data
+        self.mime_type = mime_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.not_modified = not_modified
+
+_session = None
+_async_client = None
+_async_loop = None
+
+def get_session() -> requests.Session:
+    """
+    Shared blocking client (thread pool code: yt-dlp helpers, short-link resolution).
+    """
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_MAX_HOSTS,
+            pool_maxsize=HTTP_MAX_PER_HOST,
+            max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504), allowed_methods=("GET", "HEAD"))
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["User-Agent"] = USER_AGENT
+        _session = session
+    return _session
+
+def get_async_client():
+    """
+    Shared async client for core.py (HTTP/2 when the h2 package is installed).
+    Bound to the running event loop, so it is rebuilt if the loop changes (tests).
+    """
+    global _async_client, _async_loop
+    import httpx
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_loop is not loop:
+        try:
+            import h2 # noqa: F401
+            http2 = True
+        except ImportError:
+            http2 = False
+        _async_client = httpx.AsyncClient(
+            http2=http2,
+            follow_redirects=True,
+            timeout=HTTP_TIMEOUT,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=HTTP_MAX_HOSTS * HTTP_MAX_PER_HOST, max_keepalive_connections=HTTP_MAX_HOSTS)
+        )
+        _async_loop = loop
+    return _async_client
+
+async def close_http():
+    global _async_client, _session
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _session is not None:
+        _session.close()
+        _session = None
+
+def _conditional_headers(validators: dict) -> dict:
+    headers = {}
+    if validators and validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators and validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+def _check_length(headers, max_bytes: int):
+    length = headers.get("content-length")
+    if length and length.isdigit() and int(length) > max_bytes:
+        raise TooLarge(f"response is {int(length) / 2**20:.1f} MB, limit is {max_bytes / 2**20:.1f} MB")
+
+def _finish(data: bytearray, headers) -> Fetched:
+    data = bytes(data)
+    return Fetched(
+        data=data,
+        # trust the bytes, not the URL extension or the server's Content-Type
+        mime_type=sniff_mime(data),
+        etag=headers.get("etag"),
+        last_modified=headers.get("last-modified")
+    )
+
+def fetch(url: str, max_bytes: int, validators: dict = None) -> Fetched:
+    """
+    Blocking GET into memory with a size cap (checked against Content-Length up front,
+    and while streaming). Sends If-None-Match / If-Modified-Since when given validators.
+    """
+    with get_session().get(url, headers=_conditional_headers(validators), stream=True, timeout=HTTP_TIMEOUT) as response:
+        if response.status_code == 304:
+            return Fetched(not_modified=True, etag=validators.get("etag"), last_modified=validators.get("last_modified"))
+        response.raise_for_status()
+        _check_length(response.headers, max_bytes)
+
+        data = bytearray()
+        for chunk in response.iter_content(chunk_size=65536):
+            data += chunk
+            if len(data) > max_bytes:
+                raise TooLarge(f"response larger than {max_bytes / 2**20:.1f} MB")
+        return _finish(data, response.headers)
+
+async def fetch_async(url: str, max_bytes: int, validators: dict = None) -> Fetched:
+    """
+    Async version of fetch() on the shared pooled client.
+    """
+    client = get_async_client()
+    async with client.stream("GET", url, headers=_conditional_headers(validators)) as response:
+        if response.status_code == 304:
+            return Fetched(not_modified=True, etag=validators.get("etag"), last_modified=validators.get("last_modified"))
+        response.raise_for_status()
+        _check_length(response.headers, max_bytes)
+
+        data = bytearray()
+        async for chunk in response.aiter_bytes(65536):
+            data += chunk
+            if len(data) > max_bytes:
+                raise TooLarge(f"response larger than {max_bytes / 2**20:.1f} MB")
+        return _finish(data, response.headers)
+
+def check_image(fetched: Fetched) -> Fetched:
+    if fetched.mime_type not in IMAGE_TYPES:
+        raise RuntimeError(f"URL did not return a supported image ({fetched.mime_type})")
+    return fetched
@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+from redis.exceptions import WatchError
+from app.cache import cache
+from app.executor import run_io
+from app.core import analyze_video_logic, analyze_text_logic, analyze_image_logic
+from app.timings import timed
+from app.telemetry import JOBS_IN_FLIGHT
+
+# concurrent jobs per uvicorn worker (each runs a full analysis pipeline)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+# how long finished jobs (status, events, result) stay queryable
+JOB_TTL = int(os.getenv("JOB_TTL", 86400))
+# running jobs hold a lease of this many seconds, renewed by their worker; a job whose
+# lease ran out (worker killed mid-run) is requeued when a worker starts, and by the
+# orphan scan every worker process runs this often
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 30))
+
+QUEUE_KEY = "jobs:queue"
+# jobs a worker has taken off the queue and not finished yet
+PROCESSING_KEY = "jobs:processing"
+FINISHED = ("done", "error")
+
+def _job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+def _events_key(job_id: str) -> str:
+    return f"job:{job_id}:events"
+
+def _lease_key(job_id: str) -> str:
+    return f"job:{job_id}:lease"
+
+def submit_job(kind: str, payload: str) -> str:
+    """
+    Records a queued job in redis and pushes it onto the shared queue.
+    Any worker can pick it up, and any worker can answer status queries for it.
+    """
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    pipe = cache.pipeline()
+    pipe.hset(_job_key(job_id), mapping={
+        "status": "queued",
+        "kind": kind,
+        "payload": payload,
+        "created": now,
+        "updated": now,
+        "partial": "{}"
+    })
+    pipe.expire(_job_key(job_id), JOB_TTL)
+    pipe.execute()
+    add_event(job_id, "queued")
+    cache.rpush(QUEUE_KEY, job_id)
+    return job_id
+
+def add_event(job_id: str, stage: str, data: dict = None):
+    """
+    Appends a stage event and merges its data into the job's partial results.
+    """
+    event = {"stage": stage, "time": time.time()}
+    if data:
+        event["data"] = data
+
+    pipe = cache.pipeline()
+    pipe.rpush(_events_key(job_id), json.dumps(event))
+    pipe.expire(_events_key(job_id), JOB_TTL)
+    pipe.hset(_job_key(job_id), "updated", event["time"])
+    pipe.execute()
+
+    if data:
+        _merge_partial(job_id, data)
+
+def _merge_partial(job_id: str, data: dict):
+    # read-modify-write under WATCH: if another event lands in between, redo the merge
+    # on top of it instead of overwriting it
+    with cache.pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(_job_key(job_id))
+                partial = json.loads(pipe.hget(_job_key(job_id), "partial") or "{}")
+                partial.update(data)
+                pipe.multi()
+                pipe.hset(_job_key(job_id), "partial", json.dumps(partial))
+                pipe.execute()
+                return
+            except WatchError:
+                continue
+
+def get_job(job_id: str):
+    job = cache.hgetall(_job_key(job_id))
+    if not job:
+        return None
+    events = [json.loads(e)["stage"] for e in cache.lrange(_events_key(job_id), 0, -1)]
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "kind": job["kind"],
+        "created": float(job["created"]),
+        "updated": float(job["updated"]),
+        "stages": events,
+        "partial": json.loads(job.get("partial") or "{}"),
+        "result": json.loads(job["result"]) if "result" in job else None
+    }
+
+def get_events(job_id: str, start: int = 0) -> list:
+    return [json.loads(e) for e in cache.lrange(_events_key(job_id), start, -1)]
+
+def queued_jobs() -> int:
+    return cache.llen(QUEUE_KEY)
+
+def job_status(job_id: str):
+    return cache.hget(_job_key(job_id), "status")
+
+async def _write_after(previous, job_id: str, stage: str, data: dict = None):
+    if previous is not None:
+        await previous
+    try:
+        await run_io(add_event, job_id, stage, data)
+    except Exception as e:
+        print(f"Job {job_id} event {stage} not recorded: {e}")
+
+async def run_job(job_id: str):
+    # the redis client blocks: every call below goes through the IO pool
+    job = await run_io(cache.hgetall, _job_key(job_id))
+    if not job:
+        return # expired while queued
+
+    await run_io(cache.hset, _job_key(job_id), "status", "running")
+    await run_io(add_event, job_id, "started")
+
+    # the pipeline reports progress from synchronous callbacks: each event is written
+    # in the IO pool after the one before it, so they land in order without blocking
+    # the event loop or the analysis
+    writes = None
+
+    def progress(stage, data=None):
+        nonlocal writes
+        writes = asyncio.ensure_future(_write_after(writes, job_id, stage, data))
+
+    kind, payload = job["kind"], job["payload"]
+    try:
+        # jobs run outside any request: this is the root span of their trace
+        with JOBS_IN_FLIGHT.track_inprogress(), timed("job", kind):
+            if kind == "video":
+                result = await analyze_video_logic(payload, progress=progress)
+            elif kind == "image":
+                result = await analyze_image_logic(payload, progress=progress)
+            else:
+                result = await analyze_text_logic(payload)
+        # the analyze_* functions report their own failures as an "Error" verdict
+        status = "error" if result.get("verdict") == "Error" else "done"
+    except Exception as e:
+        result, status = {"verdict": "Error", "error": str(e)}, "error"
+    finally:
+        if writes is not None:
+            await writes
+
+    # result first, then the final event, then the status flip: the SSE stream ends
+    # once it sees a finished status, so the last event must already be there
+    await run_io(cache.hset, _job_key(job_id), "result", json.dumps(result))
+    await run_io(add_event, job_id, "verdict" if status == "done" else "error", {"verdict": result.get("verdict")})
+    await run_io(cache.hset, _job_key(job_id), "status", status)
+
+def requeue_job(job_id: str) -> bool:
+    """
+    Moves a job from the processing list back to the front of the queue.
+    False if it wasn't there (finished, or another worker already requeued it).
+    """
+    if not cache.lrem(PROCESSING_KEY, 1, job_id):
+        return False
+    cache.lpush(QUEUE_KEY, job_id)
+    cache.delete(_lease_key(job_id))
+    if cache.exists(_job_key(job_id)):
+        cache.hset(_job_key(job_id), "status", "queued")
+        add_event(job_id, "requeued")
+    return True
+
+def orphaned_jobs() -> set:
+    """
+    Jobs in the processing list without a lease: their worker died mid-run.
+    """
+    return {job_id for job_id in cache.lrange(PROCESSING_KEY, 0, -1) if not cache.exists(_lease_key(job_id))}
+
+def requeue_orphaned_jobs(job_ids: set = None) -> int:
+    """
+    Requeues the given orphans (all of them right now by default). Returns how many went back.
+    """
+    return sum(requeue_job(job_id) for job_id in (orphaned_jobs() if job_ids is None else job_ids))
+
+def _finish_job(job_id: str):
+    cache.lrem(PROCESSING_KEY, 1, job_id)
+    cache.delete(_lease_key(job_id))
+
+async def hold_lease(job_id: str):
+    while True:
+        await run_io(cache.set, _lease_key(job_id), "1", ex=JOB_LEASE_SECONDS)
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+
+async def job_worker(poll_interval: float = 0.25):
+    """
+    Pulls job ids off the shared redis queue until cancelled. A job moves atomically
+    into the processing list (LMOVE) and only leaves it once finished, so a crashed
+    worker's jobs can be found and run again.
+    """
+    while True:
+        job_id = await run_io(cache.lmove, QUEUE_KEY, PROCESSING_KEY, "LEFT", "RIGHT")
+        if job_id is None:
+            await asyncio.sleep(poll_interval)
+            continue
+        await run_io(cache.set, _lease_key(job_id), "1", ex=JOB_LEASE_SECONDS)
+        lease = asyncio.ensure_future(hold_lease(job_id))
+        try:
+            await run_job(job_id)
+        except asyncio.CancelledError:
+            # shutdown mid-job: hand it back instead of leaving it "running" forever
+            print(f"Job {job_id} interrupted, requeued")
+            await run_io(requeue_job, job_id)
+            raise
+        except Exception as e:
+            print(f"Job {job_id} crashed: {e}")
+        finally:
+            lease.cancel()
+        await run_io(_finish_job, job_id)
+
+async def reclaim_orphaned_jobs(interval: float = JOB_LEASE_SECONDS):
+    """
+    Requeues jobs of workers that died while this one keeps running. A job counts as
+    orphaned once it had no lease on two scans in a row: a job another worker has just
+    moved into the processing list gets its lease a moment after the LMOVE.
+    """
+    suspects = set()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            orphans = await run_io(orphaned_jobs)
+            if requeued := await run_io(requeue_orphaned_jobs, orphans & suspects):
+                print(f"Requeued {requeued} orphaned jobs")
+            suspects = orphans
+        except Exception as e:
+            print(f"Orphaned job scan failed: {e}")
+
+_workers = []
+
+def start_job_workers():
+    if requeued := requeue_orphaned_jobs():
+        print(f"Requeued {requeued} interrupted jobs")
+    for _ in range(JOB_WORKERS):
+        _workers.append(asyncio.ensure_future(job_worker()))
+    _workers.append(asyncio.ensure_future(reclaim_orphaned_jobs()))
+
+async def stop_job_workers():
+    for worker in _workers:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+def _finished_after(job_id: str, sent: int) -> bool:
+    # finished, and every event up to the last one already sent
+    return job_status(job_id) in FINISHED and not get_events(job_id, sent)
+
+async def stream_events(job_id: str, is_disconnected, poll_interval: float = 0.25):
+    """
+    Server-sent events for a job: replays what already happened, then pushes new
+    stage events as they land, and ends after the final verdict/error.
+    """
+    sent = 0
+    while True:
+        for event in await run_io(get_events, job_id, sent):
+            sent += 1
+            yield f"event: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+
+        if await run_io(_finished_after, job_id, sent):
+            return
+        if await is_disconnected():
+            return
+        await asyncio.sleep(poll_interval)
@@ -0,0 +1,260 @@
+import os
+import io
+import re
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+from pathlib import Path
+from app.timings import timed
+from app.telemetry import count_llm_call
+from app.polling import wait_until_processed
+from app.executor import run_io
+
+# which LLM answers the prompts: "gemini" (default) or "stub" (offline, canned verdicts)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+
+# stub latency distributions: "fixed:S", "uniform:LO,HI", "normal:MEAN,SD" or "lognormal:MEDIAN,SIGMA" (seconds)
+LLM_STUB_LATENCY = os.getenv("LLM_STUB_LATENCY", "lognormal:1.5,0.4")
+LLM_STUB_UPLOAD_LATENCY = os.getenv("LLM_STUB_UPLOAD_LATENCY", "fixed:0.5")
+# how long stub uploads stay PROCESSING (exercises the polling like a video on Gemini)
+LLM_STUB_PROCESSING = os.getenv("LLM_STUB_PROCESSING", "fixed:0")
+LLM_STUB_SEED = int(os.getenv("LLM_STUB_SEED", 42))
+# optional JSON file replacing the canned verdicts: {"media": [...], "text": [...]}
+LLM_STUB_RESPONSES = os.getenv("LLM_STUB_RESPONSES")
+
+class LLMBackend:
+    """
+    Everything the pipeline asks of the LLM: a generate call that returns the response text,
+    a file upload for media too big to send inline, and inline parts for small media.
+    Both implementations keep the same counters, so time spent waiting on the LLM can be
+    told apart from our own processing.
+    """
+    name = "base"
+
+    def __init__(self):
+        self.stats = {"generate_calls": 0, "generate_seconds": 0.0, "uploads": 0, "upload_seconds": 0.0, "processing_seconds": 0.0}
+
+    async def generate(self, contents: list, model: str = LLM_MODEL) -> str:
+        start = time.perf_counter()
+        try:
+            with timed("llm", "generate"), count_llm_call(self.name, "generate"):
+                return await self._generate(contents, model)
+        finally:
+            self.stats["generate_calls"] += 1
+            self.stats["generate_seconds"] += time.perf_counter() - start
+
+    async def upload(self, file, mime_type: str = None):
+        """
+        Uploads a path or file object and returns a handle usable in `contents` once the
+        file is ready to be referenced (videos are processed server-side first; see
+        app.polling for how that wait is paced and bounded).
+        """
+        start = time.perf_counter()
+        try:
+            with timed("llm", "upload"), count_llm_call(self.name, "upload"):
+                uploaded = await self._upload(file, mime_type)
+        finally:
+            self.stats["uploads"] += 1
+            self.stats["upload_seconds"] += time.perf_counter() - start
+
+        if uploaded.state.name == "PROCESSING":
+            start = time.perf_counter()
+            try:
+                uploaded = await wait_until_processed(uploaded, self._refresh, self._delete)
+            finally:
+                self.stats["processing_seconds"] += time.perf_counter() - start
+
+        if uploaded.state.name == "FAILED":
+            raise ValueError("Gemini failed to process the upload.")
+        return uploaded
+
+    def inline(self, data: bytes, mime_type: str):
+        raise NotImplementedError
+
+    async def _generate(self, contents: list, model: str) -> str:
+        raise NotImplementedError
+
+    async def _upload(self, file, mime_type: str):
+        raise NotImplementedError
+
+    async def _refresh(self, uploaded):
+        raise NotImplementedError
+
+    async def _delete(self, uploaded):
+        raise NotImplementedError
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, api_key: str):
+        super().__init__()
+        from google import genai
+        from google.genai import types
+        self.client = genai.Client(api_key=api_key)
+        self.types = types
+
+    def inline(self, data: bytes, mime_type: str):
+        return self.types.Part.from_bytes(data=data, mime_type=mime_type)
+
+    async def _generate(self, contents: list, model: str) -> str:
+        response = await self.client.aio.models.generate_content(model=model, contents=contents)
+        return response.text
+
+    async def _upload(self, file, mime_type: str):
+        config = {"mime_type": mime_type} if mime_type else None
+        return await self.client.aio.files.upload(file=file, config=config)
+
+    async def _refresh(self, uploaded):
+        return await self.client.aio.files.get(name=uploaded.name)
+
+    async def _delete(self, uploaded):
+        await self.client.aio.files.delete(name=uploaded.name)
+
+def parse_latency(spec: str):
+    """
+    "lognormal:1.5,0.4" -> a function drawing a latency in seconds from an RNG.
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    draws = {
+        "fixed": lambda rng: values[0],
+        "uniform": lambda rng: rng.uniform(values[0], values[1]),
+        "normal": lambda rng: rng.gauss(values[0], values[1]),
+        "lognormal": lambda rng: rng.lognormvariate(math.log(values[0]), values[1]),
+    }
+    if kind not in draws:
+        raise ValueError(f"unknown latency distribution '{spec}' (fixed, uniform, normal, lognormal)")
+    draw = draws[kind]
+    return lambda rng: max(0.0, draw(rng))
+
+# verdicts the stub picks from, in the shapes the prompts ask for
+STUB_MEDIA_VERDICTS = [
+    {"thinking_process": "Stub backend: natural textures, consistent lighting.", "ai_probability": 12, "verdict": "Real",
+     "forensics": {"visual_anomalies": [], "audio_anomalies": []}, "content_analysis": {"logical_flaws": [], "sentiment": "neutral"}},
+    {"thinking_process": "Stub backend: waxy skin, morphing background text.", "ai_probability": 91, "verdict": "Fake",
+     "forensics": {"visual_anomalies": ["waxy skin"], "audio_anomalies": []}, "content_analysis": {"logical_flaws": [], "sentiment": "neutral"}},
+    {"thinking_process": "Stub backend: mixed signals.", "ai_probability": 55, "verdict": "Uncertain",
+     "forensics": {"visual_anomalies": [], "audio_anomalies": []}, "content_analysis": {"logical_flaws": [], "sentiment": "neutral"}},
+]
+STUB_TEXT_VERDICTS = [
+    {"Detector_score": 8, "verdict": "Human", "content_analysis": {"writing_style": "Casual", "indicators": []}},
+    {"Detector_score": 94, "verdict": "AI-Generated", "content_analysis": {"writing_style": "Robotic", "indicators": ["stub"]}},
+    {"Detector_score": 50, "verdict": "Mixed", "content_analysis": {"writing_style": "Formal", "indicators": []}},
+]
+
+class StubUpload:
+    """
+    Looks enough like a Gemini File for the pipeline (name, state, mime_type, size_bytes).
+    It stays PROCESSING until `ready_at` (time.monotonic()).
+    """
+    class State:
+        def __init__(self, name: str):
+            self.name = name
+
+    def __init__(self, name: str, mime_type: str, size: int, ready_at: float = 0.0, digest: str = None):
+        self.name = name
+        self.mime_type = mime_type
+        self.size_bytes = size
+        self.ready_at = ready_at
+        self.digest = digest
+        self.state = StubUpload.State("PROCESSING" if time.monotonic() < ready_at else "ACTIVE")
+
+    def __repr__(self):
+        # part of the stub's request key: the content, never the (random) file name or object address
+        return f"StubUpload({self.digest!r}, {self.size_bytes})"
+
+class StubBackend(LLMBackend):
+    """
+    Offline stand-in: sleeps for a latency drawn from a seeded distribution and answers
+    with canned JSON in the shape the prompt asks for (packed prompts get one answer per id).
+    The verdict depends only on the request, so runs are reproducible.
+    """
+    name = "stub"
+
+    def __init__(self, latency: str = LLM_STUB_LATENCY, upload_latency: str = LLM_STUB_UPLOAD_LATENCY,
+                 seed: int = LLM_STUB_SEED, responses: str = LLM_STUB_RESPONSES, processing: str = LLM_STUB_PROCESSING):
+        super().__init__()
+        self.latency = parse_latency(latency)
+        self.upload_latency = parse_latency(upload_latency)
+        self.processing = parse_latency(processing)
+        self.deleted = []
+        self.rng = random.Random(seed)
+        self.media_verdicts, self.text_verdicts = STUB_MEDIA_VERDICTS, STUB_TEXT_VERDICTS
+        if responses:
+            with open(responses) as f:
+                canned = json.load(f)
+            self.media_verdicts = canned.get("media", self.media_verdicts)
+            self.text_verdicts = canned.get("text", self.text_verdicts)
+
+    def inline(self, data: bytes, mime_type: str):
+        return {"inline": mime_type, "size": len(data), "digest": hashlib.md5(data).hexdigest()}
+
+    def _pick(self, verdicts: list, key: str) -> dict:
+        return dict(verdicts[int(hashlib.md5(key.encode()).hexdigest(), 16) % len(verdicts)])
+
+    async def _generate(self, contents: list, model: str) -> str:
+        await asyncio.sleep(self.latency(self.rng))
+        prompt = contents[0] if contents and isinstance(contents[0], str) else ""
+        request_key = repr(contents[1:])
+        text_prompt = "AI-Detector" in prompt
+
+        # packed prompts: answer every [TEXT n] / [IMAGE n] item
+        joined = "\n".join(c for c in contents if isinstance(c, str))
+        ids = re.findall(r"\[(?:TEXT|IMAGE) (\w+)\]", joined)
+        if ids:
+            verdicts = self.text_verdicts if text_prompt else self.media_verdicts
+            return json.dumps([{"id": i, **self._pick(verdicts, f"{request_key}:{i}")} for i in dict.fromkeys(ids)])
+        return json.dumps(self._pick(self.text_verdicts if text_prompt else self.media_verdicts, request_key))
+
+    async def _upload(self, file, mime_type: str):
+        await asyncio.sleep(self.upload_latency(self.rng))
+        if isinstance(file, (str, os.PathLike)):
+            data = await run_io(Path(file).read_bytes)
+            name = os.path.basename(file)
+        else:
+            data, name = (file.getvalue() if isinstance(file, io.BytesIO) else b""), "buffer"
+        return StubUpload(f"files/stub-{name}", mime_type, len(data), time.monotonic() + self.processing(self.rng),
+                          hashlib.md5(data).hexdigest())
+
+    async def _refresh(self, uploaded):
+        return StubUpload(uploaded.name, uploaded.mime_type, uploaded.size_bytes, uploaded.ready_at, uploaded.digest)
+
+    async def _delete(self, uploaded):
+        self.deleted.append(uploaded.name)
+
+_backend = None
+
+def get_llm() -> LLMBackend:
+    """
+    The configured backend, created on first use (so importing the app never needs a key).
+    """
+    global _backend
+    if _backend is None:
+        if LLM_BACKEND == "stub":
+            _backend = StubBackend()
+            print(f"LLM backend: stub (latency {LLM_STUB_LATENCY}, seed {LLM_STUB_SEED})")
+        elif LLM_BACKEND == "gemini":
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise RuntimeError("GEMINI_API_KEY is not set (or use LLM_BACKEND=stub to run offline)")
+            _backend = GeminiBackend(api_key)
+            print(f"LLM backend: gemini ({LLM_MODEL})")
+        else:
+            raise RuntimeError(f"unknown LLM_BACKEND '{LLM_BACKEND}' (gemini, stub)")
+    return _backend
+
+def llm_stats() -> dict:
+    if _backend is None:
+        return {"backend": LLM_BACKEND}
+    return {"backend": _backend.name, **{k: round(v, 3) for k, v in _backend.stats.items()}}
+
+def set_llm(backend: LLMBackend):
+    """
+    Swaps the backend (tests, benchmarks).
+    """
+    global _backend
+    _backend = backend
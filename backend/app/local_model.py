@@ -0,0 +1,222 @@
+import os
+import json
+import cv2
+import numpy as np
+from pathlib import Path
+from functools import lru_cache
+from PIL import Image
+from scipy import fft, sparse
+from app.utils import FrameAnalyzer, FrameSource, hash_file
+from app.media import open_source
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# the FFT/SVM model trained in server/ (notebook or server/pipeline/train.py)
+LOCAL_MODEL_PATH = Path(os.getenv("LOCAL_MODEL_PATH", BASE_DIR.parent / "server" / "model" / "deepfake_detector.pkl"))
+# off by default: the shipped model was trained on 32x32 CIFAKE thumbnails and calls most
+# real-world photos fake. Turning it on also needs a calibration of that exact model on
+# realistic images (server/pipeline/calibrate.py), which sets the thresholds below which
+# it answers on its own
+LOCAL_MODEL_ENABLED = os.getenv("LOCAL_MODEL_ENABLED", "0") == "1"
+LOCAL_CALIBRATION_PATH = Path(os.getenv("LOCAL_CALIBRATION_PATH", LOCAL_MODEL_PATH.with_suffix(".calibration.json")))
+# frames sampled from a video for the local classifier
+LOCAL_VIDEO_SAMPLES = int(os.getenv("LOCAL_VIDEO_SAMPLES", 5))
+
+# radial bins -> image size the model was trained at
+# CIFAKE.ipynb: 128x128 images, 60 bins (the shipped deepfake_detector.pkl); train.py: 256x256, 128 bins
+FEATURE_LAYOUTS = {60: 128, 128: 256}
+# images per FFT batch (calibration scores a few hundred at once)
+FFT_BATCH_SIZE = 64
+
+_model = None
+_load_failed = False
+# P(fake) at or above "fake" -> "Fake" without asking Gemini, at or below "real" -> "Real"
+# (None: that side never answers locally)
+_thresholds = {"fake": None, "real": None}
+
+def load_calibration(model_path: Path, calibration_path: Path) -> dict:
+    """
+    Thresholds measured for this exact model file. Raises if there are none, or if they
+    were measured for a different model.
+    """
+    if not calibration_path.exists():
+        raise ValueError(f"not calibrated, no {calibration_path.name} (run server/pipeline/calibrate.py on real-world images)")
+    calibration = json.loads(calibration_path.read_text())
+    if calibration.get("model_digest") != hash_file(model_path):
+        raise ValueError(f"{calibration_path.name} was measured for a different model, calibrate again")
+    return {"fake": calibration.get("fake_threshold"), "real": calibration.get("real_threshold")}
+
+def load_model():
+    """
+    Loads the classifier once (at startup). Returns None when it is disabled, uncalibrated
+    or unusable, in which case everything goes to Gemini.
+    """
+    global _model, _load_failed
+    if _model is not None or _load_failed or not LOCAL_MODEL_ENABLED:
+        return _model
+    try:
+        import joblib
+        thresholds = load_calibration(LOCAL_MODEL_PATH, LOCAL_CALIBRATION_PATH)
+        model = joblib.load(LOCAL_MODEL_PATH)
+        if model.n_features_in_ not in FEATURE_LAYOUTS and not os.getenv("LOCAL_MODEL_IMG_SIZE"):
+            raise ValueError(f"unknown feature layout ({model.n_features_in_} bins), set LOCAL_MODEL_IMG_SIZE")
+        _model = model
+        _thresholds.update(thresholds)
+        print(f"Loaded local classifier: {LOCAL_MODEL_PATH.name} ({model.n_features_in_} FFT bins, "
+              f"fake >= {thresholds['fake']}, real <= {thresholds['real']})")
+    except Exception as e:
+        _load_failed = True
+        print(f"Local classifier disabled: {e}")
+    return _model
+
+# the FFT features below are the training code's (server/pipeline/features.py), which the
+# backend can't import; tests/test_local_model.py checks the two give the same numbers
+@lru_cache(maxsize=None)
+def radial_weights(size: int, bins: int):
+    """
+    Sparse (pixels of the half spectrum x bins) matrix that turns a batch of rfft2
+    magnitudes into the azimuthal average of the full fftshift-ed spectrum. The spectrum
+    of a real image is conjugate symmetric, so every rfft2 column but the first (and the
+    last, for even sizes) stands for itself and its mirror and counts twice.
+    """
+    y, x = np.indices((size, size))
+    r_full = np.sqrt((x - size // 2) ** 2 + (y - size // 2) ** 2).astype(int)
+    counts = np.bincount(r_full.ravel())
+
+    # radius of each rfft2 entry: unshifted frequency u -> shifted row (u + size // 2) % size
+    half = size // 2 + 1
+    rows = (np.arange(size) + size // 2) % size
+    cols = np.arange(half) + size // 2
+    r_half = r_full[rows[:, None], cols[None, :] % size]
+
+    weight = np.full((size, half), 2.0)
+    weight[:, 0] = 1.0
+    if size % 2 == 0:
+        weight[:, -1] = 1.0
+
+    r_half, weight = r_half.ravel(), weight.ravel()
+    keep = r_half < bins
+    pixels = np.flatnonzero(keep)
+    values = weight[keep] / counts[r_half[keep]]
+    return sparse.csr_matrix((values, (pixels, r_half[keep])), shape=(size * half, bins))
+
+def fft_features_batch(images: np.ndarray, bins: int) -> np.ndarray:
+    """
+    (N, size, size) grayscale stack -> (N, bins) azimuthal averages of the log-magnitude spectrum.
+    """
+    images = np.asarray(images, dtype=np.float64)
+    n, size = images.shape[0], images.shape[1]
+    weights = radial_weights(size, bins)
+
+    features = np.empty((n, bins))
+    for start in range(0, n, FFT_BATCH_SIZE):
+        spectrum = fft.rfft2(images[start:start + FFT_BATCH_SIZE])
+        magnitude_spectrum = 20 * np.log(np.abs(spectrum) + 1e-9)
+        features[start:start + FFT_BATCH_SIZE] = magnitude_spectrum.reshape(len(spectrum), -1) @ weights
+    return features
+
+def feature_layout(model) -> tuple:
+    """
+    (image size, radial bins) the model's features are computed at.
+    """
+    bins = model.n_features_in_
+    return int(os.getenv("LOCAL_MODEL_IMG_SIZE", FEATURE_LAYOUTS.get(bins, 256))), bins
+
+def fake_probabilities(model, grays: list) -> np.ndarray:
+    """
+    P(fake) of each grayscale image (also used by server/pipeline/calibrate.py), featurized
+    as one batch. Images already at the model's size are used as they are.
+    """
+    size, bins = feature_layout(model)
+    images = np.stack([gray if gray.shape == (size, size) else cv2.resize(gray, (size, size)) for gray in grays])
+    features = fft_features_batch(images, bins)
+    fake_column = list(model.classes_).index(1)
+    return model.predict_proba(features)[:, fake_column]
+
+def predict_fake_probability(grays: list):
+    """
+    Mean P(fake) over one or more grayscale images, or None without a model.
+    """
+    model = load_model()
+    if model is None or not grays:
+        return None
+    return float(fake_probabilities(model, grays).mean())
+
+def calibrate_thresholds(real_scores, fake_scores, max_false_fake: float = 0.01, max_false_real: float = 0.01) -> dict:
+    """
+    Thresholds from P(fake) of labelled realistic images: the lowest "fake" threshold that
+    at most max_false_fake of the real images reach, and the highest "real" threshold that
+    at most max_false_real of the fake images fall under. None when no threshold in
+    [0, 1] does that (the model can't be trusted on that side).
+    """
+    real_scores, fake_scores = np.sort(real_scores), np.sort(fake_scores)
+    allowed = int(max_false_fake * len(real_scores))
+    fake = float(np.nextafter(real_scores[len(real_scores) - 1 - allowed], np.inf))
+    allowed = int(max_false_real * len(fake_scores))
+    real = float(np.nextafter(fake_scores[allowed], -np.inf))
+    return {"fake": fake if fake <= 1.0 else None, "real": real if real >= 0.0 else None}
+
+class FrameClassifier(FrameAnalyzer):
+    """
+    Scores `samples` evenly spaced grayscale frames with the local classifier, so it can
+    ride along on the same FrameSource pass as the other video analyzers.
+    """
+    def __init__(self, samples: int = LOCAL_VIDEO_SAMPLES):
+        self.samples = samples
+        self.grays = []
+
+    def wanted_frames(self, frame_count: int):
+        return {frame_count * (i + 1) // (self.samples + 1) for i in range(self.samples)}
+
+    def visit(self, index, frame, ring):
+        # keep only the model-sized thumbnail; result() featurizes them all in one batch
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if (model := load_model()) is not None:
+            size, _ = feature_layout(model)
+            gray = cv2.resize(gray, (size, size))
+        self.grays.append(gray)
+
+    def result(self) -> dict:
+        return {"probability": predict_fake_probability(self.grays)}
+
+def score_image(image_path):
+    """
+    P(fake) for an image (path or bytes). Runs in the CPU pool.
+    """
+    try:
+        return predict_fake_probability([np.array(Image.open(open_source(image_path)).convert("L"))])
+    except Exception as e:
+        print(f"Local classifier failed: {e}")
+        return None
+
+def score_video(video_path: str):
+    """
+    Mean P(fake) over sampled frames of a video. Runs in the CPU pool.
+    """
+    if load_model() is None:
+        return None
+    try:
+        return FrameSource(video_path).register(FrameClassifier()).run()[0]["probability"]
+    except Exception as e:
+        print(f"Local classifier failed: {e}")
+        return None
+
+def classify(probability):
+    """
+    Turns P(fake) into a fast-path verdict, or None when it falls in the uncertain band.
+    """
+    if probability is None:
+        return None
+    if _thresholds["fake"] is not None and probability >= _thresholds["fake"]:
+        verdict = "Fake"
+    elif _thresholds["real"] is not None and probability <= _thresholds["real"]:
+        verdict = "Real"
+    else:
+        return None
+    return {
+        "thinking_process": f"Local FFT frequency classifier is confident (P(AI)={probability:.3f}); Gemini was not consulted.",
+        "ai_probability": int(round(probability * 100)),
+        "verdict": verdict,
+        "forensics": {"visual_anomalies": []},
+        "fast_path": {"model": LOCAL_MODEL_PATH.name, "probability": round(probability, 4)}
+    }
@@ -1,9 +1,56 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse, Response, FileResponse
 from pydantic import BaseModel
-from typing import Optional
-from app.core import analyze_video_logic, analyze_text_logic, analyze_image_logic
+from typing import Optional, List
+from app.core import analyze_video_logic, analyze_text_logic, analyze_image_logic, text_batcher
+from app.executor import shutdown_pools
+from app.http_client import close_http
+from app.cache import cache_stats, fast_path_stats
+from app.local_model import load_model
+from app.text_model import load_text_model
+from app.llm import llm_stats
+from app.phash_index import load_index, save_index
+from app.batch import stream_batch, BATCH_MAX_ITEMS
+from app.jobs import submit_job, get_job, queued_jobs, stream_events, start_job_workers, stop_job_workers
+from app.telemetry import TelemetryMiddleware, JOBS_QUEUED, PROFILE_TOKEN, configure_tracing, shutdown_tracing, metrics_payload, profile_path
 
 app = FastAPI(title="AI-Detector Backend")
+app.add_middleware(TelemetryMiddleware)
+
+@app.on_event("startup")
+async def on_startup():
+    # load the classifier before the process pool forks, so every worker inherits it
+    load_model()
+    load_text_model()
+    load_index()
+    configure_tracing()
+    start_job_workers()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await stop_job_workers()
+    save_index()
+    shutdown_pools()
+    await close_http()
+    shutdown_tracing()
+
+async def unless_disconnected(request: Request, coro, poll_interval: float = 0.5):
+    """
+    Awaits coro, cancelling it if the client goes away first (nobody would read the
+    result, and a video analysis can hold a Gemini upload for minutes).
+    """
+    task = asyncio.ensure_future(coro)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=poll_interval)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            print(f"Client disconnected, cancelling {request.url.path}")
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            # 499: client closed request (nobody receives it anyway)
+            return Response(status_code=499)
 
 # Accepts url OR text (next addition is audio)
 class AnalyzeRequest(BaseModel):
@@ -15,7 +62,7 @@ def health_check():
     return {"status": "active", "service": "AI-Detector"}
 
 @app.post("/analyze")
-async def analyze_content(request: AnalyzeRequest):
+async def analyze_content(request: AnalyzeRequest, http_request: Request):
     """
     Smart Endpoint:
     - If 'url' is provided -> Video Analysis
@@ -23,7 +70,7 @@ async def analyze_content(request: AnalyzeRequest):
     """
     if request.url:
         print(f"Received Video Request: {request.url}")
-        return await analyze_video_logic(request.url)
+        return await unless_disconnected(http_request, analyze_video_logic(request.url))
     
     elif request.text:
         print(f"Received Text Request: {request.text[:30]}...")
@@ -36,6 +83,118 @@ class ImageRequest(BaseModel):
     url: str
 
 @app.post("/analyze/image")
-async def analyze_image_endpoint(request: ImageRequest):
+async def analyze_image_endpoint(request: ImageRequest, http_request: Request):
     print(f"Received Image Request: {request.url}")
-    return await analyze_image_logic(request.url)
\ No newline at end of file
+    return await unless_disconnected(http_request, analyze_image_logic(request.url))
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    url: Optional[str] = None
+    text: Optional[str] = None
+    image_url: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+
+@app.post("/analyze/batch")
+async def analyze_batch_endpoint(request: BatchRequest):
+    """
+    Verdicts for a feed/timeline worth of items (same fields as /jobs, plus an optional id).
+    Streams one NDJSON line per item as it finishes: {"index", "id", "type", "result"}.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Please provide at least one item")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+
+    print(f"Received Batch Request: {len(request.items)} items")
+    return StreamingResponse(
+        stream_batch([item.model_dump() for item in request.items]),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"}
+    )
+
+@app.get("/cache/stats")
+def cache_stats_endpoint():
+    """
+    Hit/miss counters per cache level (url, platform, content, text).
+    """
+    return cache_stats()
+
+@app.get("/stats")
+def stats_endpoint():
+    """
+    Cache counters plus the share of traffic answered by the local classifier (fast path).
+    text_batching is this worker's micro-batcher (batched calls, items in them, per-item retries),
+    llm the time this worker spent waiting on the LLM backend.
+    """
+    return {"cache": cache_stats(), "fast_path": fast_path_stats(), "text_batching": text_batcher.stats, "llm": llm_stats()}
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """
+    Prometheus metrics: stage latency histograms, cache / LLM / fast-path counters,
+    downloaded bytes, in-flight requests and jobs, pool queue depth.
+    """
+    JOBS_QUEUED.set(queued_jobs())
+    body, content_type = metrics_payload()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/debug/profiles/{profile_id}")
+def profile_endpoint(profile_id: str, token: str = None):
+    """
+    The pyinstrument report of a request sent with `X-Profile: <PROFILE_TOKEN>`
+    (its id comes back in the X-Profile-Id response header).
+    """
+    if not PROFILE_TOKEN or token != PROFILE_TOKEN:
+        raise HTTPException(status_code=403, detail="Profiling is disabled or the token is wrong")
+    if not (path := profile_path(profile_id)):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/html")
+
+class JobRequest(BaseModel):
+    url: Optional[str] = None
+    text: Optional[str] = None
+    image_url: Optional[str] = None
+
+@app.post("/jobs", status_code=202)
+def create_job(request: JobRequest):
+    """
+    Job mode: returns a job id right away and runs the analysis in the background.
+    Poll GET /jobs/{id} or follow GET /jobs/{id}/events (server-sent events).
+    """
+    if request.url:
+        job_id = submit_job("video", request.url)
+    elif request.image_url:
+        job_id = submit_job("image", request.image_url)
+    elif request.text:
+        job_id = submit_job("text", request.text)
+    else:
+        raise HTTPException(status_code=400, detail="Please provide 'url', 'image_url' or 'text'")
+
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events"
+    }
+
+@app.get("/jobs/{job_id}")
+def job_status_endpoint(job_id: str):
+    if not (job := get_job(job_id)):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+def job_events_endpoint(job_id: str, request: Request):
+    """
+    Stage events (queued, started, downloaded, metadata, ela, movement, uploaded, verdict)
+    pushed as server-sent events until the job finishes.
+    """
+    if not get_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        stream_events(job_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,79 @@
+import io
+import os
+import glob
+import uuid
+import shutil
+import tempfile
+
+# where downloaded media lives while it's analyzed: RAM-backed /dev/shm when it exists and
+# has room, so yt-dlp, ffprobe, OpenCV and the process pool all share page-cache pages
+# instead of round-tripping through the (overlay) disk
+MEDIA_DIR = os.getenv("MEDIA_DIR")
+# /dev/shm is only used while it has at least this much free (docker's default is 64MB)
+MEDIA_SHM_MIN_FREE = int(os.getenv("MEDIA_SHM_MIN_FREE", 512 * 1024 * 1024))
+
+SHM_DIR = "/dev/shm"
+
+# magic bytes -> mime type, for media we only hold as bytes
+MAGIC = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"\x1a\x45\xdf\xa3", "video/webm"),
+]
+
+def media_dir() -> str:
+    if MEDIA_DIR:
+        return MEDIA_DIR
+    try:
+        if os.access(SHM_DIR, os.W_OK) and shutil.disk_usage(SHM_DIR).free >= MEDIA_SHM_MIN_FREE:
+            return SHM_DIR
+    except OSError:
+        pass
+    return tempfile.gettempdir()
+
+def new_media_base() -> str:
+    """
+    A fresh path prefix (no extension) in the media dir. Everything written under it
+    (final file, .part, merge leftovers) is removed by remove_media().
+    """
+    return os.path.join(media_dir(), f"verifai-{uuid.uuid4()}")
+
+def remove_media(path: str):
+    if not path:
+        return
+    base = os.path.splitext(path)[0]
+    for leftover in set(glob.glob(f"{glob.escape(base)}.*")) | {path}:
+        try:
+            os.remove(leftover)
+        except FileNotFoundError:
+            pass
+
+def is_buffer(source) -> bool:
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+def open_source(source):
+    """
+    Something PIL/ffprobe-style readers accept: the path itself, or a zero-copy view of a buffer.
+    """
+    return io.BytesIO(source) if is_buffer(source) else source
+
+def sniff_mime(data) -> str:
+    head = bytes(data[:16])
+    for magic, mime in MAGIC:
+        if head.startswith(magic):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"heic", b"heix", b"mif1", b"msf1"):
+            return "image/heic"
+        if brand == b"qt  ":
+            return "video/quicktime"
+        return "video/mp4"
+    return "application/octet-stream"
@@ -0,0 +1,102 @@
+import os
+import asyncio
+
+# most items sent in one batched call (1 = no batching)
+TEXT_BATCH_SIZE = int(os.getenv("TEXT_BATCH_SIZE", 16))
+# how long the first queued item waits for company before its batch goes out
+TEXT_BATCH_WAIT_MS = float(os.getenv("TEXT_BATCH_WAIT_MS", 5))
+# characters per batched call (keeps the prompt well inside the context window)
+TEXT_BATCH_MAX_CHARS = int(os.getenv("TEXT_BATCH_MAX_CHARS", 100_000))
+
+class MicroBatcher:
+    """
+    Collects concurrent calls into batches: an item waits at most `max_wait` seconds
+    (or until `max_batch` items / `max_size` total size are queued), then the whole batch
+    goes to `run_batch(items)` in one call and each caller gets its own result back.
+
+    `run_batch` returns one result per item, in order; None marks an item it couldn't
+    answer (dropped from a structured response, say). Those items, and every item of a
+    batch that raised, are retried one by one with `run_single(item)`.
+    """
+    def __init__(self, run_batch, run_single, max_batch: int = TEXT_BATCH_SIZE,
+                 max_wait: float = TEXT_BATCH_WAIT_MS / 1000, max_size: int = TEXT_BATCH_MAX_CHARS, size=len):
+        self.run_batch = run_batch
+        self.run_single = run_single
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_size = max_size
+        self.size = size
+        self.pending = []
+        self.pending_size = 0
+        self.timer = None
+        self.tasks = set()
+        self.stats = {"batches": 0, "items": 0, "fallbacks": 0}
+
+    async def submit(self, item):
+        """
+        Queues one item and waits for its result.
+        """
+        if self.max_batch <= 1:
+            return await self.run_single(item)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        item_size = self.size(item)
+        # an item that would overflow the current batch starts the next one
+        if self.pending and self.pending_size + item_size > self.max_size:
+            self._flush()
+        self.pending.append((item, future))
+        self.pending_size += item_size
+
+        if len(self.pending) >= self.max_batch or self.pending_size >= self.max_size:
+            self._flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending, self.pending_size = self.pending, [], 0
+        # callers that gave up (client disconnected) don't need an answer
+        batch = [(item, future) for item, future in batch if not future.done()]
+        if batch:
+            self._spawn(self._run(batch))
+
+    def _spawn(self, coro):
+        # keep a reference, the event loop only holds weak ones
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, batch: list):
+        if len(batch) == 1:
+            return await self._single(*batch[0])
+
+        self.stats["batches"] += 1
+        self.stats["items"] += len(batch)
+        try:
+            results = await self.run_batch([item for item, _ in batch])
+        except Exception as e:
+            print(f"Batched call failed ({len(batch)} items), retrying one by one: {e}")
+            results = []
+        # a short answer leaves the rest unanswered, not hanging
+        results = list(results) + [None] * (len(batch) - len(results))
+
+        for (item, future), result in zip(batch, results):
+            if result is None:
+                self.stats["fallbacks"] += 1
+                self._spawn(self._single(item, future))
+            elif not future.done():
+                future.set_result(result)
+
+    async def _single(self, item, future):
+        try:
+            result = await self.run_single(item)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
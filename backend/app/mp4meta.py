@@ -0,0 +1,229 @@
+"""
+Minimal ISO-BMFF (mp4/mov/m4v/3gp) reader for the container tags extract_video_metadata
+looks at. Walks the box tree without touching the media data (mdat is skipped with a
+seek), so it costs a few small reads instead of an ffprobe process.
+Tag names follow what ffprobe prints for the same file.
+"""
+
+import struct
+from datetime import datetime, timedelta, timezone
+
+# ffprobe's format_name for everything the mov demuxer handles
+FORMAT_NAME = "mov,mp4,m4a,3gp,3g2,mj2"
+# the moov box holds the sample tables; anything bigger than this is not worth reading here
+MAX_MOOV_BYTES = 64 * 1024 * 1024
+
+# iTunes-style / QuickTime udta atoms -> ffprobe tag names (libavformat/mov.c)
+ATOM_TAGS = {
+    b"\xa9too": "encoder",
+    b"\xa9enc": "encoder",
+    b"\xa9swr": "encoder",
+    b"\xa9nam": "title",
+    b"\xa9ART": "artist",
+    b"\xa9aut": "artist",
+    b"\xa9alb": "album",
+    b"\xa9day": "date",
+    b"\xa9cmt": "comment",
+    b"desc": "description",
+    b"\xa9xyz": "location",
+    b"\xa9mak": "make",
+    b"\xa9mod": "model",
+    b"\xa9cpy": "copyright",
+    b"cprt": "copyright",
+    b"\xa9gen": "genre",
+}
+
+# mp4 timestamps count seconds from 1904-01-01
+MP4_EPOCH = datetime(1904, 1, 1, tzinfo=timezone.utc)
+
+class NotMP4(Exception):
+    pass
+
+def _boxes(data: bytes, start: int = 0, end: int = None):
+    """
+    Yields (type, payload start, payload end) for the boxes in data[start:end].
+    """
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            return
+        yield box_type, pos + header, pos + size
+        pos += size
+
+def _read_top_level(f):
+    """
+    Returns (ftyp payload, moov payload) reading only those two boxes.
+    """
+    ftyp = moov = None
+    while ftyp is None or moov is None:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        size, box_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            large = f.read(8)
+            if len(large) < 8:
+                raise NotMP4("truncated box header")
+            size = struct.unpack(">Q", large)[0]
+            header_size = 16
+        if ftyp is None and box_type != b"ftyp":
+            # every ISO-BMFF file starts with ftyp (or, for old QuickTime, a wide/free/mdat/moov box)
+            if box_type not in (b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot"):
+                raise NotMP4(f"unexpected first box {box_type!r}")
+        if size == 0:
+            payload_size = None # runs to the end of the file
+        elif size < header_size:
+            raise NotMP4("corrupt box size")
+        else:
+            payload_size = size - header_size
+
+        if box_type in (b"ftyp", b"moov"):
+            if payload_size is None or payload_size > MAX_MOOV_BYTES:
+                raise NotMP4(f"{box_type.decode()} box too large")
+            payload = f.read(payload_size)
+            if len(payload) < payload_size:
+                raise NotMP4(f"truncated {box_type.decode()} box")
+            if box_type == b"ftyp":
+                ftyp = payload
+            else:
+                moov = payload
+        elif payload_size is None:
+            break
+        else:
+            f.seek(payload_size, 1) # skip mdat & co without reading them
+    if moov is None:
+        raise NotMP4("no moov box")
+    return ftyp, moov
+
+def _text(value: bytes) -> str:
+    return value.decode("utf-8", errors="replace").rstrip("\x00")
+
+def _ilst_value(data: bytes, start: int, end: int):
+    for box_type, payload, box_end in _boxes(data, start, end):
+        if box_type == b"data" and box_end - payload >= 8:
+            data_type = struct.unpack_from(">I", data, payload)[0] & 0xFFFFFF
+            value = data[payload + 8:box_end]
+            if data_type in (1, 0): # UTF-8 text (0 = implicit, used by some writers for text)
+                return _text(value)
+            if data_type == 21 and len(value) in (1, 2, 4, 8): # big-endian signed int
+                return str(int.from_bytes(value, "big", signed=True))
+    return None
+
+def _parse_meta(data: bytes, start: int, end: int, tags: dict):
+    # "meta" is a full box (4 bytes version/flags) in mp4, but a plain container in QuickTime
+    if end - start >= 4 and data[start:start + 4] == b"\x00\x00\x00\x00":
+        start += 4
+    keys = []
+    for box_type, payload, box_end in _boxes(data, start, end):
+        if box_type == b"keys":
+            # QuickTime mdta keys (com.apple.quicktime.make, ...); ilst items refer to them by index
+            count = struct.unpack_from(">I", data, payload + 4)[0]
+            pos = payload + 8
+            for _ in range(count):
+                size = struct.unpack_from(">I", data, pos)[0]
+                if size < 8:
+                    raise NotMP4("corrupt keys box")
+                keys.append(_text(data[pos + 8:pos + size]))
+                pos += size
+        elif box_type == b"ilst":
+            for item_type, item_payload, item_end in _boxes(data, payload, box_end):
+                value = _ilst_value(data, item_payload, item_end)
+                if value is None:
+                    continue
+                index = int.from_bytes(item_type, "big")
+                if keys and 1 <= index <= len(keys):
+                    tags[keys[index - 1]] = value
+                elif item_type in ATOM_TAGS:
+                    tags.setdefault(ATOM_TAGS[item_type], value)
+
+def _language(code: int):
+    # packed ISO-639-2 (3 x 5 bits); below 0x400 it's an old Macintosh code, 0 = English
+    if code == 0:
+        return "eng"
+    if code < 0x400 or code == 0x7FFF:
+        return None
+    language = "".join(chr(((code >> shift) & 0x1F) + 0x60) for shift in (10, 5, 0))
+    return None if language == "und" else language
+
+def _parse_loci(data: bytes, start: int, end: int, tags: dict):
+    # 3GPP location box: version/flags, language, name, role, then 16.16 fixed longitude/latitude/altitude
+    language = _language(struct.unpack_from(">H", data, start + 4)[0])
+    pos = data.index(b"\x00", start + 6, end) + 2 # skip the name and the role byte
+    longitude, latitude, altitude = (v / 65536 for v in struct.unpack_from(">iii", data, pos))
+    location = f"{latitude:+08.4f}{longitude:+09.4f}"
+    if altitude:
+        location += f"{altitude:+.4f}"
+    tags["location"] = location + "/"
+    if language:
+        tags[f"location-{language}"] = location + "/"
+
+def _parse_udta(data: bytes, start: int, end: int, tags: dict):
+    for box_type, payload, box_end in _boxes(data, start, end):
+        if box_type == b"meta":
+            _parse_meta(data, payload, box_end, tags)
+        elif box_type == b"loci" and box_end - payload > 18:
+            _parse_loci(data, payload, box_end, tags)
+        elif box_type in ATOM_TAGS and box_end - payload >= 4:
+            # QuickTime text atom: 16-bit length, 16-bit language, text
+            length = struct.unpack_from(">H", data, payload)[0]
+            tags.setdefault(ATOM_TAGS[box_type], _text(data[payload + 4:payload + 4 + length]))
+
+def _parse_mvhd(data: bytes, start: int):
+    version = data[start]
+    if version == 1:
+        created, _, timescale, duration = struct.unpack_from(">QQIQ", data, start + 4)
+    else:
+        created, _, timescale, duration = struct.unpack_from(">IIII", data, start + 4)
+    return created, (duration / timescale if timescale else None)
+
+def read_mp4_metadata(source) -> dict:
+    """
+    Returns the ffprobe-shaped {"format_name", "duration", "tags"} for an ISO-BMFF file
+    (path or file object). Raises NotMP4 for anything it can't parse.
+    """
+    if hasattr(source, "read"):
+        ftyp, moov = _read_top_level(source)
+    else:
+        with open(source, "rb") as f:
+            ftyp, moov = _read_top_level(f)
+
+    try:
+        return _parse_boxes(ftyp, moov)
+    except (struct.error, ValueError, IndexError, OverflowError) as e:
+        # truncated / corrupt boxes (short mvhd, loci without its terminator, creation
+        # time past year 9999, ...)
+        raise NotMP4(f"malformed box: {e}")
+
+def _parse_boxes(ftyp: bytes, moov: bytes) -> dict:
+    tags = {}
+    if ftyp and len(ftyp) >= 8:
+        tags["major_brand"] = _text(ftyp[:4])
+        tags["minor_version"] = str(struct.unpack_from(">I", ftyp, 4)[0])
+        tags["compatible_brands"] = _text(ftyp[8:])
+
+    duration = None
+    for box_type, payload, box_end in _boxes(moov):
+        if box_type == b"mvhd":
+            created, duration = _parse_mvhd(moov, payload)
+            if created:
+                stamp = MP4_EPOCH + timedelta(seconds=created)
+                tags["creation_time"] = stamp.strftime("%Y-%m-%dT%H:%M:%S.000000Z")
+        elif box_type == b"udta":
+            _parse_udta(moov, payload, box_end, tags)
+        elif box_type == b"meta":
+            _parse_meta(moov, payload, box_end, tags)
+
+    return {
+        "format_name": FORMAT_NAME,
+        "duration": f"{duration:.6f}" if duration is not None else None,
+        "tags": tags
+    }
@@ -0,0 +1,269 @@
+import os
+import json
+import uuid
+import threading
+import contextlib
+import numpy as np
+from pathlib import Path
+
+try:
+    import fcntl # workers sharing one index file take turns writing it
+except ImportError:
+    fcntl = None # Windows: saves are only serialized within a process
+
+# max Hamming distance (out of 64 bits) that still counts as the same picture
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", 6))
+PHASH_INDEX_PATH = Path(os.getenv("PHASH_INDEX_PATH", Path(__file__).resolve().parent.parent / "phash_index.npz"))
+# write the index to disk after this many new items (plus once on shutdown)
+PHASH_SAVE_EVERY = int(os.getenv("PHASH_SAVE_EVERY", 50))
+
+class MultiIndexHash:
+    """
+    Multi-index hashing over 64-bit hashes (Norouzi et al.).
+    Each hash is split into 4 chunks of 16 bits, and every chunk is an exact-match table.
+    If two hashes are within Hamming distance r, at least one chunk differs by at most
+    r // 4 bits (pigeonhole), so a query only probes the few chunk values within that
+    distance and verifies the handful of candidates it finds.
+    """
+    CHUNKS = 4
+    CHUNK_BITS = 16
+
+    def __init__(self):
+        self.tables = [{} for _ in range(self.CHUNKS)]
+        self.values = []    # entry -> hash
+        self.item_ids = []  # entry -> item id
+
+    def _chunks(self, value: int):
+        mask = (1 << self.CHUNK_BITS) - 1
+        return [(value >> (i * self.CHUNK_BITS)) & mask for i in range(self.CHUNKS)]
+
+    def _neighbours(self, chunk: int, radius: int):
+        # every chunk value within `radius` flipped bits (radius is 0-1 for sane thresholds)
+        found = [chunk]
+        for _ in range(radius):
+            found = list({c ^ (1 << bit) for c in found for bit in range(self.CHUNK_BITS)} | set(found))
+        return found
+
+    def add(self, value: int, item_id: int):
+        entry = len(self.values)
+        self.values.append(value)
+        self.item_ids.append(item_id)
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            table.setdefault(chunk, []).append(entry)
+
+    @classmethod
+    def from_arrays(cls, values: np.ndarray, item_ids: np.ndarray) -> "MultiIndexHash":
+        """
+        Bulk build for startup: groups each chunk column with one argsort instead of
+        inserting entries one by one.
+        """
+        index = cls()
+        index.values = values.tolist()
+        index.item_ids = item_ids.tolist()
+        entries = np.arange(len(values))
+        mask = np.uint64((1 << cls.CHUNK_BITS) - 1)
+        for i in range(cls.CHUNKS):
+            chunks = (values >> np.uint64(i * cls.CHUNK_BITS)) & mask
+            order = np.argsort(chunks, kind="stable")
+            keys, starts = np.unique(chunks[order], return_index=True)
+            ordered = entries[order].tolist()
+            bounds = starts.tolist() + [len(ordered)]
+            index.tables[i] = {key: ordered[a:b] for key, a, b in zip(keys.tolist(), bounds, bounds[1:])}
+        return index
+
+    def search(self, value: int, radius: int) -> list:
+        """
+        Returns [(distance, item_id)] for every stored hash within radius.
+        """
+        candidates = set()
+        probe_radius = radius // self.CHUNKS
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            for probe in self._neighbours(chunk, probe_radius):
+                candidates.update(table.get(probe, ()))
+
+        matches = []
+        for entry in candidates:
+            distance = (self.values[entry] ^ value).bit_count()
+            if distance <= radius:
+                matches.append((distance, self.item_ids[entry]))
+        return matches
+
+class NearDuplicateIndex:
+    """
+    In-process index of perceptual hashes -> previously judged verdicts.
+    An item (one image, or one video) can own several hashes (sampled keyframes).
+    Each uvicorn worker keeps its own copy; they all load the same file at startup, and
+    every save first merges in what the other workers saved since (items are told apart
+    by their cache key), so no worker's entries are lost to another's write.
+    """
+    def __init__(self):
+        self.table = MultiIndexHash()
+        self.items = []     # item_id -> {"key": cache key, "verdict": compact verdict}
+        self.keys = set()
+        self.unsaved = 0
+        self.saving = False
+        self.lock = threading.Lock()        # table/items, held briefly (queries run on the event loop)
+        self.save_lock = threading.Lock()   # one save at a time
+
+    def __len__(self):
+        return len(self.items)
+
+    def clear(self):
+        with self.lock:
+            self.table, self.items, self.keys = MultiIndexHash(), [], set()
+            self.unsaved = 0
+
+    def add(self, phashes: list, key: str, verdict: dict) -> int:
+        values = [int(p, 16) for p in phashes if p]
+        if not values:
+            return -1
+        with self.lock:
+            item_id = len(self.items)
+            self.items.append({"key": key, "verdict": verdict})
+            self.keys.add(key)
+            for value in values:
+                self.table.add(value, item_id)
+            self.unsaved += 1
+            return item_id
+
+    def query(self, phashes: list, radius: int = PHASH_MAX_DISTANCE):
+        """
+        Finds the item matching the most query hashes within radius.
+        For videos at least half the sampled keyframes have to match, so one
+        shared frame (logo, black title card) is not enough.
+        Returns (item, mean distance of the matching frames) or (None, None).
+        """
+        values = [int(p, 16) for p in phashes if p]
+        if not values:
+            return None, None
+
+        with self.lock:
+            best = {}
+            for value in values:
+                closest = {}
+                for distance, item_id in self.table.search(value, radius):
+                    closest[item_id] = min(distance, closest.get(item_id, distance))
+                for item_id, distance in closest.items():
+                    best.setdefault(item_id, []).append(distance)
+
+            if not best:
+                return None, None
+
+            item_id, distances = max(best.items(), key=lambda kv: (len(kv[1]), -sum(kv[1])))
+            if len(distances) * 2 < len(values):
+                return None, None
+            return self.items[item_id], sum(distances) / len(distances)
+
+    def save(self, path: Path = PHASH_INDEX_PATH):
+        """
+        Compact on-disk format: uint64 hash array + int32 item ids + one UTF-8 JSON blob for the items.
+        Merges in the file's items first, then writes a uniquely named temp file and renames
+        it, so neither a crash nor a concurrent save ever leaves a half-written index.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with self.save_lock, _file_lock(path):
+                if path.exists():
+                    self.merge(*_read(path))
+
+                # copy under the lock, serialize outside it: queries keep running meanwhile
+                with self.lock:
+                    values, item_ids, items = list(self.table.values), list(self.table.item_ids), list(self.items)
+                    self.unsaved = 0
+                hashes = np.array(values, dtype=np.uint64)
+                item_ids = np.array(item_ids, dtype=np.int32)
+                items = np.frombuffer(json.dumps(items, separators=(",", ":")).encode(), dtype=np.uint8)
+
+                tmp_path = path.with_name(f"{path.name}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp")
+                try:
+                    with open(tmp_path, "wb") as f:
+                        np.savez(f, hashes=hashes, item_ids=item_ids, items=items)
+                    os.replace(tmp_path, path)
+                finally:
+                    if tmp_path.exists():
+                        tmp_path.unlink()
+        finally:
+            self.saving = False
+
+    def merge(self, hashes: np.ndarray, item_ids: np.ndarray, items: list) -> int:
+        """
+        Adds the saved items this index doesn't have yet (by cache key). Returns how many.
+        """
+        with self.lock:
+            new_ids = {}
+            for old_id, item in enumerate(items):
+                if item["key"] not in self.keys:
+                    new_ids[old_id] = len(self.items)
+                    self.items.append(item)
+                    self.keys.add(item["key"])
+            for value, old_id in zip(hashes.tolist(), item_ids.tolist()):
+                if old_id in new_ids:
+                    self.table.add(value, new_ids[old_id])
+            return len(new_ids)
+
+    def load(self, path: Path = PHASH_INDEX_PATH):
+        """
+        Replaces the contents with the saved index (no-op if there is no file yet).
+        """
+        if not Path(path).exists():
+            return
+        hashes, item_ids, items = _read(path)
+        table = MultiIndexHash.from_arrays(hashes, item_ids)
+
+        with self.lock:
+            self.table, self.items, self.keys = table, items, {item["key"] for item in items}
+            self.unsaved = 0
+
+    def claim_save(self) -> bool:
+        """
+        True when enough items were added since the last save and no save is running;
+        the caller then has to run save(). Overlapping requests get False.
+        """
+        with self.lock:
+            if self.saving or self.unsaved < PHASH_SAVE_EVERY:
+                return False
+            self.saving = True
+            return True
+
+def _read(path: Path):
+    with np.load(path, allow_pickle=False) as data:
+        return data["hashes"], data["item_ids"], json.loads(data["items"].tobytes())
+
+@contextlib.contextmanager
+def _file_lock(path: Path):
+    if fcntl is None:
+        yield
+        return
+    with open(path.with_name(path.name + ".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def compact_verdict(result: dict) -> dict:
+    """
+    The small part of a result worth keeping forever in the index
+    (the full result lives in Redis and expires).
+    """
+    return {
+        field: result[field]
+        for field in ("verdict", "ai_probability", "Detector_score")
+        if field in result
+    }
+
+near_duplicates = NearDuplicateIndex()
+
+def load_index(path: Path = PHASH_INDEX_PATH):
+    try:
+        near_duplicates.load(path)
+        print(f"Loaded near-duplicate index: {len(near_duplicates)} items")
+    except Exception as e:
+        print(f"Could not load near-duplicate index ({e}), starting empty")
+
+def save_index(path: Path = PHASH_INDEX_PATH):
+    try:
+        near_duplicates.save(path)
+    except Exception as e:
+        print(f"Could not save near-duplicate index: {e}")
@@ -0,0 +1,139 @@
+import os
+import time
+import asyncio
+from app.cache import cache
+from app.executor import run_io
+from app.timings import timed
+from app.telemetry import FILE_POLLS, FILE_PROCESSING
+
+# waiting for an uploaded file to leave PROCESSING: first retry interval, growth factor,
+# longest interval, and how long a request may wait in total before giving up
+GEMINI_POLL_INITIAL = float(os.getenv("GEMINI_POLL_INITIAL", 0.25))
+GEMINI_POLL_BACKOFF = float(os.getenv("GEMINI_POLL_BACKOFF", 1.5))
+GEMINI_POLL_MAX = float(os.getenv("GEMINI_POLL_MAX", 5))
+GEMINI_PROCESSING_DEADLINE = float(os.getenv("GEMINI_PROCESSING_DEADLINE", 300))
+# the first poll aims this far into the predicted processing time (a bit early beats a bit late)
+GEMINI_POLL_AIM = float(os.getenv("GEMINI_POLL_AIM", 0.9))
+
+class ProcessingTimeModel:
+    """
+    Learns how long Gemini takes to process an upload of a given size:
+    seconds ~ intercept + slope * MB, fitted by exponentially weighted least squares over
+    recent uploads (newer uploads count more, so it follows Gemini's load).
+    The running means live in a Redis hash, so every worker learns from every upload.
+    The methods are blocking Redis calls: call them through run_io() from async code.
+    """
+    def __init__(self, redis_client, key: str = "llm:processing_model", alpha: float = 0.2, min_samples: int = 3):
+        self.redis = redis_client
+        self.key = key
+        self.alpha = alpha
+        self.min_samples = min_samples
+
+    def _load(self) -> dict:
+        return {k: float(v) for k, v in self.redis.hgetall(self.key).items()}
+
+    def observe(self, size_bytes: int, seconds: float):
+        x, y = size_bytes / 2**20, seconds
+        state = self._load()
+        if not state:
+            state = {"n": 0, "x": x, "y": y, "xx": x * x, "xy": x * y}
+        else:
+            a = self.alpha
+            for name, value in (("x", x), ("y", y), ("xx", x * x), ("xy", x * y)):
+                state[name] = (1 - a) * state[name] + a * value
+        state["n"] += 1
+        # concurrent updates from other workers may overwrite each other: fine for a running estimate
+        self.redis.hset(self.key, mapping=state)
+
+    def predict(self, size_bytes: int):
+        """
+        Expected processing seconds, or None until enough uploads have been seen.
+        """
+        state = self._load()
+        if state.get("n", 0) < self.min_samples:
+            return None
+        x = size_bytes / 2**20
+        variance = state["xx"] - state["x"] ** 2
+        if variance < 1e-6:
+            # every upload so far was about the same size
+            return max(0.0, state["y"])
+        slope = max(0.0, (state["xy"] - state["x"] * state["y"]) / variance)
+        intercept = state["y"] - slope * state["x"]
+        return max(0.0, intercept + slope * x)
+
+processing_model = ProcessingTimeModel(cache)
+
+# deletions nobody awaits (their request was cancelled): the loop only keeps weak
+# references to tasks, so they are held here until they finish
+_cleanups = set()
+
+def poll_delays(predicted: float = None):
+    """
+    Sleeps between polls: one long first wait landing just before the predicted ready time
+    (when there is a prediction), then short intervals growing by GEMINI_POLL_BACKOFF.
+    """
+    if predicted:
+        yield max(GEMINI_POLL_INITIAL, predicted * GEMINI_POLL_AIM)
+    delay = GEMINI_POLL_INITIAL
+    while True:
+        yield delay
+        delay = min(delay * GEMINI_POLL_BACKOFF, GEMINI_POLL_MAX)
+
+async def wait_until_processed(uploaded, refresh, delete=None, size_bytes: int = None,
+                               deadline: float = GEMINI_PROCESSING_DEADLINE, model: ProcessingTimeModel = processing_model):
+    """
+    Polls `await refresh(uploaded)` until the file's state leaves PROCESSING and returns the
+    final file. Raises TimeoutError after `deadline` seconds. On timeout, when processing
+    FAILED, or when the caller is cancelled (client gone), the file is deleted with
+    `await delete(file)`.
+    """
+    size_bytes = size_bytes if size_bytes is not None else (getattr(uploaded, "size_bytes", None) or 0)
+    predicted = await run_io(model.predict, size_bytes)
+    start = time.monotonic()
+    last_pending = start
+    outcome = "error"
+
+    try:
+        with timed("llm", "processing"):
+            for delay in poll_delays(predicted):
+                remaining = deadline - (time.monotonic() - start)
+                if remaining <= 0:
+                    outcome = "timeout"
+                    raise TimeoutError(f"Gemini is still processing the upload after {deadline:.0f}s")
+                await asyncio.sleep(min(delay, remaining))
+
+                uploaded = await refresh(uploaded)
+                FILE_POLLS.inc()
+                if uploaded.state.name != "PROCESSING":
+                    break
+                last_pending = time.monotonic()
+
+        # it became ready somewhere between the last two polls; ready on the very first poll
+        # only bounds it from above (learning that nudges an early aim a little earlier)
+        ready_after = time.monotonic() - start
+        if last_pending > start:
+            ready_after = (last_pending - start + ready_after) / 2
+        outcome = "failed" if uploaded.state.name == "FAILED" else "ready"
+        if outcome == "ready":
+            await run_io(model.observe, size_bytes, ready_after)
+        print(f"Gemini processed {size_bytes / 2**20:.1f} MB in ~{ready_after:.1f}s "
+              f"(predicted {f'{predicted:.1f}s' if predicted is not None else 'n/a'})")
+        return uploaded
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        FILE_PROCESSING.labels(outcome).inc()
+        if outcome in ("timeout", "failed", "cancelled") and delete is not None:
+            # don't leave an orphaned or unusable upload behind; on cancellation this can't be awaited here
+            cleanup = asyncio.ensure_future(_delete_quietly(delete, uploaded))
+            _cleanups.add(cleanup)
+            cleanup.add_done_callback(_cleanups.discard)
+            if outcome != "cancelled":
+                await cleanup
+
+async def _delete_quietly(delete, uploaded):
+    try:
+        await delete(uploaded)
+    except Exception as e:
+        print(f"Could not delete upload {getattr(uploaded, 'name', '?')}: {e}")
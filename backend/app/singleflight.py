@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+from redis.exceptions import WatchError
+from app.executor import run_io
+
+# how long the cluster lock outlives its holder: the holder renews it every third of
+# this while it works, so it only runs out when that worker died
+SINGLEFLIGHT_LOCK_TTL = int(os.getenv("SINGLEFLIGHT_LOCK_TTL", 600))
+# how long a follower waits for another worker's result before giving up
+SINGLEFLIGHT_WAIT_TIMEOUT = int(os.getenv("SINGLEFLIGHT_WAIT_TIMEOUT", 900))
+
+class SingleFlight:
+    """
+    Request coalescing: concurrent calls for the same key share one execution.
+
+    In-process, the first caller starts the work as a task and everyone else awaits
+    that same task. Across uvicorn workers, whoever wins a Redis SET NX lock does the
+    work and PUBLISHes the result; the other workers subscribe and wait for it.
+    The holder keeps renewing the lock while it works; if it dies, the lock expires
+    without a message and a waiter takes over.
+
+    The wrapped function is expected to check and fill the result cache itself, so a
+    waiter that missed the message finds the answer in the cache on its retry.
+    redis_client is a blocking client, so every call to it goes through the IO pool.
+    """
+    def __init__(self, redis_client, lock_ttl: int = SINGLEFLIGHT_LOCK_TTL,
+                 wait_timeout: int = SINGLEFLIGHT_WAIT_TIMEOUT, poll_interval: float = 0.05):
+        self.redis = redis_client
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.in_flight = {}
+        self.waiters = {}
+
+    async def run(self, key: str, func):
+        """
+        Runs `await func()` once per key at a time and returns its result to every caller.
+        The work is cancelled only when every caller waiting for it has been cancelled.
+        """
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run_cluster(key, func))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        self.waiters[key] = self.waiters.get(key, 0) + 1
+        try:
+            # shield: one caller disconnecting must not cancel the work for the others
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # ...but once nobody is left to receive the result, stop working on it
+            if self.waiters[key] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            self.waiters[key] -= 1
+            if not self.waiters[key]:
+                del self.waiters[key]
+
+    async def _run_cluster(self, key: str, func):
+        lock_key = f"singleflight:lock:{key}"
+        channel = f"singleflight:done:{key}"
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            token = uuid.uuid4().hex
+            if await run_io(self.redis.set, lock_key, token, nx=True, ex=self.lock_ttl):
+                renewal = asyncio.ensure_future(self._hold(lock_key, token))
+                try:
+                    result = await func()
+                    await run_io(self.redis.publish, channel, json.dumps(result))
+                    return result
+                finally:
+                    renewal.cancel()
+                    await run_io(self._release, lock_key, token)
+
+            # another worker has it -> wait for its result
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            await run_io(pubsub.subscribe, channel)
+            try:
+                while True:
+                    held, message = await run_io(self._poll, pubsub, lock_key)
+                    if message:
+                        return json.loads(message["data"])
+                    # lock released between polls: the message (if any) was checked after the lock
+                    if not held:
+                        break
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"Timed out waiting for in-flight analysis of {key}")
+                    await asyncio.sleep(self.poll_interval)
+            finally:
+                await run_io(pubsub.close)
+            # the holder finished without us seeing the message (it's in the cache now)
+            # or it died -> go round again and try to take the lock ourselves
+
+    def _poll(self, pubsub, lock_key: str):
+        # one IO-pool hop per poll: is the lock still held, and did the result arrive
+        held = self.redis.exists(lock_key)
+        return held, pubsub.get_message(timeout=0)
+
+    def _finished(self, key: str, task):
+        self.in_flight.pop(key, None)
+        # mark the exception as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    async def _hold(self, lock_key: str, token: str):
+        # an analysis may outlast the TTL (slow download, Gemini queue): keep the lock ours
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                if not await run_io(self._renew, lock_key, token):
+                    return # expired and re-taken meanwhile, nothing left to renew
+            except Exception as e:
+                print(f"Could not renew {lock_key}: {e}")
+
+    def _renew(self, lock_key: str, token: str) -> bool:
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(lock_key)
+                if pipe.get(lock_key) != token:
+                    return False
+                pipe.multi()
+                pipe.expire(lock_key, self.lock_ttl)
+                pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    def _release(self, lock_key: str, token: str):
+        # only delete the lock if it is still ours (it may have expired and been re-taken)
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(lock_key)
+                if pipe.get(lock_key) == token:
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    pipe.execute()
+            except WatchError:
+                pass
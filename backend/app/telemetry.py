@@ -0,0 +1,207 @@
+import os
+import re
+import time
+import uuid
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager, nullcontext
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from app import timings
+from app import executor
+
+# optional OpenTelemetry export (pip install opentelemetry-sdk opentelemetry-exporter-otlp-proto-http):
+# an OTLP endpoint, or OTEL_TRACES_EXPORTER=console to print spans
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+OTEL_TRACES_EXPORTER = os.getenv("OTEL_TRACES_EXPORTER", "otlp").lower()
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "verifai-backend")
+
+# per-request sampling profiler (pip install pyinstrument): requests sent with
+# `X-Profile: <PROFILE_TOKEN>` are profiled; unset = off
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", Path(tempfile.gettempdir()) / "verifai-profiles"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.001))
+
+# stages range from sub-millisecond cache lookups to minute-long video uploads
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram("verifai_stage_seconds", "Duration of analysis pipeline stages", ["kind", "stage"], buckets=STAGE_BUCKETS)
+STAGE_ERRORS = Counter("verifai_stage_errors", "Analysis pipeline stages that raised", ["kind", "stage"])
+REQUEST_SECONDS = Histogram("verifai_http_request_seconds", "HTTP request latency", ["method", "route", "status"], buckets=STAGE_BUCKETS)
+REQUESTS_IN_FLIGHT = Gauge("verifai_http_requests_in_flight", "HTTP requests being served")
+CACHE_LOOKUPS = Counter("verifai_cache_lookups", "Cache lookups by level", ["level", "result"])
+FAST_PATH = Counter("verifai_fast_path", "Analyses answered by a local model vs the LLM", ["kind", "answered_by"])
+LLM_CALLS = Counter("verifai_llm_calls", "LLM (Gemini) calls", ["backend", "op", "outcome"])
+FILE_POLLS = Counter("verifai_llm_file_polls", "Gemini file state polls while waiting for processing")
+FILE_PROCESSING = Counter("verifai_llm_file_processing", "Uploads that waited for Gemini processing, by outcome", ["outcome"])
+DOWNLOADED_BYTES = Counter("verifai_downloaded_bytes", "Media bytes downloaded", ["kind"])
+JOBS_IN_FLIGHT = Gauge("verifai_jobs_in_flight", "Background jobs running in this worker")
+JOBS_QUEUED = Gauge("verifai_jobs_queued", "Jobs waiting in the shared queue")
+POOL_PENDING = Gauge("verifai_pool_pending_tasks", "Tasks submitted to a worker pool and not finished yet", ["pool"])
+
+def _pool_pending(name: str) -> int:
+    pool = executor._cpu_pool if name == "cpu" else executor._io_pool
+    if pool is None:
+        return 0
+    if name == "cpu":
+        return len(pool._pending_work_items)
+    return pool._work_queue.qsize()
+
+POOL_PENDING.labels("cpu").set_function(lambda: _pool_pending("cpu"))
+POOL_PENDING.labels("io").set_function(lambda: _pool_pending("io"))
+
+def observe_stage(kind: str, stage: str, seconds: float, error: bool):
+    STAGE_SECONDS.labels(kind, stage).observe(seconds)
+    if error:
+        STAGE_ERRORS.labels(kind, stage).inc()
+
+timings.stage_observers.append(observe_stage)
+
+def count_cache(level: str, hit: bool):
+    CACHE_LOOKUPS.labels(level, "hit" if hit else "miss").inc()
+
+def count_fast_path(kind: str, local: bool):
+    FAST_PATH.labels(kind, "local" if local else "llm").inc()
+
+def count_download(kind: str, size: int):
+    DOWNLOADED_BYTES.labels(kind).inc(size)
+
+@contextmanager
+def count_llm_call(backend: str, op: str):
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        LLM_CALLS.labels(backend, op, outcome).inc()
+
+def metrics_payload() -> tuple:
+    """
+    (body, content type) for /metrics. With PROMETHEUS_MULTIPROC_DIR set (several uvicorn
+    workers) the workers' files are merged, otherwise it's this process's registry.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+_server_span_kind = None
+
+def configure_tracing():
+    """
+    Turns on OpenTelemetry spans (one per request, one per timed stage) when an exporter
+    is configured and the SDK is installed. No-op otherwise.
+    """
+    global _server_span_kind
+    if not OTEL_EXPORTER_OTLP_ENDPOINT and OTEL_TRACES_EXPORTER != "console":
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        if OTEL_TRACES_EXPORTER == "console":
+            exporter = ConsoleSpanExporter()
+        else:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            exporter = OTLPSpanExporter()
+    except ImportError as e:
+        print(f"Tracing disabled: OpenTelemetry is not installed ({e})")
+        return
+
+    provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    timings.tracer = trace.get_tracer("verifai")
+    timings.failed_status = trace.Status(trace.StatusCode.ERROR)
+    _server_span_kind = trace.SpanKind.SERVER
+    print(f"Tracing enabled ({OTEL_TRACES_EXPORTER}, service {OTEL_SERVICE_NAME})")
+
+def shutdown_tracing():
+    if timings.tracer is not None:
+        from opentelemetry import trace
+        trace.get_tracer_provider().shutdown()
+
+_profiling = False
+
+def start_profiler():
+    """
+    A running pyinstrument profiler, or None (not installed, or another request is
+    already being profiled: one at a time keeps the samples readable).
+    """
+    global _profiling
+    if _profiling:
+        return None
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        print("X-Profile ignored: pyinstrument is not installed")
+        return None
+    _profiling = True
+    profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="enabled")
+    profiler.start()
+    return profiler
+
+def save_profile(profiler, profile_id: str):
+    global _profiling
+    try:
+        profiler.stop()
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        (PROFILE_DIR / f"{profile_id}.html").write_text(profiler.output_html())
+    finally:
+        _profiling = False
+
+def profile_path(profile_id: str):
+    if not re.fullmatch(r"[0-9a-f]{32}", profile_id):
+        return None
+    path = PROFILE_DIR / f"{profile_id}.html"
+    return path if path.exists() else None
+
+class TelemetryMiddleware:
+    """
+    Plain ASGI middleware (the endpoint runs in the same task, so the trace context and
+    the profiler follow it): request latency / in-flight metrics, a server span per
+    request when tracing is on, and the X-Profile sampling profiler.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profiler, profile_id = None, None
+        if PROFILE_TOKEN and dict(scope["headers"]).get(b"x-profile", b"").decode() == PROFILE_TOKEN:
+            if profiler := start_profiler():
+                profile_id = uuid.uuid4().hex
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile_id:
+                    message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        span = nullcontext()
+        if timings.tracer is not None:
+            span = timings.tracer.start_as_current_span(f"{scope['method']} {scope['path']}", kind=_server_span_kind)
+
+        start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            with span as current:
+                await self.app(scope, receive, send_with_status)
+                # route template, not the raw path (keeps label cardinality bounded)
+                if current is not None and "route" in scope:
+                    current.update_name(f"{scope['method']} {scope['route'].path}")
+                    current.set_attribute("http.status_code", status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope["route"].path if "route" in scope else "unmatched"
+            REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(time.perf_counter() - start)
+            if profiler:
+                save_profile(profiler, profile_id)
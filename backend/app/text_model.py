@@ -0,0 +1,170 @@
+import os
+import re
+import json
+import zlib
+import numpy as np
+from itertools import chain
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# logistic model trained by server/pipeline/train_text.py (plain JSON, no pickle)
+TEXT_MODEL_PATH = Path(os.getenv("TEXT_MODEL_PATH", BASE_DIR.parent / "server" / "model" / "text_prescreen.json"))
+TEXT_PRESCREEN_ENABLED = os.getenv("TEXT_PRESCREEN_ENABLED", "1") == "1"
+# P(AI) at or above this -> "AI-Generated" without asking Gemini; at or below TEXT_HUMAN_THRESHOLD -> "Human"
+TEXT_AI_THRESHOLD = float(os.getenv("TEXT_AI_THRESHOLD", 0.97))
+TEXT_HUMAN_THRESHOLD = float(os.getenv("TEXT_HUMAN_THRESHOLD", 0.03))
+# longer texts are scored in the CPU pool instead of on the event loop (~0.4 ms per KB)
+TEXT_PRESCREEN_INLINE_BYTES = int(os.getenv("TEXT_PRESCREEN_INLINE_BYTES", 16 * 1024))
+
+# must match server/pipeline/text_features.py (the model file records which version it was built with)
+TEXT_FEATURES_VERSION = "stylometry-1"
+
+FEATURE_NAMES = [
+    "log_chars", "log_words",
+    "sentence_len_mean", "sentence_len_std", "burstiness",
+    "type_token_ratio", "hapax_ratio",
+    "word_len_mean", "word_len_std",
+    "repeated_bigrams", "repeated_trigrams",
+    "commas", "periods", "exclamations", "questions", "semicolons_colons",
+    "dashes", "quotes", "parentheses", "uppercase", "digits", "non_ascii", "newlines",
+    "lowercase_sentence_starts", "lowercase_i", "repeated_chars",
+    "compression_ratio",
+]
+
+WORD_RE = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)*")
+SENTENCE_END_RE = re.compile(r"[.!?]+(?:\s+|$)|\n+")
+REPEATED_CHAR_RE = re.compile(r"(.)\1{2,}")
+
+# byte -> punctuation/character class, so the whole profile is one bincount
+CHAR_CLASSES = ["other", ",", ".", "!", "?", ";:", "-", "quote", "paren", "upper", "digit", "non_ascii", "\n"]
+_CLASS_TABLE = np.zeros(256, dtype=np.uint8)
+for _chars, _cls in [(",", 1), (".", 2), ("!", 3), ("?", 4), (";:", 5), ("-", 6), ("\"'`", 7), ("()[]", 8), ("\n", 12)]:
+    for _c in _chars:
+        _CLASS_TABLE[ord(_c)] = _cls
+_CLASS_TABLE[ord("A"):ord("Z") + 1] = 9
+_CLASS_TABLE[ord("0"):ord("9") + 1] = 10
+_CLASS_TABLE[128:] = 11
+
+def text_features(text: str):
+    """
+    Stylometric feature vector (FEATURE_NAMES order) for one text, or None when it has no words.
+    Everything past tokenization (one regex pass per sentence) is numpy on the word/byte arrays.
+    """
+    raw = text.encode("utf-8")
+    # one findall per sentence: word lists and sentence lengths in the same pass
+    sentences = [words for words in map(WORD_RE.findall, SENTENCE_END_RE.split(text)) if words]
+    if not raw or not sentences:
+        return None
+    words = list(chain.from_iterable(sentences))
+    n_chars, n_words = len(raw), len(words)
+
+    lengths = np.fromiter(map(len, sentences), dtype=np.float64, count=len(sentences))
+    length_mean, length_std = lengths.mean(), lengths.std()
+    # -1 perfectly regular ... +1 very bursty (human writing mixes short and long sentences)
+    burstiness = (length_std - length_mean) / (length_std + length_mean)
+
+    # vocabulary
+    vocab, ids, counts = np.unique(list(map(str.lower, words)), return_inverse=True, return_counts=True)
+    word_lengths = np.fromiter(map(len, words), dtype=np.float64, count=n_words)
+
+    def repeated(n):
+        if n_words <= n:
+            return 0.0
+        size = len(vocab)
+        grams = ids[:n_words - n + 1].astype(np.int64)
+        for k in range(1, n):
+            grams = grams * size + ids[k:n_words - n + 1 + k]
+        return 1.0 - len(np.unique(grams)) / len(grams)
+
+    # punctuation / character profile per character
+    profile = np.bincount(_CLASS_TABLE[np.frombuffer(raw, dtype=np.uint8)], minlength=len(CHAR_CLASSES)) / n_chars
+
+    # sloppy typing: sentences starting lowercase, "i" for "I", "sooo", "!!!"
+    lowercase_starts = np.mean([sentence[0][0].islower() for sentence in sentences])
+    lowercase_i = words.count("i") / n_words
+    repeated_chars = len(REPEATED_CHAR_RE.findall(text)) / n_chars * 100
+
+    return np.array([
+        np.log1p(n_chars), np.log1p(n_words),
+        length_mean, length_std, burstiness,
+        len(vocab) / n_words, np.count_nonzero(counts == 1) / n_words,
+        word_lengths.mean(), word_lengths.std(),
+        repeated(2), repeated(3),
+        *profile[1:12], profile[12],
+        lowercase_starts, lowercase_i, repeated_chars,
+        len(zlib.compress(raw, 6)) / n_chars,
+    ], dtype=np.float64)
+
+_model = None
+_load_failed = False
+
+def load_text_model():
+    """
+    Loads the pre-screener once (at startup). Returns None when it is disabled or missing,
+    in which case every text goes to Gemini as before.
+    """
+    global _model, _load_failed
+    if _model is not None or _load_failed or not TEXT_PRESCREEN_ENABLED:
+        return _model
+    try:
+        raw = json.loads(TEXT_MODEL_PATH.read_text())
+        if raw.get("version") != TEXT_FEATURES_VERSION or raw.get("features") != FEATURE_NAMES:
+            raise ValueError(f"built for features {raw.get('version')}, this code computes {TEXT_FEATURES_VERSION}")
+        _model = {
+            "mean": np.array(raw["mean"]),
+            "scale": np.array(raw["scale"]),
+            "coef": np.array(raw["coef"]),
+            "intercept": float(raw["intercept"])
+        }
+        print(f"Loaded text pre-screener: {TEXT_MODEL_PATH.name}")
+    except FileNotFoundError:
+        _load_failed = True
+        print(f"Text pre-screener disabled: no model at {TEXT_MODEL_PATH} (run server/pipeline/train_text.py)")
+    except Exception as e:
+        _load_failed = True
+        print(f"Text pre-screener disabled: {e}")
+    return _model
+
+def score_text(text: str):
+    """
+    (P(AI), per-feature contributions to the logit) for a text, or None without a model.
+    """
+    model = load_text_model()
+    if model is None:
+        return None
+    try:
+        features = text_features(text)
+        if features is None:
+            return None
+        contributions = (features - model["mean"]) / model["scale"] * model["coef"]
+        logit = contributions.sum() + model["intercept"]
+        return float(1 / (1 + np.exp(-logit))), contributions
+    except Exception as e:
+        print(f"Text pre-screener failed: {e}")
+        return None
+
+def classify_text(score):
+    """
+    Turns a score_text() result into a fast-path verdict, or None when it falls in the uncertain band.
+    """
+    if score is None:
+        return None
+    probability, contributions = score
+    if probability >= TEXT_AI_THRESHOLD:
+        verdict, direction = "AI-Generated", 1
+    elif probability <= TEXT_HUMAN_THRESHOLD:
+        verdict, direction = "Human", -1
+    else:
+        return None
+    # the features that pushed hardest towards the verdict
+    strongest = np.argsort(contributions * -direction)[:3]
+    return {
+        "Detector_score": int(round(probability * 100)),
+        "verdict": verdict,
+        "content_analysis": {
+            "writing_style": None, # the pre-screener doesn't judge style, only the verdict
+            "indicators": [FEATURE_NAMES[i] for i in strongest if contributions[i] * direction > 0]
+        },
+        "fast_path": {"model": TEXT_MODEL_PATH.name, "probability": round(probability, 4)}
+    }
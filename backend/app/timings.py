@@ -0,0 +1,47 @@
+import time
+from contextlib import contextmanager, nullcontext
+
+# observer(kind, stage, seconds, error) callbacks told about every timed stage
+# (kind: video / image / text / cache / llm / analysis / job); the Prometheus metrics
+# (app.telemetry) and the benchmark harness in backend/bench subscribe here
+stage_observers = []
+
+# OpenTelemetry tracer and the status failed spans get, set by
+# app.telemetry.configure_tracing() when tracing is on
+tracer = None
+failed_status = None
+
+def observe_stage(kind: str, stage: str, seconds: float, error: bool = False):
+    for observer in stage_observers:
+        observer(kind, stage, seconds, error)
+
+def _span(kind: str, stage: str):
+    if tracer is None:
+        return nullcontext()
+    return tracer.start_as_current_span(
+        f"{kind}.{stage}",
+        attributes={"verifai.kind": kind, "verifai.stage": stage},
+        record_exception=False,
+        set_status_on_exception=False
+    )
+
+@contextmanager
+def timed(kind: str, stage: str):
+    """
+    Times the block and reports it to the observers (failed stages included), inside a
+    "kind.stage" span when tracing is on.
+    """
+    start = time.perf_counter()
+    error = False
+    with _span(kind, stage) as span:
+        try:
+            yield
+        except BaseException as e:
+            # cancellations and short-circuits (a stage that found the answer early) aren't failures
+            error = isinstance(e, Exception) and not getattr(e, "short_circuit", False)
+            if error and span is not None:
+                span.record_exception(e)
+                span.set_status(failed_status)
+            raise
+        finally:
+            observe_stage(kind, stage, time.perf_counter() - start, error)
@@ -1,26 +1,31 @@
 import yt_dlp
-import uuid
 import os
 import subprocess
 import json
+import time
+import hashlib
+import heapq
 import cv2 # for ELA and frame-to-frame consistency
 import numpy as np
 from PIL import Image, ImageChops
-import requests # image analyzation
+from app.media import new_media_base, open_source, is_buffer, remove_media
+from app.mp4meta import read_mp4_metadata, NotMP4
+from app.http_client import Fetched, fetch, fetch_async, check_image
+from app.telemetry import count_download
+import av # in-process libavformat for containers the mp4 reader doesn't handle
 
-def download_and_process_video(url: str) -> str:
-    """
-    Downloads video from YouTube, X, Insta, TikTok, etc.
-    """
-    filename = f"/tmp/{uuid.uuid4()}.mp4" # (Or use tempfile.gettempdir() for Windows)
-    
-    # fix for windows if you haven't done it yet
-    import tempfile
-    filename = os.path.join(tempfile.gettempdir(), f"{uuid.uuid4()}.mp4")
+# capped ingestion: tallest rendition we download, how much of a long video we fetch,
+# the byte budget, and whether the audio track is fetched at all (Gemini listens to it)
+VIDEO_MAX_HEIGHT = int(os.getenv("VIDEO_MAX_HEIGHT", 720))
+VIDEO_SECTION_SECONDS = int(os.getenv("VIDEO_SECTION_SECONDS", 90))
+VIDEO_MAX_BYTES = int(os.getenv("VIDEO_MAX_BYTES", 150 * 1024 * 1024))
+VIDEO_KEEP_AUDIO = os.getenv("VIDEO_KEEP_AUDIO", "1") == "1"
+# 0 -> the old behaviour: best quality, full length, re-encoded to mp4
+VIDEO_CAPPED_INGEST = os.getenv("VIDEO_CAPPED_INGEST", "1") == "1"
 
+def _ydl_options(filename: str = None, capped: bool = False) -> dict:
     ydl_opts = {
         'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-        'outtmpl': filename,
         'noplaylist': True,
         'quiet': True,
         'overwrites': True,
@@ -37,52 +42,172 @@ def download_and_process_video(url: str) -> str:
             'preferedformat': 'mp4',
         }],
     }
+    if capped:
+        height = f"[height<={VIDEO_MAX_HEIGHT}]"
+        if VIDEO_KEEP_AUDIO:
+            ydl_opts['format'] = f"bv*{height}+ba/b{height}/wv*+ba/w"
+        else:
+            ydl_opts['format'] = f"bv{height}/b{height}/wv/w"
+        # closest to the cap from below, mp4/m4a preferred (no remux needed)
+        ydl_opts['format_sort'] = [f"res:{VIDEO_MAX_HEIGHT}", "ext:mp4:m4a"]
+        ydl_opts['merge_output_format'] = 'mp4/mkv'
+        # yt-dlp skips formats known to be bigger and aborts downloads that grow past it
+        ydl_opts['max_filesize'] = VIDEO_MAX_BYTES
+        # OpenCV, ffprobe and Gemini all read mp4/webm/mkv/mov: keep those as they are,
+        # only remux (stream copy, never re-encode) anything else
+        ydl_opts['postprocessors'] = [{
+            'key': 'FFmpegVideoRemuxer',
+            'preferedformat': 'webm>webm/mkv>mkv/mov>mov/mp4',
+        }]
+    if filename:
+        ydl_opts['outtmpl'] = filename
+    return ydl_opts
 
+def probe_video(url: str) -> dict:
+    """
+    Asks yt-dlp about the video without downloading it (platform id, formats, duration).
+    """
+    try:
+        with yt_dlp.YoutubeDL(_ydl_options()) as ydl:
+            return ydl.sanitize_info(ydl.extract_info(url, download=False))
+    except Exception as e:
+        raise RuntimeError(f"Video probe failed: {str(e)}")
+
+def _estimated_bytes(selected: dict) -> int:
+    formats = selected.get("requested_formats") or [selected]
+    sizes = [f.get("filesize") or f.get("filesize_approx") for f in formats]
+    if not all(sizes):
+        return None
+    return sum(sizes)
+
+def ingest_video(url: str, info: dict = None) -> dict:
+    """
+    Capped download: picks the smallest adequate rendition from the probe (height cap,
+    optionally no audio), only fetches the first VIDEO_SECTION_SECONDS of long videos,
+    rejects inputs over the byte budget before downloading anything, and never re-encodes.
+    Returns {"path", "bytes", "seconds", "format", "section"}.
+    """
+    import copy
+    from yt_dlp.utils import download_range_func
+    base = new_media_base()
+
+    ydl_opts = _ydl_options(f"{base}.%(ext)s", capped=True)
+    duration = (info or {}).get("duration")
+    section = None
+    if VIDEO_SECTION_SECONDS and duration and duration > VIDEO_SECTION_SECONDS:
+        section = [0, VIDEO_SECTION_SECONDS]
+        ydl_opts['download_ranges'] = download_range_func(None, [tuple(section)])
+
+    start = time.perf_counter()
+    path = None
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
+            if info:
+                # format selection only, no network: reject oversize inputs up front
+                selected = ydl.process_ie_result(copy.deepcopy(info), download=False)
+                estimate = _estimated_bytes(selected)
+                if estimate and section:
+                    estimate = estimate * section[1] / duration
+                if estimate and estimate > VIDEO_MAX_BYTES:
+                    raise RuntimeError(f"Video too large ({estimate / 2**20:.0f} MB > {VIDEO_MAX_BYTES / 2**20:.0f} MB)")
+                result = ydl.process_ie_result(info, download=True)
+            else:
+                result = ydl.extract_info(url, download=True)
+
+        downloads = result.get("requested_downloads") or [{}]
+        path = downloads[0].get("filepath") or downloads[0].get("_filename")
+        if not path or not os.path.exists(path):
+            raise RuntimeError("nothing downloaded (over the VIDEO_MAX_BYTES budget, or no usable format)")
+        stats = {
+            "path": path,
+            "bytes": os.path.getsize(path),
+            "seconds": round(time.perf_counter() - start, 3),
+            "format": result.get("format_id"),
+            "section": section
+        }
+        count_download("video", stats["bytes"])
+        print(f"Downloaded {stats['bytes'] / 2**20:.1f} MB in {stats['seconds']}s (format {stats['format']}, section {section})")
+        return stats
+    except Exception as e:
+        # partial downloads / merge leftovers share the base path
+        remove_media(f"{base}.mp4")
+        raise RuntimeError(f"Video download failed: {str(e)}")
+
+def download_and_process_video(url: str, info: dict = None) -> str:
+    """
+    Downloads video from YouTube, X, Insta, TikTok, etc.
+    Pass the info from probe_video() to skip a second extraction round-trip.
+    """
+    if VIDEO_CAPPED_INGEST:
+        return ingest_video(url, info)["path"]
+
+    filename = f"{new_media_base()}.mp4"
+
+    try:
+        with yt_dlp.YoutubeDL(_ydl_options(filename)) as ydl:
+            if info:
+                ydl.process_ie_result(info, download=True)
+            else:
+                ydl.download([url])
+        count_download("video", os.path.getsize(filename))
         return filename
     except Exception as e:
         if os.path.exists(filename):
             os.remove(filename)
         raise RuntimeError(f"Video download failed: {str(e)}")
     
-def download_image(url: str) -> str:
+# images bigger than this are refused (they'd never be a sensible upload anyway)
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", 25 * 1024 * 1024))
+
+def fetch_image(url: str) -> bytes:
     """
-    Downloads a static image from a URL.
+    Downloads a static image from a URL into memory over the shared keep-alive pool.
+    Nothing touches the disk; every later stage reads the same buffer.
     """
     try:
-        # imitate a real person on a browser
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+        data = check_image(fetch(url, IMAGE_MAX_BYTES)).data
+        count_download("image", len(data))
+        return data
+    except Exception as e:
+        raise RuntimeError(f"Image download failed: {e}")
 
-        response = requests.get(url, stream=True, timeout=10)
-        response.raise_for_status()
-        
-        # Save to temp file
-        file_ext = url.split('.')[-1].split('?')[0]
-        if len(file_ext) > 4 or len(file_ext) < 2: 
-            file_ext = "jpg" # let fallback be jpg
-            
-        filename = f"/tmp/{uuid.uuid4()}.{file_ext}"
-        
-        with open(filename, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-                
-        return filename
+async def fetch_image_async(url: str, validators: dict = None) -> Fetched:
+    """
+    fetch_image() for the event loop (pooled async client, HTTP/2 when available).
+    With validators it's a conditional request and may come back not_modified.
+    """
+    try:
+        fetched = await fetch_async(url, IMAGE_MAX_BYTES, validators)
+        if fetched.not_modified:
+            return fetched
+        count_download("image", len(fetched.data))
+        return check_image(fetched)
     except Exception as e:
         raise RuntimeError(f"Image download failed: {e}")
 
-def extract_image_metadata(image_path: str) -> dict:
+def download_image(url: str) -> str:
+    """
+    Downloads a static image from a URL to a file (for callers that need a path).
+    """
+    data = fetch_image(url)
+
+    file_ext = url.split('.')[-1].split('?')[0]
+    if len(file_ext) > 4 or len(file_ext) < 2: 
+        file_ext = "jpg" # let fallback be jpg
+
+    filename = f"{new_media_base()}.{file_ext}"
+    with open(filename, 'wb') as f:
+        f.write(data)
+    return filename
+
+def extract_image_metadata(image_path) -> dict:
     """
     Extracts EXIF data from images.
     Real photos often have 'Make', 'Model', 'ISOSpeedRatings'.
     AI images usually have empty EXIF or 'Software: Adobe'.
     """
     try:
-        img = Image.open(image_path)
+        img = Image.open(open_source(image_path))
         exif_data = img._getexif()
         
         if not exif_data:
@@ -109,13 +234,13 @@ def extract_image_metadata(image_path: str) -> dict:
     except Exception as e:
         return {"valid": False, "error": str(e)}
 
-def perform_image_ela(image_path: str) -> dict:
+def perform_image_ela(image_path) -> dict:
     """
     Performs Error Level Analysis on a static image.
     (Simplified version of the video ELA, just without frame extraction)
     """
     try:
-        original = Image.open(image_path).convert("RGB")
+        original = Image.open(open_source(image_path)).convert("RGB")
         
         # Resave at 90% quality to see difference
         import io
@@ -141,80 +266,66 @@ def perform_image_ela(image_path: str) -> dict:
     except Exception as e:
         return {"valid": False, "error": str(e)}
 
-async def analyze_text_logic(text_content: str):
+def _ffprobe(file_path) -> dict:
+    # run ffprobe to get JSON output of file format
+    # buffers are streamed in on stdin (pipe:0) instead of being written out first
+    cmd = [
+        "ffprobe", 
+        "-v", "quiet", 
+        "-print_format", "json", 
+        "-show_format", 
+        "-show_streams", 
+        "pipe:0" if is_buffer(file_path) else file_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, input=file_path if is_buffer(file_path) else None)
+    if result.returncode != 0:
+        return None
+    data = json.loads(result.stdout)
+    return data if data.get("format") else None
+
+def _read_container(file_path):
     """
-    Analyzes raw text for AI generation patterns.
+    Container-level info ({"format_name", "duration", "tags"}, as ffprobe reports it) and
+    which reader produced it. mp4/mov (nearly everything yt-dlp hands us) is parsed in
+    process; PyAV covers other containers without a subprocess; ffprobe is the last resort.
     """
-    # cache check
-    text_id = hashlib.md5(text_content.encode()).hexdigest()
-    
-    if cached := cache.get(text_id):
-        print(f"⚡ Text Cache HIT")
-        return json.loads(cached)
-
-    print(f"Text Cache MISS. Analyzing...")
-
     try:
-        # gemini analysis
-        prompt = """
-        You are an AI-Detector. Analyze this text to determine if it was generated by an AI/LLM.
-        Look for: overly formal tone, lack of personal anecdote, repetitive sentence structure, and 'hallucination' patterns.
-
-        Return JSON ONLY:
-        {
-            "Detector_score": int (0-100, where 100 is definitely AI),
-            "verdict": "Human" | "AI-Generated" | "Mixed",
-            "content_analysis": {
-                "writing_style": "Formal/Casual/Robotic",
-                "indicators": ["list of specific phrases or patterns found"]
-            }
-        }
-        """
+        return read_mp4_metadata(open_source(file_path)), "mp4"
+    except (NotMP4, OSError):
+        pass
 
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[prompt, text_content]
-        )
-        
-        # clean JSON
-        raw_text = response.text.replace("```json", "").replace("```", "").strip()
-        result = json.loads(raw_text)
+    try:
+        with av.open(open_source(file_path)) as container:
+            duration = f"{container.duration / 1e6:.6f}" if container.duration else None
+            return {"format_name": container.format.name, "duration": duration, "tags": dict(container.metadata)}, "pyav"
+    except Exception:
+        pass
 
-        # cache result
-        cache.setex(text_id, 86400, json.dumps(result))
-        return result
+    data = _ffprobe(file_path)
+    if data is None and is_buffer(file_path):
+        # an mp4 with its index (moov) at the end can't be probed from a pipe -> tmpfs file
+        spill = f"{new_media_base()}.mp4"
+        try:
+            with open(spill, "wb") as f:
+                f.write(file_path)
+            data = _ffprobe(spill)
+        finally:
+            remove_media(spill)
+    return (data["format"] if data else None), "ffprobe"
 
-    except Exception as e:
-        print(f"Text Error: {e}")
-        return {
-            "Detector_score": 0, "verdict": "Error",
-            "content_analysis": {"error": str(e)}
-        }
-    
-def extract_video_metadata(file_path: str) -> dict:
+def extract_video_metadata(file_path) -> dict:
     """
     Scans video file headers using ffprobe to find:
     1. Encoder Name (Real cameras vs FFmpeg/Lavf)
     2. Duration & Bitrate
     3. Specific AI metadata tags (if present)
+    Takes a path or the bytes themselves.
     """
     try:
-        # run ffprobe to get JSON output of file format
-        cmd = [
-            "ffprobe", 
-            "-v", "quiet", 
-            "-print_format", "json", 
-            "-show_format", 
-            "-show_streams", 
-            file_path
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
+        format_info, reader = _read_container(file_path)
+        if format_info is None:
             return {"error": "ffprobe failed"}
 
-        data = json.loads(result.stdout)
-        format_info = data.get("format", {})
         tags = format_info.get("tags", {})
 
         # look for suspicious indicators
@@ -238,6 +349,8 @@ def extract_video_metadata(file_path: str) -> dict:
             "duration": format_info.get("duration"),
             "format": format_info.get("format_name"),
             "encoder": encoder,
+            "major_brand": major_brand,
+            "reader": reader,
             "suspicious_indicators": suspicion_reason,
             "raw_tags": tags # for debugging
         }
@@ -245,110 +358,505 @@ def extract_video_metadata(file_path: str) -> dict:
     except Exception as e:
         return {"valid": False, "error": str(e)}
     
-def perform_ela_analysis(video_path: str) -> dict:
+class FrameRing:
     """
-    Extracts a frame, performs Error Level Analysis (ELA), 
-    and calculates a 'Noise Consistency Score'.
+    Fixed set of reusable frame buffers. FrameSource decodes into the next slot,
+    so at most `size` full-resolution frames are alive no matter how long the clip is.
+    Analyzers that need a frame for longer than that must copy it.
     """
-    try:
-        # 1. Extract a frame from the middle of the video
-        cap = cv2.VideoCapture(video_path)
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count // 2) # Jump to middle
-        ret, frame = cap.read()
-        cap.release()
-
-        if not ret:
-            return {"valid": False, "error": "Could not extract frame"}
+    def __init__(self, size: int = 4):
+        self.size = max(1, size)
+        self.slots = [None] * self.size
+        self.indices = [None] * self.size
+        self.head = 0
 
-        # 2. Convert to PIL Image
-        # OpenCV uses BGR, PIL uses RGB
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        original = Image.fromarray(frame_rgb)
+    def next_slot(self):
+        return self.slots[self.head]
 
-        # 3. Perform ELA
-        # Save compressed version to a temp buffer
-        import io
-        buffer = io.BytesIO()
-        original.save(buffer, "JPEG", quality=90)
-        buffer.seek(0)
-        compressed = Image.open(buffer)
+    def commit(self, index: int, frame):
+        self.slots[self.head] = frame
+        self.indices[self.head] = index
+        self.head = (self.head + 1) % self.size
 
-        # 4. Calculate Difference (The ELA)
-        ela_image = ImageChops.difference(original, compressed)
-        
-        # 5. Calculate Statistics (The "Score")
-        extrema = ela_image.getextrema()
-        max_diff = max([ex[1] for ex in extrema])
-        
-        # Convert to numpy to get average noise level
-        ela_np = np.array(ela_image)
-        mean_noise = np.mean(ela_np)
+    def previous(self, k: int = 1):
+        """
+        Returns (index, frame) decoded k frames before the newest one, or None.
+        """
+        if k >= self.size:
+            return None
+        pos = (self.head - 1 - k) % self.size
+        if self.indices[pos] is None:
+            return None
+        return self.indices[pos], self.slots[pos]
+
+class FrameAnalyzer:
+    """
+    Visitor interface for FrameSource.
+    An analyzer declares which frames it needs, gets visit() called once per
+    decoded frame in order, and builds its result dict at the end.
+    """
+    # widest frame this analyzer needs; None means full resolution
+    max_width = None
+
+    def prepare(self, width: int, height: int, fps: float):
+        # optional: full-resolution size and frame rate, called before wanted_frames
+        pass
+
+    def wanted_frames(self, frame_count: int):
+        raise NotImplementedError
+
+    def visit(self, index: int, frame, ring: FrameRing):
+        raise NotImplementedError
+
+    def result(self) -> dict:
+        raise NotImplementedError
+
+# anything outside (0, MAX_FRAME_COUNT) from CAP_PROP_FRAME_COUNT is a missing duration, not a length
+MAX_FRAME_COUNT = 10_000_000
+
+class FrameSource:
+    """
+    Demuxes and decodes a video once and hands the frames to every registered analyzer.
+    Seeks once to the first frame anyone wants, then walks forward: frames nobody wants
+    are only grabbed (no colour conversion/copy), wanted frames are retrieved into the ring.
+    Gaps longer than seek_gap frames are skipped with a seek instead.
+    Containers without a usable frame count (live webm, some partial downloads) are
+    counted by reading through them first.
+    """
+    def __init__(self, video_path: str, ring_size: int = 4, seek_gap: int = 250):
+        self.video_path = video_path
+        self.ring_size = ring_size
+        self.seek_gap = seek_gap
+        self.analyzers = []
+
+    def register(self, analyzer: FrameAnalyzer) -> "FrameSource":
+        self.analyzers.append(analyzer)
+        return self
+
+    def run(self) -> list:
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            if not cap.isOpened():
+                raise RuntimeError("Could not open video")
+
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if not 0 < frame_count < MAX_FRAME_COUNT:
+                frame_count = self._count_frames(cap)
+                cap.release()
+                cap = cv2.VideoCapture(self.video_path)
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+            # frame index -> analyzers that want it
+            consumers = {}
+            for analyzer in self.analyzers:
+                analyzer.prepare(width, height, fps)
+                for index in analyzer.wanted_frames(frame_count):
+                    consumers.setdefault(index, []).append(analyzer)
+
+            if consumers:
+                self._decode(cap, consumers)
+        finally:
+            cap.release()
+
+        return [analyzer.result() for analyzer in self.analyzers]
+
+    @staticmethod
+    def _count_frames(cap) -> int:
+        # grab() only demuxes/decodes, no colour conversion or copy
+        count = 0
+        while cap.grab():
+            count += 1
+        return count
+
+    def _decode(self, cap, consumers: dict):
+        ring = FrameRing(self.ring_size)
+        position = 0 # index of the frame the next read() returns
+
+        for index in sorted(consumers):
+            # seek to the first wanted frame, and across long gaps (cheaper than decoding
+            # everything in between); short gaps are just grabbed
+            if index > position and (position == 0 or index - position > self.seek_gap):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                position = index
+            while position < index:
+                if not cap.grab():
+                    return
+                position += 1
+
+            ret, frame = cap.read(ring.next_slot())
+            if not ret:
+                return
+            position += 1
+            ring.commit(index, frame)
+
+            # downscale once per requested width, shared by every analyzer asking for it
+            scaled = {}
+            for analyzer in consumers[index]:
+                analyzer.visit(index, self._scale(frame, analyzer.max_width, scaled), ring)
+
+    @staticmethod
+    def _scale(frame, max_width, scaled: dict):
+        height, width = frame.shape[:2]
+        if max_width is None or width <= max_width:
+            return frame
+        if max_width not in scaled:
+            new_height = max(1, round(height * max_width / width))
+            scaled[max_width] = cv2.resize(frame, (max_width, new_height), interpolation=cv2.INTER_AREA)
+        return scaled[max_width]
+
+# frames sampled across the clip for ELA, and the width they are downscaled to first
+ELA_SAMPLES = int(os.getenv("ELA_SAMPLES", 8))
+ELA_MAX_WIDTH = int(os.getenv("ELA_MAX_WIDTH", 960)) or None
+ELA_QUALITY = 90
+
+class ELAAnalyzer(FrameAnalyzer):
+    """
+    Performs Error Level Analysis (ELA) on `samples` frames spread across the clip
+    and calculates a 'Noise Consistency Score' per frame and for the whole video.
+
+    Each frame is recompressed and diffed in OpenCV (no PIL round-trip). Only a 256-bin
+    histogram of the difference is kept per frame, so every statistic (mean, percentiles,
+    max) for every frame comes out of one vectorized pass over a (samples, 256) array.
+    """
+    def __init__(self, samples: int = ELA_SAMPLES, max_width: int = ELA_MAX_WIDTH):
+        self.samples = max(1, samples)
+        self.max_width = max_width
+        self.indices = []
+        self.histograms = np.zeros((self.samples, 256), dtype=np.int64)
+        self.diff = None # reused absdiff output buffer
+
+    def wanted_frames(self, frame_count: int):
+        # centre of each of `samples` equal segments (samples=1 is the old middle frame)
+        return sorted({frame_count * (2 * i + 1) // (2 * self.samples) for i in range(self.samples)})
+
+    def visit(self, index, frame, ring):
+        # Save compressed version to a buffer
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, ELA_QUALITY])
+        if not ok:
+            return
+        compressed = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+
+        # Calculate Difference (The ELA)
+        if self.diff is None or self.diff.shape != frame.shape:
+            self.diff = np.empty_like(frame)
+        cv2.absdiff(frame, compressed, dst=self.diff)
+
+        row = len(self.indices)
+        self.histograms[row] = np.bincount(self.diff.ravel(), minlength=256)
+        self.indices.append(index)
+
+    def result(self) -> dict:
+        if not self.indices:
+            return {"valid": False, "error": "Could not extract frame"}
+
+        # Calculate Statistics (The "Score") for every frame at once
+        histograms = self.histograms[:len(self.indices)]
+        levels = np.arange(256)
+        totals = histograms.sum(axis=1)
+        means = histograms @ levels / totals
+        cumulative = histograms.cumsum(axis=1)
+        p95 = (cumulative < 0.95 * totals[:, None]).sum(axis=1)
+        maxima = 255 - np.argmax(histograms[:, ::-1] > 0, axis=1)
+
+        mean_noise = float(means.mean())
 
         # AI visuals tend to have lower ELA noise (too smooth) or specific high-contrast edges
         # This is a heuristic: Real photos usually have higher, uniform noise.
-        
         return {
             "valid": True,
-            "ela_score": float(mean_noise),
-            "max_difference": int(max_diff),
+            "ela_score": mean_noise,
+            "max_difference": int(maxima.max()),
+            "p95_difference": float(np.median(p95)),
+            # real footage keeps a similar noise level throughout; spliced/generated segments stand out
+            "score_spread": float(means.std()),
+            "frames_analyzed": len(self.indices),
+            "timeline": [
+                {"frame": int(index), "ela_score": round(float(mean), 4), "p95_difference": int(p), "max_difference": int(m)}
+                for index, mean, p, m in zip(self.indices, means, p95, maxima)
+            ],
             "interpretation": "Low noise (Smooth/Artificial)" if mean_noise < 2.0 else "High noise (Natural/Grainy)"
         }
 
-    except Exception as e:
-        return {"valid": False, "error": str(e)}
-    
-def analyze_frame_consistency(video_path: str) -> dict:
+# temporal flux: widest frame compared (0 = full resolution; frames shrink by a whole
+# factor, so 640 keeps 1280/1920/3840-wide video at 640 and 1080-wide vertical video at 540),
+# most consecutive-frame pairs compared per clip (spread evenly over the whole clip),
+# pairs per scoring window, and how many of the most unstable windows to report
+FLUX_WIDTH = int(os.getenv("FLUX_WIDTH", 640)) or None
+FLUX_MAX_PAIRS = int(os.getenv("FLUX_MAX_PAIRS", 600))
+FLUX_WINDOW = int(os.getenv("FLUX_WINDOW", 30))
+FLUX_TOP_SEGMENTS = int(os.getenv("FLUX_TOP_SEGMENTS", 3))
+
+class Welford:
+    """
+    Running mean/variance in O(1) memory.
+    """
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        # population variance, same as np.var
+        return self.m2 / self.n if self.n else 0.0
+
+class FluxAnalyzer(FrameAnalyzer):
     """
     Analyzes temporal stability.
     AI videos often have 'shimmering' or inconsistent object coherence between frames.
     We compare consecutive frames to measure average pixel difference (flux).
+
+    Covers the whole clip: up to max_pairs consecutive-frame pairs spread evenly from start
+    to end (every frame for short clips), on grayscale frames shrunk by a whole factor to at
+    most `width` wide (INTER_AREA at an integer factor is a plain box filter, several times
+    cheaper than at a fractional scale). Changed-pixel counts are scaled back to
+    full-resolution units so the threshold still applies.
+    Scores are streamed into Welford accumulators, per `window` pairs and for the clip,
+    and only the top_segments most unstable windows are kept, so memory does not grow
+    with clip length.
     """
-    try:
-        cap = cv2.VideoCapture(video_path)
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        
-        # analyze a 1-second chunk from the middle (approx 30 frames)
-        start_frame = max(0, frame_count // 2)
-        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-        
-        prev_gray = None
-        diff_scores = []
-        
-        # analyze up to 30 frames
-        for _ in range(30):
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # convert to grayscale for simpler math
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            
-            if prev_gray is not None:
-                # Calculate absolute difference between current and previous frame
-                score = cv2.absdiff(prev_gray, gray)
-                non_zero_count = np.count_nonzero(score)
-                diff_scores.append(non_zero_count)
-            
-            prev_gray = gray
-            
-        cap.release()
-        
-        if not diff_scores:
+    def __init__(self, window: int = FLUX_WINDOW, width: int = FLUX_WIDTH,
+                 max_pairs: int = FLUX_MAX_PAIRS, top_segments: int = FLUX_TOP_SEGMENTS):
+        self.window = max(2, window)
+        # full-resolution frames from FrameSource, shrunk here after the grayscale conversion
+        self.width = width
+        self.max_pairs = max(1, max_pairs)
+        self.top_segments = top_segments
+        self.fps = 30.0
+        self.full_pixels = None
+        self.pixel_scale = 1.0 # full-resolution pixels per analyzed pixel
+        self.grays = [None, None] # current/previous grayscale buffers, reused
+        self.full_gray = None     # full-resolution grayscale scratch buffer
+        self.diff = None
+        self.prev_index = None
+
+        self.clip = Welford()        # every pair score
+        self.windows = Welford()     # per-window variances
+        self.current = Welford()     # the window being filled
+        self.current_start = None
+        self.last_index = None
+        self.segments = []           # min-heap of the most unstable windows
+        self.first_index = None
+
+    def prepare(self, width: int, height: int, fps: float):
+        self.fps = fps
+        self.full_pixels = width * height
+
+    def wanted_frames(self, frame_count: int):
+        pairs = max(1, frame_count - 1)
+        stride = max(1, -(-pairs // self.max_pairs))
+        if stride == 1:
+            return range(frame_count)
+        # pairs (s, s + 1) spread over the clip
+        return sorted({i for start in range(0, frame_count - 1, stride) for i in (start, start + 1)})
+
+    def visit(self, index, frame, ring):
+        height, width = frame.shape[:2]
+        factor = -(-width // self.width) if self.width else 1
+        size = (width // factor, height // factor)
+
+        # convert to grayscale for simpler math (then shrink), into the buffer of the frame before last
+        spare = self.grays[1]
+        if spare is not None and spare.shape != (size[1], size[0]):
+            spare = None
+        if factor == 1:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=spare)
+        else:
+            if self.full_gray is None or self.full_gray.shape != (height, width):
+                self.full_gray = np.empty((height, width), dtype=np.uint8)
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.full_gray)
+            gray = cv2.resize(self.full_gray, size, dst=spare, interpolation=cv2.INTER_AREA)
+        self.grays = [gray, self.grays[0]]
+
+        if self.prev_index == index - 1:
+            if self.diff is None:
+                self.pixel_scale = (self.full_pixels or gray.size) / gray.size
+                self.diff = np.empty_like(gray)
+            # Calculate absolute difference between current and previous frame
+            cv2.absdiff(self.grays[1], gray, dst=self.diff)
+            self._add(index, cv2.countNonZero(self.diff) * self.pixel_scale)
+
+        self.prev_index = index
+
+    def _add(self, index: int, score: float):
+        if self.first_index is None:
+            self.first_index = index - 1
+        self.clip.add(score)
+        if self.current_start is None:
+            self.current_start = index - 1
+        self.current.add(score)
+        self.last_index = index
+        if self.current.n == self.window:
+            self._close_window()
+
+    def _close_window(self):
+        variance = self.current.variance
+        self.windows.add(variance)
+        segment = (variance, self.current_start, self.last_index, self.current.mean)
+        if len(self.segments) < self.top_segments:
+            heapq.heappush(self.segments, segment)
+        elif self.segments and variance > self.segments[0][0]:
+            heapq.heapreplace(self.segments, segment)
+        self.current = Welford()
+        self.current_start = None
+
+    def result(self) -> dict:
+        if not self.clip.n:
             return {"valid": False, "error": "Not enough frames to analyze"}
 
-        # Calculate statistics
-        # Variance: How "jerky" the movement is
+        # a trailing partial window still counts if it's at least half full
+        if self.current.n >= self.window // 2 or not self.windows.n:
+            self._close_window()
+
+        # Variance: How "jerky" the movement is (per window, averaged over the clip)
         # Mean: How much movement there is overall
-        movement_variance = np.var(diff_scores)
-        avg_movement = np.mean(diff_scores)
-        
+        movement_variance = self.windows.mean
+        avg_movement = self.clip.mean
+        peak = max(self.segments)[0] if self.segments else movement_variance
+
         return {
             "valid": True,
             "flux_score": float(movement_variance),
             "avg_movement": float(avg_movement),
+            "peak_flux": float(peak),
+            "clip_variance": float(self.clip.variance),
+            "pairs_analyzed": self.clip.n,
+            "coverage": {
+                "start": round(self.first_index / self.fps, 2),
+                "end": round(self.last_index / self.fps, 2)
+            },
+            "unstable_segments": [
+                {
+                    "start": round(start / self.fps, 2),
+                    "end": round(end / self.fps, 2),
+                    "flux_score": float(variance),
+                    "avg_movement": float(mean)
+                }
+                for variance, start, end, mean in sorted(self.segments, key=lambda seg: seg[1])
+            ],
             "interpretation": "High temporal instability (Glitchy/AI)" if movement_variance > 10000000 else "Stable motion"
         }
 
+class FingerprintAnalyzer(FrameAnalyzer):
+    """
+    Perceptual fingerprints: dHash of the middle frame (exact cache key)
+    and pHashes of `samples` keyframes spread over the clip (near-duplicate index).
+    Only needs tiny grayscale images, so it takes downscaled frames.
+    """
+    max_width = 64
+
+    def __init__(self, samples: int = 5):
+        self.samples = samples
+        self.middle = None
+        self.sample_frames = set()
+        self.dhash = None
+        self.phashes = []
+
+    def wanted_frames(self, frame_count: int):
+        self.middle = frame_count // 2
+        # evenly spaced, away from the very start/end (fades, title cards)
+        self.sample_frames = {frame_count * (i + 1) // (self.samples + 1) for i in range(self.samples)}
+        return self.sample_frames | {self.middle}
+
+    def visit(self, index, frame, ring):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if index == self.middle:
+            self.dhash = compute_dhash(gray)
+        if index in self.sample_frames and (phash := compute_phash(gray)):
+            self.phashes.append(phash)
+
+    def result(self) -> dict:
+        return {"dhash": self.dhash, "phashes": self.phashes}
+
+def compute_dhash(gray) -> str:
+    """
+    64-bit difference hash: is each pixel brighter than its right neighbour on a 9x8 thumbnail.
+    Survives re-encoding and resizing. Returns None for near-flat images (black/blank frames)
+    because those would collide with every other blank frame.
+    """
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    if not 8 <= int(bits.sum()) <= 56:
+        return None
+    return np.packbits(bits).tobytes().hex()
+
+def compute_phash(gray) -> str:
+    """
+    64-bit perceptual hash: sign of the 8x8 lowest DCT frequencies vs their median.
+    More robust than dHash to crops, re-encodes and colour tweaks, so it backs the
+    near-duplicate index. Returns None for flat images.
+    """
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    if np.abs(low[1:]).max() < 1e-3:
+        return None
+    bits = low > np.median(low[1:])
+    return np.packbits(bits).tobytes().hex()
+
+def hash_file(path) -> str:
+    """
+    Fast content hash of the raw bytes (blake2b, streamed in 1 MB chunks).
+    Also takes the bytes themselves.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if is_buffer(path):
+        digest.update(path)
+        return digest.hexdigest()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def fingerprint_image(image_path) -> dict:
+    try:
+        gray = np.array(Image.open(open_source(image_path)).convert("L"))
+        dhash = compute_dhash(gray)
+        phashes = [p] if (p := compute_phash(gray)) else []
+    except Exception:
+        dhash, phashes = None, []
+    return {"digest": hash_file(image_path), "dhash": dhash, "phashes": phashes}
+
+def analyze_video_frames(video_path: str, extra: dict = None) -> dict:
+    """
+    Every frame-level analysis in a single decode pass over the video: perceptual
+    fingerprint, ELA and movement consistency, plus the `extra` analyzers
+    (name -> FrameAnalyzer, e.g. the local classifier), each result under its name.
+    """
+    analyzers = {"fingerprint": FingerprintAnalyzer(), "ela": ELAAnalyzer(), "movement": FluxAnalyzer(), **(extra or {})}
+    source = FrameSource(video_path)
+    for analyzer in analyzers.values():
+        source.register(analyzer)
+    try:
+        return dict(zip(analyzers, source.run()))
     except Exception as e:
-        return {"valid": False, "error": str(e)}
\ No newline at end of file
+        error = {"valid": False, "error": str(e)}
+        results = {name: dict(error) for name in analyzers}
+        results["fingerprint"] = {"dhash": None, "phashes": []}
+        return results
+
+def perform_ela_analysis(video_path: str) -> dict:
+    """
+    Extracts a frame, performs Error Level Analysis (ELA), 
+    and calculates a 'Noise Consistency Score'.
+    """
+    try:
+        return FrameSource(video_path).register(ELAAnalyzer()).run()[0]
+    except Exception as e:
+        return {"valid": False, "error": str(e)}
+    
+def analyze_frame_consistency(video_path: str) -> dict:
+    """
+    Analyzes temporal stability between consecutive frames (flux).
+    """
+    try:
+        return FrameSource(video_path).register(FluxAnalyzer()).run()[0]
+    except Exception as e:
+        return {"valid": False, "error": str(e)}
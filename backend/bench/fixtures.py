@@ -0,0 +1,150 @@
+"""
+Synthetic media for the benchmark: images in several formats and sizes, short videos
+drawn with OpenCV and texts of varying length. Everything is generated from a seed and
+written once to bench/fixtures/ (regenerated when the seed or the recipe changes), so two
+runs on different commits read exactly the same bytes.
+"""
+
+import os
+import json
+import cv2
+import numpy as np
+from pathlib import Path
+
+FIXTURES_VERSION = 1
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+# (name, width, height, formats): phone-photo sized images only as jpeg/webp, a noisy
+# 12 MP png would be over IMAGE_MAX_BYTES
+IMAGE_SIZES = [
+    ("small", 640, 480, ["jpg", "png", "webp"]),
+    ("medium", 1920, 1080, ["jpg", "png", "webp"]),
+    ("large", 4032, 3024, ["jpg", "webp"]),
+]
+# (name, width, height, fps, seconds)
+VIDEO_SIZES = [
+    ("240p", 320, 240, 24, 3),
+    ("360p", 640, 360, 30, 4),
+    ("720p", 1280, 720, 30, 5),
+]
+
+WORDS = (
+    "the a we they it this that people video photo post account news report claim source city team game "
+    "market phone camera story friend week night morning today said says shows looks seems really just "
+    "still never always maybe probably honestly anyway new old big small first last good bad real fake "
+    "shared posted watched found noticed checked believe think know remember went saw got made took"
+).split()
+FORMAL = (
+    "furthermore moreover additionally consequently it is important to note that overall in conclusion "
+    "significant comprehensive various numerous essential crucial ensure provide demonstrate highlight"
+).split()
+
+def draw_scene(rng, width: int, height: int) -> np.ndarray:
+    """
+    A gradient background with random shapes and mild sensor-like noise (no two alike,
+    so fixtures never match each other as near-duplicates).
+    """
+    top, bottom = rng.integers(0, 256, 3), rng.integers(0, 256, 3)
+    ramp = np.linspace(0, 1, height)[:, None, None]
+    image = (top * (1 - ramp) + bottom * ramp).repeat(width, axis=1).astype(np.uint8)
+    scale = max(width, height)
+    for _ in range(int(rng.integers(8, 20))):
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        size = int(rng.integers(scale // 40, scale // 6))
+        if rng.random() < 0.5:
+            cv2.circle(image, (x, y), size, color, -1)
+        else:
+            cv2.rectangle(image, (x, y), (x + size, y + size // 2), color, -1)
+    cv2.putText(image, f"#{int(rng.integers(1e6))}", (width // 20, height // 2), cv2.FONT_HERSHEY_SIMPLEX,
+                scale / 600, (255, 255, 255), max(1, scale // 400))
+    noise = rng.normal(0, 3, image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+def write_image(path: Path, image: np.ndarray):
+    params = {
+        "jpg": [cv2.IMWRITE_JPEG_QUALITY, 90],
+        "webp": [cv2.IMWRITE_WEBP_QUALITY, 85],
+        "png": [cv2.IMWRITE_PNG_COMPRESSION, 3],
+    }[path.suffix[1:]]
+    if not cv2.imwrite(str(path), image, params):
+        raise RuntimeError(f"OpenCV could not write {path.name}")
+
+def write_video(path: Path, rng, width: int, height: int, fps: int, seconds: int):
+    """
+    Shapes bouncing over a fixed scene: real motion for the flux scan, texture for ELA.
+    """
+    background = draw_scene(rng, width, height)
+    sprites = [
+        (rng.uniform(0, width), rng.uniform(0, height), rng.uniform(-6, 6), rng.uniform(-6, 6),
+         int(rng.integers(height // 20, height // 6)), tuple(int(c) for c in rng.integers(0, 256, 3)))
+        for _ in range(4)
+    ]
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError("OpenCV has no mp4v encoder")
+    try:
+        for i in range(fps * seconds):
+            frame = background.copy()
+            for x, y, dx, dy, radius, color in sprites:
+                cx = int(abs((x + dx * i) % (2 * width) - width))
+                cy = int(abs((y + dy * i) % (2 * height) - height))
+                cv2.circle(frame, (cx, cy), radius, color, -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+
+def make_text(rng, words: int, formal: bool) -> str:
+    vocabulary = WORDS + FORMAL * 3 if formal else WORDS
+    sentences, count = [], 0
+    while count < words:
+        length = int(rng.integers(12, 20)) if formal else int(rng.integers(3, 25))
+        sentence = " ".join(rng.choice(vocabulary, length))
+        sentences.append(sentence[0].upper() + sentence[1:] + ("." if formal or rng.random() < 0.7 else "!"))
+        count += length
+    return " ".join(sentences)
+
+def build_fixtures(directory: Path = FIXTURES_DIR, seed: int = 42, images_per_variant: int = 2,
+                   videos_per_size: int = 1, texts: int = 24) -> dict:
+    """
+    Writes the fixtures (unless the same recipe is already on disk) and returns the
+    manifest: {"images": [relative paths], "videos": [...], "texts": [...]}.
+    """
+    directory = Path(directory)
+    recipe = {"version": FIXTURES_VERSION, "seed": seed, "images_per_variant": images_per_variant,
+              "videos_per_size": videos_per_size, "texts": texts}
+    manifest_path = directory / "manifest.json"
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+        if manifest.get("recipe") == recipe and all((directory / p).exists() for p in manifest["images"] + manifest["videos"]):
+            return manifest
+
+    rng = np.random.default_rng(seed)
+    (directory / "images").mkdir(parents=True, exist_ok=True)
+    (directory / "videos").mkdir(parents=True, exist_ok=True)
+
+    images = []
+    for name, width, height, formats in IMAGE_SIZES:
+        for ext in formats:
+            for i in range(images_per_variant):
+                path = Path("images") / f"{name}-{i}.{ext}"
+                write_image(directory / path, draw_scene(rng, width, height))
+                images.append(str(path))
+
+    videos = []
+    for name, width, height, fps, seconds in VIDEO_SIZES:
+        for i in range(videos_per_size):
+            path = Path("videos") / f"{name}-{i}.mp4"
+            write_video(directory / path, rng, width, height, fps, seconds)
+            videos.append(str(path))
+
+    # short comments to essay-length posts, half casual and half formal
+    lengths = np.geomspace(30, 2000, texts).astype(int)
+    text_items = [make_text(rng, int(words), formal=i % 2 == 1) for i, words in enumerate(lengths)]
+
+    manifest = {"recipe": recipe, "images": images, "videos": videos, "texts": text_items}
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+def fixture_bytes(directory: Path, manifest: dict) -> dict:
+    return {kind: sum(os.path.getsize(Path(directory) / p) for p in manifest[kind]) for kind in ("images", "videos")}
@@ -0,0 +1,49 @@
+"""
+Legacy vs capped video ingestion on a real, long video (needs network, downloads the
+whole legacy file, so it's a manual benchmark rather than a test):
+
+    cd backend
+    python -m bench.ingestion [url]
+"""
+
+import os
+import sys
+import time
+import cv2
+from app import utils
+
+# Big Buck Bunny: 10 minutes, up to 4K - worst case for the old "best quality, whole file" download
+TEST_VIDEO = "https://www.youtube.com/watch?v=aqz-KE-bpKQ"
+
+def first_frame(path):
+    cap = cv2.VideoCapture(path)
+    ok, _ = cap.read()
+    cap.release()
+    return ok
+
+def ingest(url: str, capped: bool):
+    start = time.time()
+    utils.VIDEO_CAPPED_INGEST = capped
+    info = utils.probe_video(url)
+    path = utils.download_and_process_video(url, info)
+    try:
+        ok = first_frame(path)
+        return os.path.getsize(path), time.time() - start, ok
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    url = sys.argv[1] if len(sys.argv) > 1 else TEST_VIDEO
+    print("BENCHMARK: legacy vs capped video ingestion")
+    print(f"Target: {url}")
+
+    legacy_bytes, legacy_time, legacy_ok = ingest(url, capped=False)
+    capped_bytes, capped_time, capped_ok = ingest(url, capped=True)
+
+    print("-" * 40)
+    print(f"Legacy: {legacy_bytes / 2**20:8.1f} MB, first frame after {legacy_time:6.1f}s")
+    print(f"Capped: {capped_bytes / 2**20:8.1f} MB, first frame after {capped_time:6.1f}s")
+    print(f"Reduction: {legacy_bytes / max(capped_bytes, 1):.1f}x bytes, {legacy_time / max(capped_time, 0.001):.1f}x time")
+
+    if not (capped_ok and capped_bytes < legacy_bytes):
+        sys.exit("capped ingestion did not help (or produced an unreadable file)")
@@ -0,0 +1,54 @@
+"""
+Summaries and regression checks for bench/run.py results (no app imports, so tests can use it).
+"""
+
+import sys
+import numpy as np
+
+PERCENTILES = (50, 90, 95, 99)
+
+def summarize(samples: list) -> dict:
+    if not samples:
+        return {"count": 0}
+    values = np.array(samples) * 1000
+    summary = {"count": len(samples), "mean_ms": round(float(values.mean()), 2)}
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = round(float(np.percentile(values, p)), 2)
+    summary["max_ms"] = round(float(values.max()), 2)
+    return summary
+
+def report(name: str, scenario: dict):
+    latency = scenario["latency"]["all"]
+    print(f"{name:10s} {scenario['requests']:4d} req  {scenario['throughput_rps']:7.2f} req/s  "
+          f"p50 {latency.get('p50_ms', 0):8.1f} ms  p95 {latency.get('p95_ms', 0):8.1f} ms  "
+          f"errors {scenario['errors']}  cpu {scenario['cpu_seconds']['main']:.1f}+{scenario['cpu_seconds']['workers']:.1f}s  "
+          f"rss {scenario['peak_rss_mb']['main']:.0f}+{scenario['peak_rss_mb']['workers_total']:.0f} MB", file=sys.__stdout__, flush=True)
+
+def compare(baseline: dict, current: dict, tolerance: float, min_delta_ms: float) -> list:
+    """
+    Metrics at least `tolerance` (relative) worse than the baseline, ignoring latency
+    changes under min_delta_ms. Returns (scenario, metric, before, after) tuples.
+    """
+    regressions = []
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        if now["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append((name, "throughput_rps", before["throughput_rps"], now["throughput_rps"]))
+
+        latencies = [(f"latency.{k}", before["latency"].get(k, {}), v) for k, v in now["latency"].items()]
+        latencies += [(f"stages.{k}", before["stages"].get(k, {}), v) for k, v in now["stages"].items()]
+        for metric, old, new in latencies:
+            for p in ("p50_ms", "p95_ms"):
+                if p in old and p in new and new[p] - old[p] >= min_delta_ms and new[p] > old[p] * (1 + tolerance):
+                    regressions.append((name, f"{metric}.{p}", old[p], new[p]))
+
+        for metric in ("main", "workers"):
+            old, new = before["cpu_seconds"][metric], now["cpu_seconds"][metric]
+            if new - old >= 0.5 and new > old * (1 + tolerance):
+                regressions.append((name, f"cpu_seconds.{metric}", old, new))
+        old, new = before["peak_rss_mb"]["main"], now["peak_rss_mb"]["main"]
+        if new - old >= 50 and new > old * (1 + tolerance):
+            regressions.append((name, "peak_rss_mb.main", old, new))
+    return regressions
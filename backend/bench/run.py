@@ -0,0 +1,282 @@
+"""
+End-to-end benchmark of the backend on local fixtures with the stub LLM.
+
+Serves bench/fixtures over a local HTTP server, drives the FastAPI app in-process with N
+concurrent clients (/analyze for videos and texts, /analyze/image for images) and records:
+- per-stage latency percentiles (download, probe, ELA/flux, upload, LLM, cache lookups, ...)
+  from the app.timings observers
+- request latency percentiles and throughput for each client count
+- CPU seconds and peak RSS of the server process and its process-pool workers
+
+Cold rounds start from an empty cache and near-duplicate index; the warm round repeats
+the same requests against the filled cache. Results go to JSON; --compare flags the
+metrics that got worse than a previous run (exit code 1), e.g. between two commits:
+
+    cd backend
+    python -m bench.run --output /tmp/before.json
+    git checkout my-branch
+    python -m bench.run --output /tmp/after.json --compare /tmp/before.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+import contextlib
+from pathlib import Path
+from functools import partial
+from collections import defaultdict
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+# before the app is imported: in-memory cache (the bench flushes it), throwaway near-duplicate index
+os.environ["REDIS_URL"] = "redis://127.0.0.1:1"
+os.environ["PHASH_INDEX_PATH"] = str(Path(tempfile.gettempdir()) / f"verifai-bench-{os.getpid()}.npz")
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+import httpx
+from bench.fixtures import build_fixtures, fixture_bytes, FIXTURES_DIR
+from bench.report import summarize, report, compare
+from app import executor
+from app.main import app
+from app.cache import cache
+from app.phash_index import near_duplicates
+from app.timings import stage_observers
+from app.llm import StubBackend, set_llm, llm_stats
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # yt-dlp's probe hangs up mid-response (broken pipe), that's fine
+        pass
+
+def serve_fixtures(directory: Path):
+    """
+    Static file server on a free port (Last-Modified / If-Modified-Since like a CDN).
+    """
+    server = FixtureServer(("127.0.0.1", 0), partial(QuietHandler, directory=str(directory)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def worker_pids() -> list:
+    pool = executor._cpu_pool
+    return list(pool._processes) if pool is not None else []
+
+def proc_usage(pid) -> tuple:
+    """
+    (cpu seconds, peak RSS in MB) of a live process, from /proc (Linux).
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        with open(f"/proc/{pid}/status") as f:
+            hwm = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+        return cpu, hwm / 1024
+    except (OSError, StopIteration, IndexError):
+        return 0.0, 0.0
+
+def reset_peak_rss(pids: list) -> bool:
+    # writing 5 to clear_refs resets VmHWM, so each scenario reports its own peak
+    try:
+        for pid in pids:
+            with open(f"/proc/{pid}/clear_refs", "w") as f:
+                f.write("5")
+        return True
+    except OSError:
+        return False
+
+def snapshot() -> dict:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    main_cpu, main_rss = proc_usage("self")
+    workers = {pid: proc_usage(pid) for pid in worker_pids()}
+    return {
+        "main_cpu": main_cpu or usage.ru_utime + usage.ru_stime,
+        # ru_maxrss is the lifetime peak (KB on Linux), only used without /proc
+        "main_rss": main_rss or usage.ru_maxrss / 1024,
+        "workers": workers
+    }
+
+def usage_between(before: dict, after: dict) -> dict:
+    worker_cpu = sum(cpu - before["workers"].get(pid, (0.0, 0.0))[0] for pid, (cpu, _) in after["workers"].items())
+    return {
+        "cpu_seconds": {
+            "main": round(after["main_cpu"] - before["main_cpu"], 3),
+            "workers": round(worker_cpu, 3)
+        },
+        "peak_rss_mb": {
+            "main": round(after["main_rss"], 1),
+            "workers_max": round(max((rss for _, rss in after["workers"].values()), default=0.0), 1),
+            "workers_total": round(sum(rss for _, rss in after["workers"].values()), 1)
+        }
+    }
+
+def build_workload(manifest: dict, base_url: str, kinds: list) -> list:
+    workload = []
+    if "video" in kinds:
+        workload += [("video", "/analyze", {"url": f"{base_url}/{path}"}) for path in manifest["videos"]]
+    if "image" in kinds:
+        workload += [("image", "/analyze/image", {"url": f"{base_url}/{path}"}) for path in manifest["images"]]
+    if "text" in kinds:
+        workload += [("text", "/analyze", {"text": text}) for text in manifest["texts"]]
+    return workload
+
+async def run_round(client: httpx.AsyncClient, workload: list, clients: int) -> list:
+    """
+    `clients` concurrent clients work through the queue, one request at a time each.
+    Returns (kind, seconds, ok) per request.
+    """
+    queue = asyncio.Queue()
+    for item in workload:
+        queue.put_nowait(item)
+    results = []
+
+    async def client_loop():
+        while not queue.empty():
+            kind, path, body = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                ok = response.status_code == 200 and response.json().get("verdict") != "Error"
+            except Exception:
+                ok = False
+            results.append((kind, time.perf_counter() - start, ok))
+
+    await asyncio.gather(*(client_loop() for _ in range(clients)))
+    return results
+
+async def run_scenario(client, workload: list, clients: int, rounds: int, warm: bool) -> dict:
+    samples = defaultdict(list)
+    observer = lambda kind, stage, seconds, error: samples[f"{kind}.{stage}"].append(seconds)
+
+    peak_reset = reset_peak_rss(["self", *worker_pids()])
+    before = snapshot()
+    stage_observers.append(observer)
+    started = time.perf_counter()
+    try:
+        results = []
+        for _ in range(rounds):
+            if not warm:
+                cache.flushdb()
+                near_duplicates.clear()
+            results += await run_round(client, workload, clients)
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_observers.remove(observer)
+    after = snapshot()
+
+    by_kind = defaultdict(list)
+    for kind, seconds, _ in results:
+        by_kind[kind].append(seconds)
+    return {
+        "clients": clients,
+        "requests": len(results),
+        "errors": sum(not ok for _, _, ok in results),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 3),
+        "latency": {"all": summarize([s for _, s, _ in results]), **{k: summarize(v) for k, v in sorted(by_kind.items())}},
+        "stages": {name: summarize(v) for name, v in sorted(samples.items())},
+        "peak_rss_per_scenario": peak_reset,
+        **usage_between(before, after)
+    }
+
+async def run_benchmark(args, manifest: dict, base_url: str) -> dict:
+    workload = build_workload(manifest, base_url, args.kinds)
+    scenarios = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for clients in args.clients:
+                scenarios[f"cold-c{clients}"] = await run_scenario(client, workload, clients, args.rounds, warm=False)
+                report(f"cold-c{clients}", scenarios[f"cold-c{clients}"])
+                if args.warm:
+                    scenarios[f"warm-c{clients}"] = await run_scenario(client, workload, clients, 1, warm=True)
+                    report(f"warm-c{clients}", scenarios[f"warm-c{clients}"])
+    return scenarios
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the backend end to end on local fixtures with a stub LLM")
+    parser.add_argument("--clients", default="1,4,16", help="comma-separated concurrent client counts")
+    parser.add_argument("--rounds", type=int, default=1, help="cold passes over the fixtures per client count")
+    parser.add_argument("--kinds", default="video,image,text", help="which fixtures to send")
+    parser.add_argument("--no-warm", dest="warm", action="store_false", help="skip the warm (cache hit) round")
+    parser.add_argument("--llm-latency", default="fixed:0.25", help="stub LLM latency distribution (see LLM_STUB_LATENCY)")
+    parser.add_argument("--llm-processing", default="fixed:0", help="how long stub uploads stay PROCESSING (see LLM_STUB_PROCESSING)")
+    parser.add_argument("--seed", type=int, default=42, help="fixture and stub seed")
+    parser.add_argument("--images-per-variant", type=int, default=2, help="images per size/format pair")
+    parser.add_argument("--videos-per-size", type=int, default=1)
+    parser.add_argument("--texts", type=int, default=24)
+    parser.add_argument("--fixtures", default=str(FIXTURES_DIR))
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--compare", help="previous results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown that counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="ignore latency changes smaller than this")
+    parser.add_argument("--log", default=os.devnull, help="where the app's own output goes")
+    args = parser.parse_args()
+    args.clients = [int(c) for c in args.clients.split(",")]
+    args.kinds = [k.strip() for k in args.kinds.split(",")]
+    return args
+
+def main():
+    args = parse_args()
+    manifest = build_fixtures(Path(args.fixtures), args.seed, args.images_per_variant, args.videos_per_size, args.texts)
+    print(f"Fixtures: {len(manifest['images'])} images, {len(manifest['videos'])} videos, {len(manifest['texts'])} texts "
+          f"({ {k: f'{v / 2**20:.1f} MB' for k, v in fixture_bytes(Path(args.fixtures), manifest).items()} })")
+
+    server, base_url = serve_fixtures(Path(args.fixtures))
+    set_llm(StubBackend(latency=args.llm_latency, seed=args.seed, processing=args.llm_processing))
+    try:
+        # the app (and yt-dlp) print a lot per request; keep the report readable
+        with open(args.log, "a") as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            scenarios = asyncio.run(run_benchmark(args, manifest, base_url))
+    finally:
+        server.shutdown()
+        Path(os.environ["PHASH_INDEX_PATH"]).unlink(missing_ok=True)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "cpu_workers": executor.CPU_WORKERS,
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "log")},
+            "fixtures": manifest["recipe"]
+        },
+        "scenarios": scenarios,
+        "llm": llm_stats()
+    }
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    print(f"Results: {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare(baseline, results, args.tolerance, args.min_delta_ms)
+        print(f"Compared with {args.compare} (commit {baseline.get('meta', {}).get('commit')}):")
+        for name, metric, old, new in regressions:
+            print(f"   REGRESSION {name:10s} {metric:40s} {old} -> {new}")
+        if regressions:
+            sys.exit(1)
+        print("   no regressions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Feature extraction cost of the stylometric text pre-screener, per KB, on a short comment
+and on a long post (decides TEXT_PRESCREEN_INLINE_BYTES):
+
+    cd backend
+    python -m bench.text_prescreen
+"""
+
+import time
+from app import text_model
+
+HUMAN = "lol the update is trash!!! my battery dies by noon now, sooo annoying. anyone else?? i swear it was fine last week"
+AI = ("Artificial intelligence has transformed numerous industries. Furthermore, it offers significant benefits in "
+      "efficiency and accuracy. However, it is important to consider the ethical implications. In conclusion, a "
+      "balanced approach is essential for sustainable progress.")
+
+RUNS = 500
+
+if __name__ == "__main__":
+    for name, text in (("comment", HUMAN), ("long post", (HUMAN + " " + AI) * 40)):
+        kb = len(text.encode("utf-8")) / 1024
+        start = time.perf_counter()
+        for _ in range(RUNS):
+            text_model.text_features(text)
+        ms = (time.perf_counter() - start) / RUNS * 1000
+        print(f"{name:10s} {kb:6.1f} KB: {ms:6.3f} ms ({ms / kb:.3f} ms/KB)")
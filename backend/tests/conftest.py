@@ -0,0 +1,8 @@
+import os
+import sys
+
+# make `app` importable when pytest runs from the repo root or from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# offline tests never reach Gemini; anything that would gets the canned stub backend
+os.environ.setdefault("LLM_BACKEND", "stub")
@@ -0,0 +1,121 @@
+import json
+import asyncio
+import fakeredis
+import httpx
+import pytest
+from app import batch, cache, core, llm
+from app.cache import url_key, canonicalize_url
+from app.llm import LLMBackend
+from app.main import app
+from app.singleflight import SingleFlight
+
+class PackingGemini(LLMBackend):
+    """
+    Answers packed image prompts with a JSON array and single prompts with one object.
+    Inline parts are just the image's name, so every call records which images it got.
+    """
+    name = "fake"
+
+    def __init__(self, drop=(), fail_packs=False):
+        super().__init__()
+        self.calls = []
+        self.drop = set(drop)
+        self.fail_packs = fail_packs
+
+    def inline(self, data: bytes, mime_type: str):
+        return {"image": data.decode()}
+
+    async def _generate(self, contents, model):
+        images = [part["image"] for part in contents if isinstance(part, dict)]
+        self.calls.append(images)
+        await asyncio.sleep(0.01)
+        if not images:
+            return json.dumps({"Detector_score": 10, "verdict": "Human", "content_analysis": {}})
+        if len(images) == 1:
+            return json.dumps({"verdict": "Real", "ai_probability": 5, "image": images[0]})
+        if self.fail_packs:
+            raise RuntimeError("model overloaded")
+        return json.dumps([{"id": str(n), "verdict": "Fake", "image": name} for n, name in enumerate(images) if name not in self.drop])
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """
+    Own redis, backend and single-flight, with image forensics replaced by instant fakes
+    (slow-* images take a while, so their lines have to come last).
+    """
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "cache", client)
+    monkeypatch.setattr(core, "flights", SingleFlight(client, poll_interval=0.01))
+    backend = PackingGemini()
+    monkeypatch.setattr(llm, "_backend", backend)
+
+    async def prepare_image(image_url, keys, progress=None):
+        name = image_url.rsplit("/", 1)[-1]
+        await asyncio.sleep(0.3 if name.startswith("slow") else 0.01)
+        return {"keys": keys, "data": name.encode(), "mime_type": "image/png", "phashes": [],
+                "metadata": {}, "ela": {}, "local_verdict": None}
+
+    async def finish_image(state, result):
+        return result
+
+    monkeypatch.setattr(batch, "prepare_image", prepare_image)
+    monkeypatch.setattr(batch, "finish_image", finish_image)
+    monkeypatch.setattr(batch, "BATCH_PACK_IMAGES", 3)
+    return backend
+
+def image(name: str) -> str:
+    return f"https://example.invalid/{name}"
+
+def post_batch(items: list) -> list:
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            return await client.post("/analyze/batch", json={"items": items})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+def test_images_are_packed_and_lines_stream_as_they_finish(gemini):
+    cache.store([url_key("image", canonicalize_url(image("cached")))], {"verdict": "Real", "image": "cached"})
+    names = ["slow", "a", "b", "c", "d"]
+    items = [{"id": f"item-{name}", "image_url": image(name)} for name in names]
+    items += [{"image_url": image("cached")}, {"image_url": image("a")}, {"nothing": "here"}]
+
+    lines = post_batch(items)
+    assert sorted(line["index"] for line in lines) == list(range(len(items)))
+    by_index = {line["index"]: line for line in lines}
+    assert [by_index[i]["id"] for i in range(len(items))] == [f"item-{name}" for name in names] + ["5", "6", "7"]
+
+    # no analysis needed: the cache hit and the invalid item come out first, the slow image last
+    assert {lines[0]["index"], lines[1]["index"]} == {5, 7}
+    assert by_index[7]["type"] == "invalid"
+    assert lines[-1]["id"] == "item-slow"
+
+    # five distinct images to analyze, at most three per call; the duplicate rides along
+    assert sorted(len(call) for call in gemini.calls) == [2, 3]
+    assert sorted(name for call in gemini.calls for name in call) == sorted(names)
+    assert all(by_index[i]["result"] == {"verdict": "Fake", "image": names[i]} for i in range(5))
+    assert by_index[6]["result"] == by_index[1]["result"]
+
+def test_images_missing_from_a_packed_answer_get_their_own_call(gemini):
+    gemini.drop = {"b"}
+    lines = post_batch([{"image_url": image(name)} for name in ["a", "b", "c"]])
+
+    assert sorted(gemini.calls[0]) == ["a", "b", "c"] and gemini.calls[1:] == [["b"]]
+    verdicts = {line["result"]["image"]: line["result"]["verdict"] for line in lines}
+    assert verdicts == {"a": "Fake", "b": "Real", "c": "Fake"}
+
+def test_failed_packed_call_falls_back_to_single_calls(gemini):
+    gemini.fail_packs = True
+    lines = post_batch([{"image_url": image(name)} for name in ["a", "b"]])
+
+    assert sorted(sorted(call) for call in gemini.calls) == [["a"], ["a", "b"], ["b"]]
+    assert all(line["result"]["verdict"] == "Real" for line in lines)
+
+def test_every_miss_is_counted_once(gemini):
+    lines = post_batch([{"text": "Is this written by a bot? Asking for a friend"}, {"image_url": image("a")}])
+
+    assert len(lines) == 2
+    assert cache.cache.hgetall("stats:cache") == {"text:miss": "1", "url:miss": "1"}
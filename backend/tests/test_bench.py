@@ -0,0 +1,34 @@
+from bench.report import summarize, compare
+
+def scenario(throughput: float, p50: float, stage_p50: float, cpu: float = 1.0, rss: float = 200.0) -> dict:
+    latency = {"count": 10, "p50_ms": p50, "p95_ms": p50 * 2}
+    return {
+        "throughput_rps": throughput,
+        "latency": {"all": latency},
+        "stages": {"image.ela": {"count": 10, "p50_ms": stage_p50, "p95_ms": stage_p50 * 2}},
+        "cpu_seconds": {"main": cpu, "workers": cpu},
+        "peak_rss_mb": {"main": rss}
+    }
+
+def test_summarize_percentiles_in_ms():
+    summary = summarize([0.001 * i for i in range(1, 101)])
+    assert summary["count"] == 100
+    assert summary["p50_ms"] == 50.5
+    assert summary["max_ms"] == 100.0
+    assert summarize([]) == {"count": 0}
+
+def test_compare_flags_only_real_slowdowns():
+    before = {"scenarios": {"cold-c4": scenario(10.0, 300.0, 100.0)}}
+    same = {"scenarios": {"cold-c4": scenario(9.5, 310.0, 102.0)}}
+    assert compare(before, same, tolerance=0.2, min_delta_ms=5) == []
+
+    slower = {"scenarios": {"cold-c4": scenario(5.0, 300.0, 200.0, cpu=3.0)}}
+    flagged = {metric for _, metric, _, _ in compare(before, slower, tolerance=0.2, min_delta_ms=5)}
+    assert flagged == {"throughput_rps", "stages.image.ela.p50_ms", "stages.image.ela.p95_ms",
+                       "cpu_seconds.main", "cpu_seconds.workers"}
+
+def test_compare_ignores_tiny_latencies_and_new_scenarios():
+    # 1 ms -> 2 ms is +100% but under min_delta_ms
+    before = {"scenarios": {"warm-c1": scenario(300.0, 1.0, 1.0)}}
+    after = {"scenarios": {"warm-c1": scenario(300.0, 2.0, 2.0), "cold-c64": scenario(1.0, 9000.0, 9000.0)}}
+    assert compare(before, after, tolerance=0.2, min_delta_ms=5) == []
@@ -0,0 +1,21 @@
+from app.cache import canonicalize_url
+
+def test_platform_links_share_one_key():
+    canonical = "https://youtube.com/watch?v=jNQXAC9IVRw"
+    assert canonicalize_url("https://youtu.be/jNQXAC9IVRw?si=abc") == canonical
+    assert canonicalize_url("http://www.youtube.com/shorts/jNQXAC9IVRw/") == canonical
+    assert canonicalize_url("https://m.youtube.com/watch?v=jNQXAC9IVRw&t=42&feature=share&utm_source=x") == canonical
+    assert canonicalize_url("https://twitter.com/user/status/1?s=20&t=abc") == "https://x.com/user/status/1"
+    assert canonicalize_url("https://www.instagram.com/reel/Cx1/?igsh=abc") == "https://instagram.com/reel/Cx1"
+
+def test_other_urls_keep_params_that_may_select_content():
+    # on an arbitrary CDN `s` / `t` / `hl` can pick the image, and http may be a different resource
+    assert canonicalize_url("http://cdn.example.com/img?s=200&t=thumb&hl=en") == "http://cdn.example.com/img?hl=en&s=200&t=thumb"
+    assert canonicalize_url("https://cdn.example.com/img?s=200") != canonicalize_url("https://cdn.example.com/img?s=800")
+    assert canonicalize_url("https://cdn.example.com:8443/a/") == "https://cdn.example.com:8443/a/"
+
+def test_campaign_trackers_are_stripped_everywhere():
+    assert canonicalize_url("https://cdn.example.com/img.jpg?utm_source=x&fbclid=1&id=7") == "https://cdn.example.com/img.jpg?id=7"
+
+def test_unknown_params_on_platforms_are_kept():
+    assert canonicalize_url("https://youtube.com/watch?v=abc&list=PL1") == "https://youtube.com/watch?list=PL1&v=abc"
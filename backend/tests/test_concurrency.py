@@ -0,0 +1,159 @@
+import os
+import time
+import uuid
+import asyncio
+import threading
+import fakeredis
+import httpx
+import redis.client
+from app import cache, core, jobs, llm
+from app.main import app
+from app.executor import run_io
+from app.llm import StubBackend
+from app.media import new_media_base
+from app.singleflight import SingleFlight
+
+TEST_TEXT = "Yo bro, im going to the store to grab some milk, want anything? text me back asap"
+
+VIDEO_CLIENTS = 3
+TEXT_REQUESTS = 10
+DOWNLOAD_SECONDS = 1.0
+
+def test_blocking_work_runs_off_the_event_loop():
+    async def scenario():
+        ticks = []
+
+        async def heartbeat():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        beat = asyncio.ensure_future(heartbeat())
+        await run_io(time.sleep, 0.5)
+        beat.cancel()
+        return ticks
+
+    ticks = asyncio.run(scenario())
+    gaps = [b - a for a, b in zip(ticks, ticks[1:])]
+    # the loop kept ticking the whole time the blocking call ran
+    assert len(ticks) > 20
+    assert max(gaps) < 0.2
+
+def test_redis_calls_run_off_the_event_loop(monkeypatch):
+    # asyncio.run() drives the loop on this thread: no redis round-trip may happen on it
+    on_loop = []
+    loop_thread = threading.current_thread()
+
+    class WatchedRedis(fakeredis.FakeRedis):
+        def execute_command(self, *args, **kwargs):
+            if threading.current_thread() is loop_thread:
+                on_loop.append(args[0])
+            return super().execute_command(*args, **kwargs)
+
+    execute = redis.client.Pipeline.execute
+
+    def watched_execute(pipe, *args, **kwargs):
+        if threading.current_thread() is loop_thread:
+            on_loop.append("pipeline")
+        return execute(pipe, *args, **kwargs)
+
+    client = WatchedRedis(decode_responses=True)
+    monkeypatch.setattr(redis.client.Pipeline, "execute", watched_execute)
+    for module in (cache, core, jobs):
+        monkeypatch.setattr(module, "cache", client)
+    monkeypatch.setattr(core, "flights", SingleFlight(client, poll_interval=0.01))
+    monkeypatch.setattr(llm, "_backend", StubBackend(latency="fixed:0.01"))
+
+    text = f"{TEST_TEXT} #{uuid.uuid4().hex}"
+
+    async def not_disconnected():
+        return False
+
+    async def scenario():
+        job_id = await run_io(jobs.submit_job, "text", text)
+        worker = asyncio.ensure_future(jobs.job_worker(poll_interval=0.01))
+        events = [event async for event in jobs.stream_events(job_id, not_disconnected, poll_interval=0.01)]
+        # the same text again: a cache hit this time
+        cached = await core.analyze_text_logic(text)
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+        return events, cached
+
+    events, cached = asyncio.run(scenario())
+    assert "event: verdict" in events[-1]
+    assert cached["verdict"] != "Error"
+    assert on_loop == []
+
+def test_text_stays_fast_while_videos_download(monkeypatch):
+    downloads = []
+
+    def offline_probe(url):
+        raise RuntimeError("offline")
+
+    def slow_download(url, info=None):
+        # blocking, like yt-dlp + ffprobe
+        downloads.append(url)
+        time.sleep(DOWNLOAD_SECONDS)
+        raise RuntimeError("download failed")
+
+    monkeypatch.setattr(core, "probe_video", offline_probe)
+    monkeypatch.setattr(core, "download_and_process_video", slow_download)
+    # a quick LLM, so any slow text answer means it queued behind the download
+    monkeypatch.setattr(llm, "_backend", StubBackend(latency="fixed:0.01"))
+    video_url = f"https://www.youtube.com/watch?v={uuid.uuid4().hex[:11]}"
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            async def timed_post(payload):
+                start = time.perf_counter()
+                response = await client.post("/analyze", json=payload)
+                return response, time.perf_counter() - start
+
+            videos = [asyncio.ensure_future(timed_post({"url": video_url})) for _ in range(VIDEO_CLIENTS)]
+            await asyncio.sleep(0.1) # let the download start
+            # unique text per request so every one is a cache miss
+            texts = [await timed_post({"text": f"{TEST_TEXT} #{uuid.uuid4().hex}"}) for _ in range(TEXT_REQUESTS)]
+            return await asyncio.gather(*videos), texts
+
+    videos, texts = asyncio.run(scenario())
+
+    # identical concurrent requests share one analysis
+    assert len(downloads) == 1
+    assert all(r.status_code == 200 and r.json()["verdict"] == "Error" for r, _ in videos)
+    assert all(elapsed >= DOWNLOAD_SECONDS for _, elapsed in videos)
+
+    # before the executor layer text waited behind the whole download
+    assert all(r.status_code == 200 for r, _ in texts)
+    assert max(elapsed for _, elapsed in texts) < DOWNLOAD_SECONDS / 2
+
+def test_client_leaving_mid_download_removes_the_file(monkeypatch):
+    written = []
+
+    def offline_probe(url):
+        raise RuntimeError("offline")
+
+    def download(url, info=None):
+        # the thread can't be interrupted: it finishes and hands back a file nobody will read
+        time.sleep(0.3)
+        path = f"{new_media_base()}.mp4"
+        with open(path, "wb") as f:
+            f.write(b"\x00" * 1024)
+        written.append(path)
+        return path
+
+    monkeypatch.setattr(core, "probe_video", offline_probe)
+    monkeypatch.setattr(core, "download_and_process_video", download)
+    video_url = f"https://www.youtube.com/watch?v={uuid.uuid4().hex[:11]}"
+
+    async def scenario():
+        request = asyncio.ensure_future(core.analyze_video_logic(video_url))
+        await asyncio.sleep(0.1) # mid-download
+        request.cancel()
+        await asyncio.gather(request, return_exceptions=True)
+        await asyncio.sleep(0.5) # the download thread finishes
+        return request
+
+    assert asyncio.run(scenario()).cancelled()
+    assert len(written) == 1
+    assert not os.path.exists(written[0])
@@ -0,0 +1,82 @@
+import cv2
+import numpy as np
+from app import utils
+from app.utils import FrameAnalyzer, analyze_video_frames
+
+def write_clip(path, frames: int = 60, size=(160, 120)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 30, size)
+    rng = np.random.default_rng(0)
+    for i in range(frames):
+        frame = rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+        cv2.rectangle(frame, (i, 20), (i + 30, 60), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+class MiddleFrame(FrameAnalyzer):
+    def wanted_frames(self, frame_count):
+        return [frame_count // 2]
+
+    def visit(self, index, frame, ring):
+        self.index = index
+
+    def result(self):
+        return {"index": self.index}
+
+def test_every_frame_analysis_shares_one_decode(tmp_path, monkeypatch):
+    path = tmp_path / "clip.mp4"
+    write_clip(path)
+
+    opened = []
+    capture = cv2.VideoCapture
+    monkeypatch.setattr(utils.cv2, "VideoCapture", lambda p: opened.append(p) or capture(p))
+
+    results = analyze_video_frames(str(path), {"extra": MiddleFrame()})
+
+    assert opened == [str(path)]
+    assert set(results) == {"fingerprint", "ela", "movement", "extra"}
+    assert results["fingerprint"]["dhash"] and results["fingerprint"]["phashes"]
+    assert results["ela"]["valid"] and results["movement"]["valid"]
+    assert results["extra"] == {"index": 30}
+
+def test_unreadable_video_reports_every_analysis(tmp_path):
+    path = tmp_path / "broken.mp4"
+    path.write_bytes(b"not a video")
+
+    results = analyze_video_frames(str(path))
+    assert results["fingerprint"] == {"dhash": None, "phashes": []}
+    assert not results["ela"]["valid"] and not results["movement"]["valid"]
+
+class NoFrameCount:
+    """
+    VideoCapture of a container without a duration (live webm, some partial downloads).
+    """
+    capture = cv2.VideoCapture
+
+    def __init__(self, path):
+        self.cap = self.capture(path)
+
+    def get(self, prop):
+        return -2.7e17 if prop == cv2.CAP_PROP_FRAME_COUNT else self.cap.get(prop)
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+def test_unknown_frame_count_is_counted(tmp_path, monkeypatch):
+    path = tmp_path / "clip.mp4"
+    write_clip(path, frames=45)
+    monkeypatch.setattr(utils.cv2, "VideoCapture", NoFrameCount)
+
+    results = analyze_video_frames(str(path))
+    assert results["movement"]["valid"]
+    assert results["movement"]["pairs_analyzed"] == 44
+    assert [t["frame"] for t in results["ela"]["timeline"]] == [2, 8, 14, 19, 25, 30, 36, 42]
+    assert results["fingerprint"]["dhash"]
+
+def test_flux_shrinks_frames_by_a_whole_factor():
+    flux = utils.FluxAnalyzer(width=640)
+    flux.prepare(1080, 1920, 30.0)
+    frame = np.zeros((1920, 1080, 3), dtype=np.uint8)
+    flux.visit(0, frame, None)
+    flux.visit(1, frame, None)
+    assert flux.grays[0].shape == (960, 540)
+    assert flux.pixel_scale == 4.0
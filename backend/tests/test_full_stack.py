@@ -33,6 +33,13 @@ def test_everything():
         print("\nFLUX (Movement):")
         print(f"   Variance: {hs.get('movement_scan', {}).get('flux_score')}")
         
+        timings = data.get("timings", {})
+        if timings:
+            print("\nSTAGE TIMINGS:")
+            for name, t in timings.get("stages", {}).items():
+                print(f"   {name:<10} start={t['start']:.2f}s duration={t['duration']:.2f}s")
+            print(f"   Critical path: {' -> '.join(timings.get('critical_path', []))}")
+
         print("-" * 40)
         print("GEMINI THOUGHT PROCESS:")
         print(data.get("thinking_process", "No thinking process returned."))
@@ -0,0 +1,107 @@
+import io
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from PIL import Image
+from app.http_client import fetch, fetch_async, close_http, TooLarge
+
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+PNG = png_bytes()
+ETAG = '"v1"'
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    /image: a png with validators (304 when they match), /big: declares 10 MB up front,
+    /stream: 10 MB with no Content-Length (only the streaming check can catch it).
+    """
+    requests = []
+
+    def do_GET(self):
+        Handler.requests.append((self.path, dict(self.headers)))
+        if self.path == "/image":
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream") # wrong on purpose: the bytes decide
+            self.send_header("Content-Length", str(len(PNG)))
+            self.send_header("ETag", ETAG)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+            self.end_headers()
+            self.wfile.write(PNG)
+        elif self.path == "/big":
+            self.send_response(200)
+            self.send_header("Content-Length", str(10 * 2**20))
+            self.end_headers()
+        elif self.path == "/stream":
+            self.send_response(200)
+            self.end_headers()
+            try:
+                for _ in range(160):
+                    self.wfile.write(b"\x00" * 65536)
+            except (BrokenPipeError, ConnectionResetError):
+                pass # the client gave up, as it should
+        else:
+            self.send_error(404)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+def fetch_both(url: str, max_bytes: int, validators: dict = None) -> list:
+    """
+    The same request through the blocking and the async client.
+    """
+    async def run_async():
+        try:
+            return await fetch_async(url, max_bytes, validators)
+        finally:
+            await close_http()
+    results = []
+    for run in (lambda: fetch(url, max_bytes, validators), lambda: asyncio.run(run_async())):
+        try:
+            results.append(run())
+        except Exception as e:
+            results.append(e)
+    return results
+
+def test_fetch_returns_body_and_validators(server):
+    for fetched in fetch_both(f"{server}/image", 2**20):
+        assert fetched.data == PNG
+        assert fetched.mime_type == "image/png"
+        assert (fetched.etag, fetched.last_modified) == (ETAG, LAST_MODIFIED)
+        assert not fetched.not_modified
+
+def test_conditional_get_comes_back_not_modified(server):
+    Handler.requests.clear()
+    validators = {"etag": ETAG, "last_modified": LAST_MODIFIED}
+    for fetched in fetch_both(f"{server}/image", 2**20, validators):
+        assert fetched.not_modified and fetched.data is None
+        assert fetched.etag == ETAG
+
+    assert len(Handler.requests) == 2
+    for _, headers in Handler.requests:
+        assert headers["If-None-Match"] == ETAG
+        assert headers["If-Modified-Since"] == LAST_MODIFIED
+
+def test_declared_size_over_the_limit_is_refused(server):
+    for error in fetch_both(f"{server}/big", 2**20):
+        assert isinstance(error, TooLarge)
+
+def test_undeclared_size_is_cut_off_while_streaming(server):
+    for error in fetch_both(f"{server}/stream", 2**20):
+        assert isinstance(error, TooLarge)
+        assert "larger than" in str(error)
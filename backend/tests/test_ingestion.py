@@ -0,0 +1,51 @@
+import copy
+import pytest
+import yt_dlp
+from app import utils
+
+def video_format(height: int, size: int) -> dict:
+    return {"format_id": f"{height}p", "url": f"https://media.invalid/{height}", "protocol": "https", "ext": "mp4",
+            "vcodec": "avc1", "acodec": "none", "height": height, "width": height * 16 // 9, "tbr": height * 5, "filesize": size}
+
+AUDIO = {"format_id": "audio", "url": "https://media.invalid/audio", "protocol": "https", "ext": "m4a",
+         "vcodec": "none", "acodec": "mp4a.40.2", "abr": 128, "filesize": 2 * 2**20}
+
+def probe_result(size: int = 10 * 2**20, duration: int = 60) -> dict:
+    """
+    What probe_video() returns, minus the network: a 360p-4K ladder plus one audio track.
+    """
+    return {"id": "clip", "title": "clip", "extractor": "generic", "extractor_key": "Generic",
+            "webpage_url": "https://example.invalid/clip", "duration": duration,
+            "formats": [video_format(h, size) for h in (360, 720, 1080, 2160)] + [AUDIO]}
+
+def selected_format(capped: bool) -> str:
+    with yt_dlp.YoutubeDL(utils._ydl_options("/tmp/unused.%(ext)s", capped=capped)) as ydl:
+        return ydl.process_ie_result(probe_result(), download=False)["format_id"]
+
+def test_capped_ingestion_picks_the_rendition_at_the_height_cap(monkeypatch):
+    assert selected_format(capped=False) == "2160p+audio"
+    assert selected_format(capped=True) == "720p+audio"
+
+    monkeypatch.setattr(utils, "VIDEO_KEEP_AUDIO", False)
+    assert selected_format(capped=True) == "720p"
+
+def test_oversize_video_is_rejected_before_downloading(monkeypatch):
+    downloads = []
+    monkeypatch.setattr(yt_dlp.YoutubeDL, "dl", lambda self, *args, **kwargs: downloads.append(args))
+
+    with pytest.raises(RuntimeError, match="too large"):
+        utils.ingest_video("https://example.invalid/clip", probe_result(size=200 * 2**20))
+    assert downloads == []
+
+def test_capped_ingestion_can_be_switched_off(monkeypatch):
+    calls = []
+    monkeypatch.setattr(utils, "ingest_video", lambda url, info=None: calls.append(url) or {"path": "/tmp/capped.mp4"})
+
+    monkeypatch.setattr(utils, "VIDEO_CAPPED_INGEST", True)
+    assert utils.download_and_process_video("https://example.invalid/clip", probe_result()) == "/tmp/capped.mp4"
+    assert calls == ["https://example.invalid/clip"]
+
+    monkeypatch.setattr(utils, "VIDEO_CAPPED_INGEST", False)
+    with pytest.raises(RuntimeError, match="Video download failed"):
+        utils.download_and_process_video("https://example.invalid/clip", copy.deepcopy(probe_result()))
+    assert len(calls) == 1
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import fakeredis
+import pytest
+from app import jobs
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(jobs, "cache", client)
+    return client
+
+def fake_analysis(monkeypatch, delay: float):
+    async def analyze(text):
+        await asyncio.sleep(delay)
+        return {"verdict": "Human"}
+    monkeypatch.setattr(jobs, "analyze_text_logic", analyze)
+
+def test_finished_job_leaves_the_processing_list(redis, monkeypatch):
+    fake_analysis(monkeypatch, 0)
+
+    async def scenario():
+        job_id = jobs.submit_job("text", "hello")
+        worker = asyncio.ensure_future(jobs.job_worker(poll_interval=0.01))
+        while jobs.job_status(job_id) not in jobs.FINISHED:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+        return job_id
+
+    job_id = asyncio.run(scenario())
+    assert jobs.get_job(job_id)["result"] == {"verdict": "Human"}
+    assert redis.llen(jobs.PROCESSING_KEY) == 0
+    assert not redis.exists(jobs._lease_key(job_id))
+
+def test_shutdown_mid_job_requeues_it(redis, monkeypatch):
+    fake_analysis(monkeypatch, 10)
+
+    async def scenario():
+        job_id = jobs.submit_job("text", "hello")
+        worker = asyncio.ensure_future(jobs.job_worker(poll_interval=0.01))
+        while jobs.job_status(job_id) != "running":
+            await asyncio.sleep(0.01)
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+        return job_id
+
+    job_id = asyncio.run(scenario())
+    job = jobs.get_job(job_id)
+    assert job["status"] == "queued"
+    assert job["stages"][-1] == "requeued"
+    assert redis.lrange(jobs.QUEUE_KEY, 0, -1) == [job_id]
+    assert redis.llen(jobs.PROCESSING_KEY) == 0
+
+def test_orphaned_jobs_are_requeued_at_startup(redis):
+    # a worker was killed mid-run: the job is still in the processing list, its lease gone
+    orphan = jobs.submit_job("text", "orphan")
+    running = jobs.submit_job("text", "still running elsewhere")
+    for _ in range(2):
+        redis.lmove(jobs.QUEUE_KEY, jobs.PROCESSING_KEY, "LEFT", "RIGHT")
+    redis.set(jobs._lease_key(running), "1", ex=30)
+
+    assert jobs.requeue_orphaned_jobs() == 1
+    assert redis.lrange(jobs.QUEUE_KEY, 0, -1) == [orphan]
+    assert redis.lrange(jobs.PROCESSING_KEY, 0, -1) == [running]
+    assert jobs.job_status(orphan) == "queued"
+
+def test_running_workers_reclaim_orphans_after_two_scans(redis):
+    # a worker elsewhere died after the first scan; a job taken a moment ago has its lease
+    orphan = jobs.submit_job("text", "orphan")
+    taken = jobs.submit_job("text", "just taken")
+    for _ in range(2):
+        redis.lmove(jobs.QUEUE_KEY, jobs.PROCESSING_KEY, "LEFT", "RIGHT")
+    redis.set(jobs._lease_key(taken), "1", ex=30)
+
+    async def scenario():
+        reaper = asyncio.ensure_future(jobs.reclaim_orphaned_jobs(interval=0.05))
+        await asyncio.sleep(0.08) # first scan: orphan is only a suspect
+        first = redis.lrange(jobs.QUEUE_KEY, 0, -1)
+        await asyncio.sleep(0.05) # second scan: still no lease
+        reaper.cancel()
+        await asyncio.gather(reaper, return_exceptions=True)
+        return first
+
+    assert asyncio.run(scenario()) == []
+    assert redis.lrange(jobs.QUEUE_KEY, 0, -1) == [orphan]
+    assert redis.lrange(jobs.PROCESSING_KEY, 0, -1) == [taken]
+
+def test_concurrent_progress_events_keep_every_partial_result(redis):
+    job_id = jobs.submit_job("video", "https://example.invalid/clip")
+
+    def report(worker):
+        for n in range(50):
+            jobs.add_event(job_id, f"stage-{worker}-{n}", {f"{worker}-{n}": n})
+
+    threads = [threading.Thread(target=report, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(jobs.get_job(job_id)["partial"]) == 200
@@ -0,0 +1,59 @@
+import json
+import asyncio
+from app import llm
+from app.llm import StubBackend
+
+TEXT_PROMPT = "You are an AI-Detector. Return JSON."
+MEDIA_PROMPT = "Analyze this video."
+
+def run(backend: StubBackend, monkeypatch) -> tuple:
+    """
+    The stub's latency draws and answers for a fixed mix of requests (sleeps are recorded, not slept).
+    """
+    waits = []
+    async def sleep(seconds):
+        waits.append(seconds)
+    monkeypatch.setattr(llm.asyncio, "sleep", sleep)
+
+    async def requests():
+        answers = [await backend.generate([TEXT_PROMPT, f"text {i}"]) for i in range(10)]
+        answers.append(await backend.generate([MEDIA_PROMPT, backend.inline(b"frame", "image/jpeg")]))
+        answers.append(await backend.generate([TEXT_PROMPT, "[TEXT a] first\n[TEXT b] second"]))
+        return answers
+    return waits, asyncio.run(requests())
+
+def test_same_seed_same_latencies_and_answers(monkeypatch):
+    waits, answers = run(StubBackend(latency="lognormal:1.5,0.4", seed=7), monkeypatch)
+    assert run(StubBackend(latency="lognormal:1.5,0.4", seed=7), monkeypatch) == (waits, answers)
+    assert len(set(waits)) == len(waits) # actually drawn, not a constant
+
+    # another seed changes the timing, never the verdicts
+    other_waits, other_answers = run(StubBackend(latency="lognormal:1.5,0.4", seed=8), monkeypatch)
+    assert other_waits != waits
+    assert other_answers == answers
+
+def test_answers_match_the_prompt_shape(monkeypatch):
+    _, answers = run(StubBackend(latency="fixed:0", seed=0), monkeypatch)
+    assert {json.loads(a)["verdict"] for a in answers[:10]} <= {v["verdict"] for v in llm.STUB_TEXT_VERDICTS}
+    assert json.loads(answers[10])["verdict"] in {v["verdict"] for v in llm.STUB_MEDIA_VERDICTS}
+    assert [item["id"] for item in json.loads(answers[11])] == ["a", "b"]
+
+def test_identical_uploads_get_the_same_verdict(tmp_path):
+    backend = StubBackend(latency="fixed:0", upload_latency="fixed:0", seed=0)
+
+    async def verdicts():
+        answers = []
+        for i in range(6):
+            # every download lands under a fresh random name, like new_media_base()
+            path = tmp_path / f"verifai-{i}.mp4"
+            path.write_bytes(b"same video bytes")
+            uploaded = await backend.upload(str(path), "video/mp4")
+            answers.append(json.loads(await backend.generate([MEDIA_PROMPT, uploaded]))["verdict"])
+        path = tmp_path / "other.mp4"
+        path.write_bytes(b"another video entirely")
+        uploaded = await backend.upload(str(path), "video/mp4")
+        return answers, repr(uploaded)
+
+    answers, other = asyncio.run(verdicts())
+    assert len(set(answers)) == 1
+    assert "other" not in other and "verifai" not in other
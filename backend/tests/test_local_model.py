@@ -0,0 +1,131 @@
+import io
+import asyncio
+import json
+import importlib.util
+import cv2
+import pytest
+import numpy as np
+from pathlib import Path
+from PIL import Image
+from sklearn.datasets import load_sample_image
+from app import local_model
+from app.local_model import score_image, classify, calibrate_thresholds
+from app.utils import hash_file
+
+def photo_bytes(name: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(load_sample_image(name)).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+PHOTOS = ["china.jpg", "flower.jpg"]
+
+@pytest.fixture
+def fresh_model(monkeypatch, tmp_path):
+    """
+    Local classifier switched on, with no calibration yet (tmp_path/<model>.calibration.json).
+    """
+    monkeypatch.setattr(local_model, "LOCAL_MODEL_ENABLED", True)
+    monkeypatch.setattr(local_model, "_model", None)
+    monkeypatch.setattr(local_model, "_load_failed", False)
+    monkeypatch.setattr(local_model, "_thresholds", {"fake": None, "real": None})
+    calibration = tmp_path / "model.calibration.json"
+    monkeypatch.setattr(local_model, "LOCAL_CALIBRATION_PATH", calibration)
+    return calibration
+
+def training_features():
+    # server/pipeline/features.py, the code the model was trained with
+    path = Path(__file__).resolve().parents[2] / "server" / "pipeline" / "features.py"
+    spec = importlib.util.spec_from_file_location("training_features", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def reference_features(gray, size: int, bins: int):
+    # the one-image-at-a-time fft2 + fftshift formulation the features are defined by
+    magnitude_spectrum = 20 * np.log(np.abs(np.fft.fftshift(np.fft.fft2(cv2.resize(gray, (size, size))))) + 1e-9)
+    y, x = np.indices((size, size))
+    r = np.sqrt((x - size // 2) ** 2 + (y - size // 2) ** 2).astype(int).ravel()
+    return (np.bincount(r, magnitude_spectrum.ravel()) / np.bincount(r))[:bins]
+
+@pytest.mark.parametrize("bins", sorted(local_model.FEATURE_LAYOUTS))
+def test_inference_features_match_training(bins):
+    size = local_model.FEATURE_LAYOUTS[bins]
+    grays = [np.array(Image.open(io.BytesIO(photo_bytes(name))).convert("L")) for name in PHOTOS]
+    images = np.stack([cv2.resize(gray, (size, size)) for gray in grays])
+
+    features = local_model.fft_features_batch(images, bins)
+    np.testing.assert_allclose(features, training_features().fft_features_batch(images, bins))
+    np.testing.assert_allclose(features, np.stack([reference_features(gray, size, bins) for gray in grays]), rtol=1e-9, atol=1e-9)
+
+def test_real_photos_are_not_called_fake_by_default():
+    assert not local_model.LOCAL_MODEL_ENABLED
+    for name in PHOTOS:
+        assert classify(score_image(photo_bytes(name))) is None
+
+def test_uncalibrated_model_never_answers(fresh_model):
+    for name in PHOTOS:
+        assert score_image(photo_bytes(name)) is None
+        assert classify(score_image(photo_bytes(name))) is None
+
+def test_calibration_for_another_model_is_rejected(fresh_model):
+    fresh_model.write_text(json.dumps({"model_digest": "0" * 32, "fake_threshold": 0.5, "real_threshold": 0.1}))
+    assert score_image(photo_bytes(PHOTOS[0])) is None
+
+def test_calibrated_thresholds_keep_real_photos_out_of_fake(fresh_model):
+    # the CIFAKE model scores ordinary photos around 0.97; 0.95 used to call them Fake
+    fresh_model.write_text(json.dumps({"model_digest": hash_file(local_model.LOCAL_MODEL_PATH), "fake_threshold": 0.995, "real_threshold": None}))
+    for name in PHOTOS:
+        probability = score_image(photo_bytes(name))
+        assert 0.0 <= probability < 0.995
+        assert classify(probability) is None
+    assert classify(0.999)["verdict"] == "Fake"
+
+def test_video_frames_are_scored_like_images(fresh_model):
+    fresh_model.write_text(json.dumps({"model_digest": hash_file(local_model.LOCAL_MODEL_PATH), "fake_threshold": 0.995, "real_threshold": None}))
+    frames = [cv2.cvtColor(load_sample_image(name), cv2.COLOR_RGB2BGR) for name in PHOTOS * 2]
+    classifier = local_model.FrameClassifier(samples=len(frames))
+    for index, frame in enumerate(frames):
+        classifier.visit(index, frame, None)
+
+    # frames are kept as model-sized thumbnails and featurized together
+    size, _ = local_model.feature_layout(local_model.load_model())
+    assert all(gray.shape == (size, size) for gray in classifier.grays)
+    grays = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+    expected = np.mean([local_model.fake_probabilities(local_model.load_model(), [gray])[0] for gray in grays])
+    assert classifier.result()["probability"] == pytest.approx(expected)
+
+def test_calibrate_thresholds_bounds_false_verdicts():
+    rng = np.random.default_rng(0)
+    real, fake = rng.uniform(0.6, 0.98, 500), rng.uniform(0.9, 1.0, 500)
+    thresholds = calibrate_thresholds(real, fake, max_false_fake=0.01, max_false_real=0.01)
+    assert (real >= thresholds["fake"]).mean() <= 0.01
+    assert (fake <= thresholds["real"]).mean() <= 0.01
+
+    # every real image scores 1.0: no fake threshold is safe
+    assert calibrate_thresholds(np.ones(100), fake)["fake"] is None
+
+def test_images_skip_the_local_stage_without_a_model(monkeypatch):
+    from app import core
+    from app.http_client import Fetched
+    pooled, recorded = [], []
+
+    async def fetch(url, validators=None):
+        return Fetched(data=photo_bytes(PHOTOS[0]), mime_type="image/jpeg")
+
+    async def run_cpu(func, *args, **kwargs):
+        pooled.append(func.__name__)
+        return func(*args, **kwargs)
+
+    monkeypatch.setattr(core, "fetch_image_async", fetch)
+    monkeypatch.setattr(core, "run_cpu", run_cpu)
+    monkeypatch.setattr(core, "get_validators", lambda url: None)
+    monkeypatch.setattr(core, "store_validators", lambda *args: None)
+    monkeypatch.setattr(core, "lookup", lambda level, keys: None)
+    monkeypatch.setattr(core, "find_near_duplicate", lambda phashes: asyncio.sleep(0, None))
+    monkeypatch.setattr(core, "record_fast_path", lambda kind, local: recorded.append((kind, local)))
+
+    state = asyncio.run(core.prepare_image("https://example.invalid/photo.jpg", []))
+    assert state["local_verdict"] is None
+    # no pickling the image into the pool for a None, no "fell back to Gemini" counted
+    assert "score_image" not in pooled and pooled
+    assert recorded == []
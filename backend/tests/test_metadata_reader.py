@@ -0,0 +1,82 @@
+import io
+import shutil
+import struct
+import cv2
+import pytest
+import numpy as np
+from app import utils
+from app.mp4meta import read_mp4_metadata, NotMP4, FORMAT_NAME
+
+def make_clip(path):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 30, (320, 240))
+    for i in range(90):
+        writer.write(np.full((240, 320, 3), i, dtype=np.uint8))
+    writer.release()
+
+def box(box_type: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+def mp4(*moov_boxes: bytes) -> bytes:
+    return box(b"ftyp", b"isom\x00\x00\x02\x00isomiso2mp41") + box(b"moov", b"".join(moov_boxes))
+
+MVHD = box(b"mvhd", b"\x00" * 4 + struct.pack(">IIII", 0, 0, 1000, 3000) + b"\x00" * 80)
+
+@pytest.fixture
+def clip(tmp_path):
+    path = tmp_path / "clip.mp4"
+    make_clip(path)
+    return path
+
+def test_reads_opencv_mp4(clip):
+    meta = read_mp4_metadata(str(clip))
+    assert meta["format_name"] == FORMAT_NAME
+    assert float(meta["duration"]) == pytest.approx(3.0, abs=0.05)
+    assert meta["tags"]["major_brand"] == "isom"
+    assert meta["tags"]["encoder"].startswith("Lavf")
+
+    # same answer from a buffer as from the path
+    assert utils._read_container(clip.read_bytes()) == (meta, "mp4")
+
+@pytest.mark.skipif(not shutil.which("ffprobe"), reason="ffprobe not installed")
+def test_same_tags_and_duration_as_ffprobe(clip):
+    meta = read_mp4_metadata(str(clip))
+    data = utils._ffprobe(str(clip))
+    assert data["format"].get("tags", {}) == meta["tags"]
+    assert float(data["format"]["duration"]) == float(meta["duration"])
+
+def test_minimal_boxes_parse():
+    meta = read_mp4_metadata(io.BytesIO(mp4(MVHD)))
+    assert meta["duration"] == "3.000000"
+
+@pytest.mark.parametrize("moov", [
+    [box(b"mvhd")], # no version byte (IndexError)
+    [box(b"mvhd", b"\x00" * 8)], # no timescale/duration (struct.error)
+    [MVHD, box(b"udta", box(b"loci", b"\x00" * 4 + b"\x15\xc7" + b"A" * 14))], # name never terminated (ValueError)
+    [MVHD, box(b"meta", b"\x00" * 4 + box(b"keys", b"\x00" * 4 + struct.pack(">I", 2**31) + b"\x00" * 8))], # 0-size key
+])
+def test_truncated_boxes_are_not_mp4(tmp_path, monkeypatch, moov):
+    data = mp4(*moov)
+    with pytest.raises(NotMP4):
+        read_mp4_metadata(io.BytesIO(data))
+
+    # the container reader falls through to PyAV / ffprobe instead of raising
+    monkeypatch.setattr(utils, "_ffprobe", lambda path: None)
+    path = tmp_path / "broken.mp4"
+    path.write_bytes(data)
+    _, reader = utils._read_container(str(path))
+    assert reader != "mp4"
+    assert isinstance(utils.extract_video_metadata(str(path)), dict)
+
+@pytest.mark.parametrize("data", [
+    box(b"ftyp", b"isom\x00\x00\x02\x00") + struct.pack(">I4s", 1, b"mdat") + b"\x00\x00\x00", # 64-bit size cut short
+    mp4(MVHD)[:-10], # moov cut off by a partial download
+    mp4(box(b"mvhd", b"\x01" + b"\x00" * 3 + struct.pack(">QQIQ", 2**64 - 1, 0, 1000, 3000) + b"\x00" * 80)), # creation time overflows
+], ids=["short-64bit-size", "truncated-moov", "creation-time-overflow"])
+def test_short_reads_and_overflows_are_not_mp4(tmp_path, monkeypatch, data):
+    with pytest.raises(NotMP4):
+        read_mp4_metadata(io.BytesIO(data))
+
+    monkeypatch.setattr(utils, "_ffprobe", lambda path: None)
+    path = tmp_path / "broken.mp4"
+    path.write_bytes(data)
+    assert utils._read_container(str(path))[1] != "mp4"
@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from app.microbatch import MicroBatcher
+
+def make_batcher(batch_answer=None, **kwargs):
+    calls = {"batch": [], "single": []}
+
+    async def run_batch(items):
+        calls["batch"].append(list(items))
+        if batch_answer is not None:
+            return batch_answer(items)
+        return [item.upper() for item in items]
+
+    async def run_single(item):
+        calls["single"].append(item)
+        return f"single:{item}"
+
+    return MicroBatcher(run_batch, run_single, **kwargs), calls
+
+def test_concurrent_items_share_one_call():
+    async def scenario():
+        batcher, calls = make_batcher(max_batch=8, max_wait=0.01)
+        results = await asyncio.gather(*(batcher.submit(f"t{i}") for i in range(5)))
+        return results, calls
+
+    results, calls = asyncio.run(scenario())
+    assert results == ["T0", "T1", "T2", "T3", "T4"]
+    assert calls["batch"] == [["t0", "t1", "t2", "t3", "t4"]]
+    assert calls["single"] == []
+
+def test_batch_size_splits_batches():
+    async def scenario():
+        batcher, calls = make_batcher(max_batch=2, max_wait=1)
+        results = await asyncio.gather(*(batcher.submit(f"t{i}") for i in range(5)))
+        return results, calls
+
+    results, calls = asyncio.run(scenario())
+    assert results == ["T0", "T1", "T2", "T3", "single:t4"]
+    # full batches go out right away; the odd one out waits for the timer, alone
+    assert calls["batch"] == [["t0", "t1"], ["t2", "t3"]]
+    assert calls["single"] == ["t4"]
+
+def test_max_size_starts_a_new_batch():
+    async def scenario():
+        batcher, calls = make_batcher(max_batch=10, max_wait=0.01, max_size=6)
+        await asyncio.gather(*(batcher.submit(text) for text in ["aaa", "bbb", "ccc", "ddd"]))
+        return calls
+
+    calls = asyncio.run(scenario())
+    assert calls["batch"] == [["aaa", "bbb"], ["ccc", "ddd"]]
+
+def test_missing_answers_fall_back_to_single_calls():
+    async def scenario():
+        # drops the second item, like a structured answer that lost an id
+        batcher, calls = make_batcher(lambda items: [items[0].upper(), None, items[2].upper()], max_batch=3, max_wait=0.01)
+        results = await asyncio.gather(*(batcher.submit(f"t{i}") for i in range(3)))
+        return results, calls, batcher.stats
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == ["T0", "single:t1", "T2"]
+    assert calls["single"] == ["t1"]
+    assert stats["fallbacks"] == 1
+
+def test_failed_batch_falls_back_for_every_item():
+    def unparseable(items):
+        raise ValueError("not JSON")
+
+    async def scenario():
+        batcher, calls = make_batcher(unparseable, max_batch=4, max_wait=0.01)
+        return await asyncio.gather(*(batcher.submit(f"t{i}") for i in range(3)))
+
+    assert asyncio.run(scenario()) == ["single:t0", "single:t1", "single:t2"]
+
+def test_single_errors_reach_the_caller():
+    async def run_single(item):
+        raise RuntimeError("quota exceeded")
+
+    async def scenario():
+        batcher = MicroBatcher(None, run_single, max_batch=4, max_wait=0.001)
+        await batcher.submit("lonely")
+
+    with pytest.raises(RuntimeError, match="quota exceeded"):
+        asyncio.run(scenario())
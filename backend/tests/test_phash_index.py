@@ -0,0 +1,130 @@
+import threading
+import numpy as np
+import pytest
+from app import phash_index
+from app.phash_index import MultiIndexHash, NearDuplicateIndex
+
+def random_hashes(n: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    return [int(v) for v in rng.integers(0, 2**64, n, dtype=np.uint64, endpoint=False)]
+
+def flip(value: int, bits: int, rng) -> int:
+    for bit in rng.choice(64, bits, replace=False):
+        value ^= 1 << int(bit)
+    return value
+
+def as_hex(value: int) -> str:
+    return f"{value:016x}"
+
+@pytest.mark.parametrize("radius", [0, 3, 4, 6, 8])
+def test_search_finds_exactly_the_hashes_within_radius(radius):
+    rng = np.random.default_rng(radius)
+    base = random_hashes(200)
+    # near neighbours at every distance around the radius, plus unrelated noise
+    values = base + [flip(v, int(d), rng) for v, d in zip(base, rng.integers(0, 12, len(base)))]
+    index = MultiIndexHash()
+    for item_id, value in enumerate(values):
+        index.add(value, item_id)
+
+    for query in base[:50]:
+        expected = {(bin(v ^ query).count("1"), i) for i, v in enumerate(values) if bin(v ^ query).count("1") <= radius}
+        assert set(index.search(query, radius)) == expected
+
+def test_bulk_build_matches_incremental_adds():
+    values = random_hashes(500, seed=1)
+    item_ids = [i // 3 for i in range(len(values))]
+    incremental = MultiIndexHash()
+    for value, item_id in zip(values, item_ids):
+        incremental.add(value, item_id)
+    bulk = MultiIndexHash.from_arrays(np.array(values, dtype=np.uint64), np.array(item_ids, dtype=np.int32))
+
+    rng = np.random.default_rng(2)
+    for value in values[:50]:
+        query = flip(value, 3, rng)
+        assert sorted(bulk.search(query, 6)) == sorted(incremental.search(query, 6))
+
+def filled_index(prefix: str, n: int = 20, seed: int = 0) -> tuple:
+    index = NearDuplicateIndex()
+    hashes = random_hashes(n * 3, seed)
+    for i in range(n):
+        index.add([as_hex(v) for v in hashes[i * 3:i * 3 + 3]], f"{prefix}:{i}", {"verdict": "Real"})
+    return index, hashes
+
+def test_save_load_round_trip(tmp_path):
+    path = tmp_path / "index.npz"
+    index, hashes = filled_index("image")
+    index.save(path)
+
+    loaded = NearDuplicateIndex()
+    loaded.load(path)
+    assert loaded.items == index.items
+    rng = np.random.default_rng(3)
+    item, distance = loaded.query([as_hex(flip(v, 2, rng)) for v in hashes[9:12]])
+    assert item["key"] == "image:3" and distance == 2
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_workers_saving_one_file_keep_each_others_items(tmp_path):
+    path = tmp_path / "index.npz"
+    first, first_hashes = filled_index("first", seed=1)
+    second, second_hashes = filled_index("second", seed=2)
+    first.save(path)
+    second.save(path) # merges first's items before writing
+    first.add([as_hex(random_hashes(1, seed=9)[0])], "first:late", {"verdict": "Fake"})
+    first.save(path)
+
+    merged = NearDuplicateIndex()
+    merged.load(path)
+    keys = [item["key"] for item in merged.items]
+    assert len(keys) == len(set(keys)) == 41
+    assert merged.query([as_hex(v) for v in second_hashes[:3]])[0]["key"] == "second:0"
+    assert merged.query([as_hex(v) for v in first_hashes[:3]])[0]["key"] == "first:0"
+
+def test_concurrent_saves_never_corrupt_the_file(tmp_path):
+    path = tmp_path / "index.npz"
+    index, _ = filled_index("image", n=200)
+    errors = []
+
+    def save():
+        try:
+            for _ in range(5):
+                index.save(path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    loaded = NearDuplicateIndex()
+    loaded.load(path)
+    assert len(loaded) == 200
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_only_one_periodic_save_is_claimed(monkeypatch):
+    monkeypatch.setattr(phash_index, "PHASH_SAVE_EVERY", 5)
+    index, _ = filled_index("image", n=5)
+    assert index.claim_save()
+    assert not index.claim_save() # the overlapping request leaves it to the first
+
+def test_queries_run_while_a_save_serializes(tmp_path, monkeypatch):
+    index, hashes = filled_index("image")
+    serializing, release = threading.Event(), threading.Event()
+    dumps = phash_index.json.dumps
+
+    def slow_dumps(*args, **kwargs):
+        serializing.set()
+        release.wait(5)
+        return dumps(*args, **kwargs)
+
+    monkeypatch.setattr(phash_index.json, "dumps", slow_dumps)
+    saver = threading.Thread(target=index.save, args=(tmp_path / "index.npz",))
+    saver.start()
+    assert serializing.wait(5)
+    # the table lock is free while the items are being serialized
+    assert index.lock.acquire(timeout=0.5)
+    index.lock.release()
+    assert index.query([as_hex(v) for v in hashes[:3]])[0]["key"] == "image:0"
+    release.set()
+    saver.join()
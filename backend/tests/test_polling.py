@@ -0,0 +1,132 @@
+import time
+import asyncio
+import threading
+import fakeredis
+import pytest
+from app import polling
+from app.llm import StubBackend, StubUpload
+from app.polling import ProcessingTimeModel, wait_until_processed, poll_delays, GEMINI_POLL_INITIAL
+
+MB = 2**20
+
+def stub(processing: str) -> StubBackend:
+    return StubBackend(upload_latency="fixed:0", processing=processing)
+
+def fresh_model() -> ProcessingTimeModel:
+    return ProcessingTimeModel(fakeredis.FakeRedis(decode_responses=True))
+
+async def upload_and_wait(backend, model, size=MB, **kwargs):
+    uploaded = await backend._upload(__file__, "video/mp4")
+    uploaded.size_bytes = size
+    start = time.monotonic()
+    polls = []
+
+    async def refresh(file):
+        polls.append(time.monotonic() - start)
+        return await backend._refresh(file)
+
+    ready = await wait_until_processed(uploaded, refresh, backend._delete, model=model, **kwargs)
+    return ready, polls
+
+def test_model_learns_processing_time_per_size():
+    model = fresh_model()
+    assert model.predict(5 * MB) is None
+    for _ in range(10):
+        for size in (1, 10, 20):
+            model.observe(size * MB, 2 + size * 0.5)
+    assert model.predict(5 * MB) == pytest.approx(4.5, rel=0.05)
+    assert model.predict(40 * MB) == pytest.approx(22, rel=0.05)
+
+def test_backoff_without_prediction():
+    delays = poll_delays(None)
+    first = [next(delays) for _ in range(4)]
+    assert first[0] == GEMINI_POLL_INITIAL
+    assert first == sorted(first) and first[-1] > first[0]
+
+def test_first_poll_lands_near_predicted_ready_time():
+    model = fresh_model()
+    for _ in range(3):
+        model.observe(MB, 0.6)
+
+    ready, polls = asyncio.run(upload_and_wait(stub("fixed:0.6"), model))
+    assert ready.state.name == "ACTIVE"
+    # one poll just before the predicted time, then short retries instead of a blind 2 s sleep
+    assert 0.5 <= polls[0] < 0.6
+    assert len(polls) <= 3 and polls[-1] < 0.6 + GEMINI_POLL_INITIAL + 0.1
+
+def test_deadline_gives_up_and_deletes_the_upload():
+    backend = stub("fixed:30")
+    with pytest.raises(TimeoutError):
+        asyncio.run(upload_and_wait(backend, fresh_model(), deadline=0.5))
+    assert backend.deleted == ["files/stub-test_polling.py"]
+
+def test_cancelled_wait_deletes_the_upload():
+    backend = stub("fixed:30")
+
+    async def main():
+        task = asyncio.ensure_future(upload_and_wait(backend, fresh_model()))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert backend.deleted == ["files/stub-test_polling.py"]
+
+def test_failed_processing_deletes_the_upload():
+    backend = stub("fixed:0.2")
+
+    async def main():
+        uploaded = await backend._upload(__file__, "video/mp4")
+
+        async def refresh(file):
+            file = await backend._refresh(file)
+            file.state = StubUpload.State("FAILED")
+            return file
+
+        return await wait_until_processed(uploaded, refresh, backend._delete, model=fresh_model())
+
+    assert asyncio.run(main()).state.name == "FAILED"
+    assert backend.deleted == ["files/stub-test_polling.py"]
+
+def test_cleanup_after_cancellation_is_held_until_done():
+    backend = stub("fixed:30")
+
+    async def slow_delete(uploaded):
+        await asyncio.sleep(0.1)
+        await backend._delete(uploaded)
+
+    async def main():
+        uploaded = await backend._upload(__file__, "video/mp4")
+        task = asyncio.ensure_future(wait_until_processed(uploaded, backend._refresh, slow_delete, model=fresh_model()))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        pending = set(polling._cleanups)
+        await asyncio.gather(*pending)
+        return pending
+
+    pending = asyncio.run(main())
+    # the only reference to the deletion while it ran was the module's set
+    assert len(pending) == 1 and not polling._cleanups
+    assert backend.deleted == ["files/stub-test_polling.py"]
+
+def test_model_is_queried_off_the_event_loop():
+    loop_thread = threading.get_ident()
+    calls = []
+
+    class RecordingModel(ProcessingTimeModel):
+        # a slow Redis round-trip must not stall every other request on this worker
+        def predict(self, size_bytes):
+            calls.append(("predict", threading.get_ident()))
+            return super().predict(size_bytes)
+
+        def observe(self, size_bytes, seconds):
+            calls.append(("observe", threading.get_ident()))
+            super().observe(size_bytes, seconds)
+
+    model = RecordingModel(fakeredis.FakeRedis(decode_responses=True))
+    ready, _ = asyncio.run(upload_and_wait(stub("fixed:0.1"), model))
+    assert ready.state.name == "ACTIVE"
+    assert [name for name, _ in calls] == ["predict", "observe"]
+    assert all(thread != loop_thread for _, thread in calls)
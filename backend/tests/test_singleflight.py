@@ -0,0 +1,150 @@
+import asyncio
+import fakeredis
+from app.singleflight import SingleFlight
+from app.llm import LLMBackend
+
+N_REQUESTS = 20
+
+class CountingGemini(LLMBackend):
+    """
+    Stands in for the LLM backend: counts calls and takes a while, like the real thing.
+    """
+    def __init__(self, delay=0.2):
+        super().__init__()
+        self.calls = 0
+        self.delay = delay
+
+    async def _generate(self, contents, model):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return '{"Detector_score": 90, "verdict": "AI-Generated", "content_analysis": {}}'
+
+def test_concurrent_calls_in_one_worker_run_once():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {"verdict": "Real"}
+
+    async def main():
+        flights = SingleFlight(fakeredis.FakeRedis(decode_responses=True))
+        return await asyncio.gather(*[flights.run("key", work) for _ in range(N_REQUESTS)])
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert results == [{"verdict": "Real"}] * N_REQUESTS
+
+def test_concurrent_calls_across_workers_run_once():
+    # two workers = two SingleFlight instances with their own redis connections to one server
+    server = fakeredis.FakeServer()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return {"verdict": "Fake"}
+
+    async def main():
+        workers = [SingleFlight(fakeredis.FakeRedis(server=server, decode_responses=True), poll_interval=0.01) for _ in range(2)]
+        return await asyncio.gather(*[workers[i % 2].run("key", work) for i in range(N_REQUESTS)])
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert results == [{"verdict": "Fake"}] * N_REQUESTS
+
+def test_work_is_cancelled_only_when_every_caller_is():
+    state = {"finished": False, "cancelled": False}
+
+    async def slow():
+        try:
+            await asyncio.sleep(0.3)
+            state["finished"] = True
+            return {"verdict": "Real"}
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def main():
+        redis = fakeredis.FakeRedis(decode_responses=True)
+        flights = SingleFlight(redis)
+        first = asyncio.ensure_future(flights.run("key", slow))
+        second = asyncio.ensure_future(flights.run("key", slow))
+        await asyncio.sleep(0.05)
+
+        # one client gone: the other still gets its answer
+        first.cancel()
+        assert await second == {"verdict": "Real"}
+
+        # the only client gone: the work stops and the cluster lock is released
+        alone = asyncio.ensure_future(flights.run("other", slow))
+        await asyncio.sleep(0.05)
+        alone.cancel()
+        await asyncio.gather(alone, return_exceptions=True)
+        # the lock is released from the IO pool as the cancelled work unwinds
+        while flights.in_flight:
+            await asyncio.sleep(0.01)
+        return redis.exists("singleflight:lock:other"), flights.waiters
+
+    lock_left, waiters = asyncio.run(main())
+    assert state == {"finished": True, "cancelled": True}
+    assert not lock_left and waiters == {}
+
+def test_waiter_takes_over_when_holder_fails():
+    server = fakeredis.FakeServer()
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        await asyncio.sleep(0.05)
+        if len(attempts) == 1:
+            raise RuntimeError("worker crashed")
+        return {"verdict": "Real"}
+
+    async def main():
+        first = SingleFlight(fakeredis.FakeRedis(server=server, decode_responses=True), poll_interval=0.01)
+        second = SingleFlight(fakeredis.FakeRedis(server=server, decode_responses=True), poll_interval=0.01)
+        return await asyncio.gather(first.run("key", flaky), second.run("key", flaky), return_exceptions=True)
+
+    failed, recovered = asyncio.run(main())
+    assert isinstance(failed, RuntimeError)
+    assert recovered == {"verdict": "Real"}
+    assert len(attempts) == 2
+
+def test_slow_work_keeps_the_cluster_lock():
+    # the work outlasts the lock TTL: the holder renews it, so the other worker keeps waiting
+    server = fakeredis.FakeServer()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(1.6)
+        return {"verdict": "Real"}
+
+    async def main():
+        workers = [SingleFlight(fakeredis.FakeRedis(server=server, decode_responses=True), lock_ttl=1, poll_interval=0.01) for _ in range(2)]
+        first = asyncio.ensure_future(workers[0].run("key", slow))
+        await asyncio.sleep(0.05)
+        return await asyncio.gather(first, workers[1].run("key", slow))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert results == [{"verdict": "Real"}] * 2
+
+def test_identical_text_requests_make_one_gemini_call(monkeypatch):
+    from app import cache, core, llm
+
+    # own redis and backend, so neither the result cache nor the LLM leaks into other tests
+    client = fakeredis.FakeRedis(decode_responses=True)
+    gemini = CountingGemini()
+    monkeypatch.setattr(cache, "cache", client)
+    monkeypatch.setattr(llm, "_backend", gemini)
+    monkeypatch.setattr(core, "flights", SingleFlight(client, poll_interval=0.01))
+    text = "Viral comment"
+
+    async def main():
+        return await asyncio.gather(*[core.analyze_text_logic(text) for _ in range(N_REQUESTS)])
+
+    results = asyncio.run(main())
+    assert gemini.calls == 1
+    assert all(r["verdict"] == "AI-Generated" for r in results)
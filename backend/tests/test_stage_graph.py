@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from app.core import StageGraph, ShortCircuit
+
+def stage(log: list, name: str, delay: float = 0.0, result=None):
+    async def run(*inputs):
+        log.append(("start", name, inputs))
+        await asyncio.sleep(delay)
+        log.append(("end", name))
+        return result if result is not None else name
+    return run
+
+def order(log: list, event: str) -> list:
+    return [entry[1] for entry in log if entry[0] == event]
+
+def test_stages_start_once_their_deps_finish_and_get_their_results():
+    log = []
+    graph = StageGraph()
+    graph.add("download", stage(log, "download", 0.05, result="file.mp4"))
+    graph.add("metadata", stage(log, "metadata", 0.05), deps=["download"])
+    graph.add("frames", stage(log, "frames", 0.1), deps=["download"])
+    graph.add("analysis", stage(log, "analysis"), deps=["metadata", "frames"])
+
+    results = asyncio.run(graph.run())
+    assert results == {"download": "file.mp4", "metadata": "metadata", "frames": "frames", "analysis": "analysis"}
+    starts = {entry[1]: entry[2] for entry in log if entry[0] == "start"}
+    assert starts["metadata"] == starts["frames"] == ("file.mp4",)
+    assert starts["analysis"] == ("metadata", "frames")
+
+    # independent stages overlap: frames started before metadata finished
+    assert log.index(("start", "frames", ("file.mp4",))) < log.index(("end", "metadata"))
+    assert order(log, "start")[-1] == "analysis" and order(log, "end")[-1] == "analysis"
+
+def test_after_waits_without_passing_the_result():
+    log = []
+    graph = StageGraph()
+    graph.add("download", stage(log, "download"))
+    graph.add("digest", stage(log, "digest", 0.05), deps=["download"])
+    graph.add("upload", stage(log, "upload"), deps=["download"], after=["digest"])
+
+    asyncio.run(graph.run())
+    assert log.index(("end", "digest")) < log.index(("start", "upload", ("download",)))
+
+def test_unknown_dependency_is_rejected():
+    graph = StageGraph()
+    graph.add("download", stage([], "download"))
+    with pytest.raises(ValueError):
+        graph.add("upload", stage([], "upload"), deps=["download"], after=["digest"])
+
+def test_short_circuit_cancels_sibling_stages():
+    cancelled = []
+
+    async def hit():
+        await asyncio.sleep(0.05)
+        raise ShortCircuit({"verdict": "Real"})
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+
+    async def never(*inputs):
+        cancelled.append("ran")
+
+    graph = StageGraph()
+    graph.add("digest", hit)
+    graph.add("frames", slow)
+    graph.add("analysis", never, deps=["digest", "frames"])
+
+    async def scenario():
+        started = asyncio.get_running_loop().time()
+        with pytest.raises(ShortCircuit) as raised:
+            await graph.run()
+        return raised.value, asyncio.get_running_loop().time() - started
+
+    hit_result, elapsed = asyncio.run(scenario())
+    assert hit_result.result == {"verdict": "Real"}
+    assert cancelled == ["slow"]
+    assert elapsed < 1
+
+def test_critical_path_follows_the_dependency_that_finished_last():
+    log = []
+    graph = StageGraph()
+    graph.add("probe", stage(log, "probe"))
+    graph.add("download", stage(log, "download", 0.05), deps=["probe"])
+    graph.add("digest", stage(log, "digest"), deps=["download"])
+    graph.add("metadata", stage(log, "metadata", 0.01), deps=["download"], after=["digest"])
+    graph.add("frames", stage(log, "frames", 0.1), deps=["download"], after=["digest"])
+    graph.add("analysis", stage(log, "analysis"), deps=["metadata", "frames"])
+
+    assert graph.critical_path() == []
+    asyncio.run(graph.run())
+    assert graph.critical_path() == ["probe", "download", "digest", "frames", "analysis"]
+
+    report = graph.report()
+    assert report["critical_path"] == graph.critical_path()
+    assert report["total"] == max(t["end"] for t in report["stages"].values())
+    assert report["stages"]["frames"]["duration"] >= 0.1
@@ -0,0 +1,40 @@
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from app.main import app
+from app.core import ShortCircuit
+from app.timings import timed
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_timed_stage_feeds_histogram_and_errors():
+    labels = {"kind": "test", "stage": "work"}
+    before = sample("verifai_stage_seconds_count", **labels)
+    errors = sample("verifai_stage_errors_total", **labels)
+
+    with timed("test", "work"):
+        pass
+    with pytest.raises(RuntimeError):
+        with timed("test", "work"):
+            raise RuntimeError("boom")
+
+    assert sample("verifai_stage_seconds_count", **labels) == before + 2
+    assert sample("verifai_stage_errors_total", **labels) == errors + 1
+
+def test_short_circuit_is_not_an_error():
+    labels = {"kind": "test", "stage": "probe"}
+    errors = sample("verifai_stage_errors_total", **labels)
+    with pytest.raises(ShortCircuit):
+        with timed("test", "probe"):
+            raise ShortCircuit({"verdict": "Real"})
+    assert sample("verifai_stage_errors_total", **labels) == errors
+    assert sample("verifai_stage_seconds_count", **labels) >= 1
+
+def test_metrics_endpoint_uses_route_templates():
+    client = TestClient(app)
+    assert client.get("/jobs/does-not-exist").status_code == 404
+    body = client.get("/metrics").text
+    assert "verifai_stage_seconds_bucket" in body
+    assert 'route="/jobs/{job_id}"' in body
+    assert "does-not-exist" not in body
@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+import pytest
+import numpy as np
+from app import text_model
+from app.text_model import text_features, score_text, classify_text, FEATURE_NAMES, TEXT_FEATURES_VERSION
+
+HUMAN = "lol the update is trash!!! my battery dies by noon now, sooo annoying. anyone else?? i swear it was fine last week"
+AI = ("Artificial intelligence has transformed numerous industries. Furthermore, it offers significant benefits in "
+      "efficiency and accuracy. However, it is important to consider the ethical implications. In conclusion, a "
+      "balanced approach is essential for sustainable progress.")
+
+def feature(text: str, name: str) -> float:
+    return text_features(text)[FEATURE_NAMES.index(name)]
+
+@pytest.fixture
+def model_path(monkeypatch, tmp_path):
+    """
+    A pre-screener that puts HUMAN and AI on opposite sides (same JSON as train_text.py writes).
+    """
+    human, ai = text_features(HUMAN), text_features(AI)
+    model = {
+        "version": TEXT_FEATURES_VERSION,
+        "features": FEATURE_NAMES,
+        "mean": ((human + ai) / 2).tolist(),
+        "scale": np.maximum(np.abs(ai - human), 1e-6).tolist(),
+        "coef": (np.sign(ai - human) * 0.5).tolist(),
+        "intercept": 0.0
+    }
+    path = tmp_path / "text_prescreen.json"
+    path.write_text(json.dumps(model))
+    monkeypatch.setattr(text_model, "TEXT_MODEL_PATH", path)
+    monkeypatch.setattr(text_model, "_model", None)
+    monkeypatch.setattr(text_model, "_load_failed", False)
+    return path
+
+def test_features_pick_up_sloppy_typing():
+    assert text_features(HUMAN).shape == (len(FEATURE_NAMES),)
+    assert feature(HUMAN, "lowercase_sentence_starts") > feature(AI, "lowercase_sentence_starts") == 0
+    assert feature(HUMAN, "lowercase_i") > 0 == feature(AI, "lowercase_i")
+    assert feature(HUMAN, "repeated_chars") > 0 == feature(AI, "repeated_chars")
+    assert feature(HUMAN, "exclamations") > 0 == feature(AI, "exclamations")
+    assert text_features("") is None and text_features("123 ... !!!") is None
+
+def test_features_match_the_training_pipeline(monkeypatch):
+    monkeypatch.syspath_prepend(str(Path(__file__).resolve().parents[2] / "server" / "pipeline"))
+    import text_features as pipeline
+    assert pipeline.TEXT_FEATURES_VERSION == TEXT_FEATURES_VERSION and pipeline.FEATURE_NAMES == FEATURE_NAMES
+    for text in (HUMAN, AI, (HUMAN + "\n" + AI) * 20, "Ünïcödé text — with “quotes”."):
+        np.testing.assert_allclose(pipeline.text_features(text), text_features(text))
+
+def test_confident_scores_skip_gemini(model_path):
+    verdict = classify_text(score_text(AI))
+    assert verdict["verdict"] == "AI-Generated" and verdict["Detector_score"] >= 97
+    assert verdict["fast_path"]["model"] == model_path.name
+    assert set(verdict["content_analysis"]["indicators"]) <= set(FEATURE_NAMES)
+
+    assert classify_text(score_text(HUMAN))["verdict"] == "Human"
+
+def test_uncertain_scores_go_to_gemini(model_path):
+    probability, _ = score_text(HUMAN + " " + AI)
+    assert text_model.TEXT_HUMAN_THRESHOLD < probability < text_model.TEXT_AI_THRESHOLD
+    assert classify_text((probability, np.zeros(len(FEATURE_NAMES)))) is None
+
+def test_model_for_other_features_is_refused(model_path):
+    model = json.loads(model_path.read_text())
+    model["version"] = "stylometry-0"
+    model_path.write_text(json.dumps(model))
+    assert score_text(AI) is None
+    assert classify_text(None) is None
+
+def test_missing_model_is_looked_for_once(monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(text_model, "TEXT_MODEL_PATH", tmp_path / "missing.json")
+    monkeypatch.setattr(text_model, "_model", None)
+    monkeypatch.setattr(text_model, "_load_failed", False)
+
+    for _ in range(3):
+        assert score_text(AI) is None
+    assert capsys.readouterr().out.count("Text pre-screener disabled") == 1
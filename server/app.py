@@ -1,41 +1,127 @@
 import os
 import json
 import base64
-from flask import Flask, request, jsonify
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from google import genai 
-from google import genai 
-from google.genai import types
+import asyncio
+import binascii
+from quart import Quart, request, jsonify
+from quart_cors import cors
+from llm import get_llm
 
-app = Flask(__name__)
-CORS(app)
+app = Quart(__name__)
+app = cors(app)
 
-client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+# Gemini calls in flight per worker process; beyond that requests get a 429 instead of piling up
+MAX_CONCURRENT = int(os.getenv("MAX_CONCURRENT", 32))
+# how long a request may wait for a free slot before it is turned away (0 = reject right away)
+QUEUE_TIMEOUT = float(os.getenv("QUEUE_TIMEOUT", 2))
+# screenshots bigger than this are refused (Gemini's inline limit is 20 MB per request)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 15 * 1024 * 1024))
 
-@app.route('/analyze', methods=['POST'])
-def analyze_content():
-    data = request.json
+# base64 JSON bodies are a third bigger than the image (plus room for the envelope)
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES * 4 // 3 + 64 * 1024
+
+# magic bytes -> mime type (screenshots arrive as png, jpeg or webp whatever the client says)
+MAGIC = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+slots = None
+
+def get_slots() -> asyncio.Semaphore:
+    # created on first use so it belongs to the server's event loop
+    global slots
+    if slots is None:
+        slots = asyncio.Semaphore(MAX_CONCURRENT)
+    return slots
+
+async def acquire_slot() -> bool:
+    """
+    Takes a Gemini slot, waiting at most QUEUE_TIMEOUT for one. False means saturated.
+    """
+    semaphore = get_slots()
+    if not semaphore.locked():
+        await semaphore.acquire()
+        return True
+    if not QUEUE_TIMEOUT:
+        return False
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=QUEUE_TIMEOUT)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+def sniff_mime(data: bytes):
+    head = bytes(data[:16])
+    for magic, mime in MAGIC:
+        if head.startswith(magic):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "image/heic"
+    return None
+
+async def read_input():
+    """
+    (image bytes or None, text or None) from any of the accepted request shapes:
+    - multipart/form-data with an `image` (or `file`) part and an optional `text` field
+    - a raw image body (image/* or application/octet-stream), text in the `text` query param
+    - JSON with a base64 `image` (or `file`, data URLs are fine) and/or `text`
+    """
+    content_type = request.mimetype or ""
+
+    if content_type == "multipart/form-data":
+        files = await request.files
+        form = await request.form
+        upload = files.get("image") or files.get("file")
+        return (upload.read() if upload else None), form.get("text")
+
+    if content_type.startswith("image/") or content_type == "application/octet-stream":
+        return (await request.get_data(cache=False)) or None, request.args.get("text")
+
+    data = await request.get_json(silent=True) or {}
     image_input = data.get('image') or data.get('file')
-    text_input = data.get('text')
+    if image_input:
+        # strip the "data:image/...;base64," prefix if there is one
+        image_input = image_input[image_input.find(",") + 1:]
+        try:
+            image_input = base64.b64decode(image_input)
+        except binascii.Error:
+            raise ValueError("'image' is not valid base64")
+    return image_input, data.get('text')
+
+@app.route('/analyze', methods=['POST'])
+async def analyze_content():
+    try:
+        image_bytes, text_input = await read_input()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    if not image_input and not text_input:
+    if not image_bytes and not text_input:
         return jsonify({"error": "No content provided"}), 400
 
-    try:
-        model_name = "gemini-2.5-flash"
-        contents = []
+    contents = []
+
+    if image_bytes:
+        if len(image_bytes) > MAX_UPLOAD_BYTES:
+            return jsonify({"error": f"Image larger than {MAX_UPLOAD_BYTES // 2**20} MB"}), 413
+        # label it with what it really is, not what the client claims
+        mime_type = sniff_mime(image_bytes)
+        if mime_type is None:
+            return jsonify({"error": "Unsupported image format (png, jpeg, gif, webp, heic)"}), 415
+        contents.append(get_llm().inline(image_bytes, mime_type))
 
-        if image_input:
-            if "," in image_input:
-                image_input = image_input.split(",")[1]
-                
-            image_bytes = base64.b64decode(image_input)
-            contents.append(types.Part.from_bytes(data=image_bytes, mime_type="image/png"))
+    if text_input:
+        contents.append(text_input)
 
-        if text_input:
-            contents.append(text_input)
+    # backpressure: a bounded number of Gemini calls at once, the rest are told to come back
+    if not await acquire_slot():
+        return jsonify({"error": "Server busy, retry shortly"}), 429, {"Retry-After": "1"}
 
+    try:
         system_instruction = """
         You are an advanced Forensic Fact-Checker and Social Media Analyst. 
         Your goal is to evaluate the TRUSTWORTHINESS of the provided content.
@@ -60,16 +146,10 @@ def analyze_content():
         """
         contents.append(final_prompt)
 
-        response = client.models.generate_content(
-            model=model_name,
-            contents=contents,
-            config=types.GenerateContentConfig(
-                system_instruction=system_instruction,
-                response_mime_type="application/json"
-            )
-        )
+        # async client: the worker keeps serving other requests while Gemini thinks
+        response_text = await get_llm().generate(contents, system_instruction=system_instruction)
         
-        result = json.loads(response.text)
+        result = json.loads(response_text)
         
         if "sources" not in result or not isinstance(result["sources"], list):
             result["sources"] = []
@@ -85,5 +165,9 @@ def analyze_content():
             "sources": []
         }), 500
 
+    finally:
+        get_slots().release()
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
+    # development only; production runs under hypercorn (see Procfile)
+    app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,107 @@
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+
+# which LLM answers /analyze: "gemini" (default) or "stub" (offline, canned verdicts)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+# stub latency: "fixed:S", "uniform:LO,HI", "normal:MEAN,SD" or "lognormal:MEDIAN,SIGMA" (seconds)
+LLM_STUB_LATENCY = os.getenv("LLM_STUB_LATENCY", "lognormal:1.5,0.4")
+LLM_STUB_SEED = int(os.getenv("LLM_STUB_SEED", 42))
+
+# verdicts the stub answers with, in the shape the /analyze prompt asks for
+STUB_RESULTS = [
+    {"score": 90, "verdict": "Verified", "reasoning": "Stub backend: consistent handle and timestamp.", "sources": [], "indicators": ["Verified account handle"]},
+    {"score": 35, "verdict": "Suspicious", "reasoning": "Stub backend: inflammatory tone.", "sources": [], "indicators": ["Inflammatory tone"]},
+    {"score": 5, "verdict": "Misinformation", "reasoning": "Stub backend: historical mismatch.", "sources": [], "indicators": ["Historical mismatch"]},
+]
+
+class GeminiBackend:
+    name = "gemini"
+
+    def __init__(self, api_key: str):
+        from google import genai
+        from google.genai import types
+        self.client = genai.Client(api_key=api_key)
+        self.types = types
+        self.stats = {"generate_calls": 0, "generate_seconds": 0.0}
+
+    def inline(self, data: bytes, mime_type: str):
+        return self.types.Part.from_bytes(data=data, mime_type=mime_type)
+
+    async def _generate(self, contents: list, system_instruction: str) -> str:
+        response = await self.client.aio.models.generate_content(
+            model=LLM_MODEL,
+            contents=contents,
+            config=self.types.GenerateContentConfig(
+                system_instruction=system_instruction,
+                response_mime_type="application/json"
+            )
+        )
+        return response.text
+
+    async def generate(self, contents: list, system_instruction: str = None) -> str:
+        start = time.perf_counter()
+        try:
+            return await self._generate(contents, system_instruction)
+        finally:
+            self.stats["generate_calls"] += 1
+            self.stats["generate_seconds"] += time.perf_counter() - start
+
+def parse_latency(spec: str):
+    """
+    "lognormal:1.5,0.4" -> a function drawing a latency in seconds from an RNG.
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    draws = {
+        "fixed": lambda rng: values[0],
+        "uniform": lambda rng: rng.uniform(values[0], values[1]),
+        "normal": lambda rng: rng.gauss(values[0], values[1]),
+        "lognormal": lambda rng: rng.lognormvariate(math.log(values[0]), values[1]),
+    }
+    if kind not in draws:
+        raise ValueError(f"unknown latency distribution '{spec}' (fixed, uniform, normal, lognormal)")
+    draw = draws[kind]
+    return lambda rng: max(0.0, draw(rng))
+
+class StubBackend(GeminiBackend):
+    """
+    No network: sleeps for a latency drawn from a seeded distribution, then answers with a
+    canned verdict picked by the request's content, so load tests are reproducible.
+    """
+    name = "stub"
+
+    def __init__(self, latency: str = LLM_STUB_LATENCY, seed: int = LLM_STUB_SEED):
+        self.latency = parse_latency(latency)
+        self.rng = random.Random(seed)
+        self.stats = {"generate_calls": 0, "generate_seconds": 0.0}
+
+    def inline(self, data: bytes, mime_type: str):
+        return {"inline": mime_type, "digest": hashlib.md5(data).hexdigest()}
+
+    async def _generate(self, contents: list, system_instruction: str) -> str:
+        await asyncio.sleep(self.latency(self.rng))
+        digest = int(hashlib.md5(repr(contents).encode()).hexdigest(), 16)
+        return json.dumps(STUB_RESULTS[digest % len(STUB_RESULTS)])
+
+_backend = None
+
+def get_llm():
+    global _backend
+    if _backend is None:
+        if LLM_BACKEND == "stub":
+            _backend = StubBackend()
+        elif LLM_BACKEND == "gemini":
+            _backend = GeminiBackend(os.environ.get("GEMINI_API_KEY"))
+        else:
+            raise RuntimeError(f"unknown LLM_BACKEND '{LLM_BACKEND}' (gemini, stub)")
+    return _backend
+
+def set_llm(backend):
+    global _backend
+    _backend = backend
@@ -0,0 +1,168 @@
+"""
+Load test for POST /analyze against the stub LLM backend (llm.py: seeded latency, canned
+verdicts, no network), so the numbers show the server's concurrency model and nothing else.
+
+Both servers run for real in their own process and are driven over HTTP:
+- the old Flask handler (base64 JSON, one blocking Gemini call per request) on Werkzeug's
+  threaded server, i.e. one thread per connection like `app.run()`; --flask-threads N
+  caps it like gunicorn --threads N instead
+- app.py on hypercorn (one worker), once per upload shape
+
+    python loadtest.py --requests 200 --concurrency 50 --latency fixed:1.0
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import socket
+import asyncio
+import argparse
+import statistics
+import subprocess
+import httpx
+from llm import parse_latency, STUB_RESULTS
+
+# 1x1 transparent png
+PNG = base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==")
+
+def serve_flask(port: int, latency: str, seed: int, threads: int):
+    """
+    The pre-Quart server: same request handling, Gemini replaced by a blocking sleep.
+    """
+    from flask import Flask, request, jsonify
+    from werkzeug.serving import make_server
+
+    app = Flask(__name__)
+    draw, rng = parse_latency(latency), random.Random(seed)
+
+    @app.route("/analyze", methods=["POST"])
+    def analyze_content():
+        data = request.json
+        base64.b64decode(data["image"].split(",")[-1])
+        time.sleep(draw(rng))
+        return jsonify(STUB_RESULTS[0])
+
+    if threads:
+        from socketserver import ThreadingMixIn
+        from concurrent.futures import ThreadPoolExecutor
+        from werkzeug.serving import BaseWSGIServer
+
+        class PooledServer(BaseWSGIServer):
+            # gunicorn --threads N: at most N requests handled at once, the rest wait for a thread
+            pool = ThreadPoolExecutor(max_workers=threads)
+
+            def process_request(self, request, client_address):
+                self.pool.submit(ThreadingMixIn.process_request_thread, self, request, client_address)
+
+        PooledServer("127.0.0.1", port, app).serve_forever()
+    else:
+        make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(command: list, port: int, env: dict = None) -> subprocess.Popen:
+    process = subprocess.Popen(command, env={**os.environ, **(env or {})}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited: {' '.join(command)}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"server did not come up: {' '.join(command)}")
+
+def request_body(shape: str, image_kb: int):
+    """
+    (body, content type) for one upload shape, built once so the client isn't the bottleneck.
+    """
+    # a screenshot-sized payload by default, so upload handling shows up in the numbers
+    screenshot = PNG + bytes(image_kb * 1024)
+    if shape == "json":
+        encoded = base64.b64encode(screenshot).decode()
+        return json.dumps({"image": f"data:image/png;base64,{encoded}"}).encode(), "application/json"
+    if shape == "multipart":
+        boundary = "loadtest-boundary"
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"text\"\r\n\r\ncaption\r\n"
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"screenshot.png\"\r\n"
+                f"Content-Type: image/png\r\n\r\n").encode() + screenshot + f"\r\n--{boundary}--\r\n".encode()
+        return body, f"multipart/form-data; boundary={boundary}"
+    return screenshot, "application/octet-stream"
+
+async def run_load(url: str, requests: int, concurrency: int, shape: str, image_kb: int):
+    body, content_type = request_body(shape, image_kb)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        async def one(_):
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, content=body, headers={"Content-Type": content_type})
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            return status, time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(requests)))
+        return results, time.perf_counter() - start
+
+def report(name: str, results: list, elapsed: float):
+    ok = [latency for status, latency in results if status == 200]
+    rejected = sum(status == 429 for status, _ in results)
+    errors = len(results) - len(ok) - rejected
+    p95 = statistics.quantiles(ok, n=20)[-1] if len(ok) >= 2 else float("nan")
+    print(f"{name:22s} {len(ok) / elapsed:8.1f} req/s   p50 {statistics.median(ok) if ok else float('nan'):6.2f}s   "
+          f"p95 {p95:6.2f}s   429s {rejected:4d}   errors {errors}")
+    return len(ok) / elapsed
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test /analyze against a stubbed Gemini")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50, help="client-side requests in flight")
+    parser.add_argument("--latency", default="fixed:1.0", help="stub latency distribution, e.g. fixed:1.0 or lognormal:1.5,0.4")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--image-kb", type=int, default=2048, help="upload size (small values isolate the concurrency model)")
+    parser.add_argument("--flask-threads", type=int, default=0, help="cap the old server's threads (0 = one per connection, like app.run())")
+    parser.add_argument("--serve-flask", type=int, help=argparse.SUPPRESS) # internal: run the old server on this port
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.serve_flask:
+        serve_flask(args.serve_flask, args.latency, args.seed, args.flask_threads)
+        sys.exit()
+
+    stub = {"LLM_BACKEND": "stub", "LLM_STUB_LATENCY": args.latency, "LLM_STUB_SEED": str(args.seed)}
+    limits = ", ".join(f"{k}={os.environ[k]}" for k in ("MAX_CONCURRENT", "QUEUE_TIMEOUT") if k in os.environ) or "defaults"
+    print(f"{args.requests} requests, {args.concurrency} in flight, {args.image_kb} KB images, stub latency {args.latency}, app.py limits: {limits}")
+    print("-" * 80)
+
+    port = free_port()
+    flask = start_server([sys.executable, __file__, "--serve-flask", str(port), "--latency", args.latency,
+                          "--seed", str(args.seed), "--flask-threads", str(args.flask_threads)], port)
+    try:
+        threads = f"x{args.flask_threads}" if args.flask_threads else "threaded"
+        baseline = report(f"flask {threads} (old)", *asyncio.run(run_load(f"http://127.0.0.1:{port}/analyze", args.requests, args.concurrency, "json", args.image_kb)))
+    finally:
+        flask.terminate()
+        flask.wait()
+
+    for shape in ("json", "multipart", "binary"):
+        # a fresh server per shape: same latency draws for every run
+        port = free_port()
+        quart = start_server([sys.executable, "-m", "hypercorn", "app:app", "--bind", f"127.0.0.1:{port}", "--workers", "1"], port, stub)
+        try:
+            throughput = report(f"quart {shape}", *asyncio.run(run_load(f"http://127.0.0.1:{port}/analyze", args.requests, args.concurrency, shape, args.image_kb)))
+        finally:
+            quart.terminate()
+            quart.wait()
+        print(f"{'':22s} {throughput / baseline:.1f}x the old server")
@@ -0,0 +1,56 @@
+"""
+Wall time, peak traced memory and accuracy of the SVC vs the streaming trainer
+at growing training set sizes.
+
+    python benchmark_train.py                      # features from ../data/ via the feature store
+    python benchmark_train.py --synthetic 60000    # no dataset needed
+"""
+
+import time
+import argparse
+import tracemalloc
+import numpy as np
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score
+from train import train_svc, train_stream, predict_batches
+
+def run(name, fit, X, y, test_idx):
+    tracemalloc.start()
+    start = time.perf_counter()
+    model = fit()
+    fit_time = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    accuracy = accuracy_score(y[test_idx], predict_batches(model, X, test_idx))
+    print(f"  {name:<10} fit {fit_time:8.2f}s   peak {peak / 2**20:8.1f} MB   accuracy {accuracy * 100:6.2f}%")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="../data/")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic 128-feature samples instead of --data")
+    parser.add_argument("--sizes", default="2000,5000,10000,20000")
+    parser.add_argument("--svc-max", type=int, default=20000, help="skip the SVC above this many training samples")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        X, y = make_classification(n_samples=args.synthetic, n_features=128, n_informative=24, random_state=42)
+    else:
+        from feature_store import load_dataset
+        X, y = load_dataset(args.data)
+
+    train_all, test_idx = train_test_split(np.arange(len(y)), test_size=0.2, random_state=42, stratify=y)
+    test_idx = np.sort(test_idx)
+    rng = np.random.default_rng(42)
+
+    for size in [int(s) for s in args.sizes.split(",")] + [len(train_all)]:
+        if size > len(train_all):
+            continue
+        train_idx = np.sort(rng.choice(train_all, size=size, replace=False))
+        print(f"{size} training samples:")
+        if size <= args.svc_max:
+            run("svc", lambda: train_svc(np.asarray(X[train_idx]), y[train_idx]), X, y, test_idx)
+        run("stream", lambda: train_stream(X, y, train_idx), X, y, test_idx)
+        run("nystroem", lambda: train_stream(X, y, train_idx, kernel="nystroem"), X, y, test_idx)
+        if size == len(train_all):
+            break
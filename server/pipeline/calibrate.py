@@ -0,0 +1,70 @@
+import sys
+import json
+import argparse
+import joblib
+import numpy as np
+from pathlib import Path
+from PIL import Image
+
+# score exactly like the backend does (same feature code, same layout detection)
+BACKEND_DIR = Path(__file__).resolve().parents[2] / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+from app.local_model import fake_probabilities, calibrate_thresholds
+from app.utils import hash_file
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+def load_grays(folder: Path, limit: int = None) -> list:
+    paths = sorted(p for p in folder.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)[:limit]
+    return [np.array(Image.open(p).convert("L")) for p in paths]
+
+def score(model, grays: list, batch_size: int = 256) -> np.ndarray:
+    return np.concatenate([fake_probabilities(model, grays[i:i + batch_size]) for i in range(0, len(grays), batch_size)])
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Calibrate the local classifier's fast-path thresholds on realistic images")
+    parser.add_argument("--model", default="../model/deepfake_detector.pkl")
+    parser.add_argument("--real", required=True, help="folder of real photos/frames like the ones users send (not CIFAKE)")
+    parser.add_argument("--fake", required=True, help="folder of AI-generated images like the ones users send")
+    parser.add_argument("--max-false-fake", type=float, default=0.01, help="share of real images allowed to be called Fake")
+    parser.add_argument("--max-false-real", type=float, default=0.01, help="share of fake images allowed to be called Real")
+    parser.add_argument("--min-images", type=int, default=200, help="per class; fewer can't support a 1%% error rate")
+    parser.add_argument("--limit", type=int, default=None)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    model_path = Path(args.model)
+    model = joblib.load(model_path)
+
+    real, fake = load_grays(Path(args.real), args.limit), load_grays(Path(args.fake), args.limit)
+    if min(len(real), len(fake)) < args.min_images:
+        sys.exit(f"Need at least {args.min_images} images per class (got {len(real)} real, {len(fake)} fake)")
+
+    print(f"Scoring {len(real)} real and {len(fake)} fake images...")
+    real_scores, fake_scores = score(model, real), score(model, fake)
+    thresholds = calibrate_thresholds(real_scores, fake_scores, args.max_false_fake, args.max_false_real)
+
+    # how much traffic each side would answer without Gemini
+    fake_recall = float((fake_scores >= thresholds["fake"]).mean()) if thresholds["fake"] is not None else 0.0
+    real_recall = float((real_scores <= thresholds["real"]).mean()) if thresholds["real"] is not None else 0.0
+    print(f"P(fake) on real images: median {np.median(real_scores):.3f}, p99 {np.quantile(real_scores, 0.99):.3f}")
+    print(f"P(fake) on fake images: median {np.median(fake_scores):.3f}, p1 {np.quantile(fake_scores, 0.01):.3f}")
+    print(f"Fake threshold: {thresholds['fake']} (answers {fake_recall:.1%} of fakes locally)")
+    print(f"Real threshold: {thresholds['real']} (answers {real_recall:.1%} of reals locally)")
+
+    calibration = {
+        "model": model_path.name,
+        "model_digest": hash_file(model_path),
+        "fake_threshold": thresholds["fake"],
+        "real_threshold": thresholds["real"],
+        "max_false_fake": args.max_false_fake,
+        "max_false_real": args.max_false_real,
+        "real_images": len(real),
+        "fake_images": len(fake),
+        "fake_recall": fake_recall,
+        "real_recall": real_recall
+    }
+    out = model_path.with_suffix(".calibration.json")
+    out.write_text(json.dumps(calibration, indent=2))
+    print(f"Calibration saved: {out}")
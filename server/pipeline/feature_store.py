@@ -0,0 +1,155 @@
+import os
+import json
+import numpy as np
+from pathlib import Path
+from features import EXTRACTOR_VERSION, N_BINS, featurize_paths, list_dataset
+
+STORE_DIR = Path("../features/")
+MANIFEST = "manifest.json"
+
+class FeatureStore:
+    """
+    Persistent cache of featurized images so reruns of train.py skip the dataset pass.
+
+    Features live in .npy shards; manifest.json maps every file (absolute path) to its
+    mtime, size and (shard, row). A run only featurizes new or changed files and writes
+    them as a new shard. Loading merges the shards into one, in dataset order, the first
+    time the layout changed; after that training memory-maps it with no copy at all.
+    """
+    def __init__(self, store_dir=STORE_DIR, version: str = EXTRACTOR_VERSION):
+        self.dir = Path(store_dir)
+        self.version = version
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self) -> dict:
+        path = self.dir / MANIFEST
+        if path.exists():
+            manifest = json.loads(path.read_text())
+            if manifest.get("version") == self.version:
+                return manifest
+            print(f"Feature extractor changed ({manifest.get('version')} -> {self.version}), rebuilding features...")
+        return {"version": self.version, "next_shard": 0, "shards": {}, "entries": {}}
+
+    def _write_manifest(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.dir / (MANIFEST + ".tmp")
+        tmp_path.write_text(json.dumps(self.manifest))
+        os.replace(tmp_path, self.dir / MANIFEST)
+
+    def _write_shard(self, X: np.ndarray) -> str:
+        name = f"shard_{self.manifest['next_shard']:05d}.npy"
+        self.manifest["next_shard"] += 1
+        self.dir.mkdir(parents=True, exist_ok=True)
+        np.save(self.dir / name, X)
+        self.manifest["shards"][name] = len(X)
+        return name
+
+    def _shard(self, name: str):
+        return np.load(self.dir / name, mmap_mode="r")
+
+    def stale(self, paths: list) -> list:
+        """
+        Files that are not in the store yet, or changed since they were featurized.
+        """
+        entries = self.manifest["entries"]
+        stale = []
+        for path in paths:
+            stat = os.stat(path)
+            entry = entries.get(path)
+            if entry is None or entry["mtime"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                stale.append(path)
+        return stale
+
+    def update(self, paths: list, workers: int = None) -> int:
+        """
+        Featurizes only the new/changed files among `paths` into a new shard. Returns how many.
+        """
+        paths = [os.path.abspath(p) for p in paths]
+        stale = self.stale(paths)
+        if not stale:
+            return 0
+
+        print(f"Featurizing {len(stale)} new or changed images...")
+        X, kept = featurize_paths(stale, workers)
+        shard = self._write_shard(X) if len(X) else None
+        rows = dict(zip(kept.tolist(), range(len(kept))))
+        for i, path in enumerate(stale):
+            stat = os.stat(path)
+            # unreadable files are remembered too (no shard), so they aren't retried every run
+            self.manifest["entries"][path] = {
+                "mtime": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "shard": shard if i in rows else None,
+                "row": rows.get(i, -1)
+            }
+        self._write_manifest()
+        return len(stale)
+
+    def compact(self, paths: list):
+        """
+        Rewrites the features of `paths` as one shard in that order and drops everything else.
+        """
+        paths = [os.path.abspath(p) for p in paths]
+        entries = self.manifest["entries"]
+        located = [(entries[p]["shard"], entries[p]["row"]) for p in paths if entries[p]["shard"]]
+
+        X = np.empty((len(located), N_BINS))
+        by_shard = {}
+        for out_row, (shard, row) in enumerate(located):
+            by_shard.setdefault(shard, ([], []))
+            by_shard[shard][0].append(out_row)
+            by_shard[shard][1].append(row)
+        for shard, (out_rows, rows) in by_shard.items():
+            X[out_rows] = self._shard(shard)[rows]
+
+        old_shards = list(self.manifest["shards"])
+        self.manifest["shards"] = {}
+        shard = self._write_shard(X)
+        row = 0
+        compacted = {}
+        for path in paths:
+            entry = dict(entries[path])
+            if entry["shard"]:
+                entry["shard"], entry["row"] = shard, row
+                row += 1
+            compacted[path] = entry
+        self.manifest["entries"] = compacted
+        self._write_manifest()
+
+        for name in old_shards:
+            if name != shard:
+                (self.dir / name).unlink(missing_ok=True)
+
+    def load(self, paths: list):
+        """
+        Features for `paths` as a read-only memmap, plus the indices of the paths that have
+        features (unreadable images are skipped). Call update() first.
+        """
+        abs_paths = [os.path.abspath(p) for p in paths]
+        entries = self.manifest["entries"]
+        kept = np.array([i for i, p in enumerate(abs_paths) if entries[p]["shard"]], dtype=int)
+        located = [(entries[abs_paths[i]]["shard"], entries[abs_paths[i]]["row"]) for i in kept]
+
+        shards = self.manifest["shards"]
+        in_place = (
+            len(shards) == 1
+            and len(located) == next(iter(shards.values()))
+            and all(row == i for i, (_, row) in enumerate(located))
+        )
+        if not in_place:
+            self.compact(abs_paths)
+        X = self._shard(next(iter(self.manifest["shards"]))) if located else np.empty((0, N_BINS))
+        return X, kept
+
+def load_dataset(data_dir, store_dir=STORE_DIR, workers: int = None):
+    """
+    Same as features.load_dataset, but backed by the feature store.
+    """
+    files = list_dataset(data_dir)
+    paths = [path for path, _ in files]
+    store = FeatureStore(store_dir)
+    store.update(paths, workers)
+    X, kept = store.load(paths)
+    y = np.array([label for _, label in files], dtype=int)[kept]
+    print(f"Loaded {len(X)} feature rows from {store.dir}")
+    return X, y
@@ -0,0 +1,131 @@
+import os
+import cv2
+import numpy as np
+from functools import lru_cache
+from scipy import fft, sparse
+from concurrent.futures import ProcessPoolExecutor
+
+IMG_SIZE = 256
+N_BINS = 128
+# bump when the feature math changes, so cached features get rebuilt
+EXTRACTOR_VERSION = f"fft-{IMG_SIZE}-{N_BINS}-1"
+# images per FFT batch; one batch of 256x256 spectra is ~35MB per 64 images
+BATCH_SIZE = 64
+# images each loader process reads + featurizes before sending results back
+CHUNK_SIZE = 512
+
+@lru_cache(maxsize=None)
+def radial_weights(size: int = IMG_SIZE, bins: int = N_BINS):
+    """
+    Sparse (pixels of the half spectrum x bins) matrix that turns a batch of rfft2
+    magnitudes into the azimuthal average of the full fftshift-ed spectrum.
+
+    The spectrum of a real image is conjugate symmetric, so |F(u, v)| == |F(-u, -v)|
+    and both sit at the same radius. rfft2 only keeps v in [0, size // 2]; every column
+    except v = 0 and v = size // 2 stands for itself and its mirror, so it counts twice.
+    Built once per (size, bins), the averaging is then a single matmul per batch.
+    """
+    # full grid radii, exactly as the original per-image code computes them
+    y, x = np.indices((size, size))
+    r_full = np.sqrt((x - size // 2) ** 2 + (y - size // 2) ** 2).astype(int)
+    counts = np.bincount(r_full.ravel())
+
+    # radius of each rfft2 entry: unshifted frequency u -> shifted row (u + size // 2) % size
+    half = size // 2 + 1
+    rows = (np.arange(size) + size // 2) % size
+    cols = np.arange(half) + size // 2
+    r_half = r_full[rows[:, None], cols[None, :] % size]
+
+    weight = np.full((size, half), 2.0)
+    weight[:, 0] = 1.0
+    if size % 2 == 0:
+        weight[:, -1] = 1.0
+
+    r_half, weight = r_half.ravel(), weight.ravel()
+    keep = r_half < bins
+    pixels = np.flatnonzero(keep)
+    values = weight[keep] / counts[r_half[keep]]
+    return sparse.csr_matrix((values, (pixels, r_half[keep])), shape=(size * half, bins))
+
+def fft_features_batch(images: np.ndarray, bins: int = N_BINS) -> np.ndarray:
+    """
+    (N, size, size) grayscale stack -> (N, bins) radial profiles of the log-magnitude spectrum.
+    """
+    images = np.asarray(images, dtype=np.float64)
+    n, size = images.shape[0], images.shape[1]
+    weights = radial_weights(size, bins)
+
+    features = np.empty((n, bins))
+    for start in range(0, n, BATCH_SIZE):
+        spectrum = fft.rfft2(images[start:start + BATCH_SIZE])
+        magnitude_spectrum = 20 * np.log(np.abs(spectrum) + 1e-9)
+        features[start:start + BATCH_SIZE] = magnitude_spectrum.reshape(len(spectrum), -1) @ weights
+    return features
+
+def load_gray(file_path, size: int = IMG_SIZE):
+    # Grayscale and Standardize
+    img = cv2.imread(str(file_path), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return None
+    return cv2.resize(img, (size, size))
+
+def extract_fft_features(file_path):
+    """
+    Features for one image file (None if it can't be read).
+    """
+    img = load_gray(file_path)
+    if img is None:
+        return None
+    return fft_features_batch(img[None])[0]
+
+def featurize_files(paths: list, size: int = IMG_SIZE, bins: int = N_BINS):
+    """
+    Reads and featurizes a chunk of files. Returns (features, indices of the files that were readable).
+    """
+    images, ok = [], []
+    for i, path in enumerate(paths):
+        img = load_gray(path, size)
+        if img is not None:
+            images.append(img)
+            ok.append(i)
+    if not images:
+        return np.empty((0, bins)), np.array(ok, dtype=int)
+    return fft_features_batch(np.stack(images), bins), np.array(ok, dtype=int)
+
+def featurize_paths(paths: list, workers: int = None, chunk_size: int = CHUNK_SIZE):
+    """
+    Featurizes files on every core in chunks. Returns (X, indices into `paths` that made it).
+    """
+    paths = list(paths)
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    X, kept = [np.empty((0, N_BINS))], [np.empty(0, dtype=int)]
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        results = pool.map(featurize_files, chunks) if pool else map(featurize_files, chunks)
+        for offset, (features, ok) in zip(range(0, len(paths), chunk_size), results):
+            X.append(features)
+            kept.append(ok + offset)
+    finally:
+        if pool:
+            pool.shutdown()
+    return np.concatenate(X), np.concatenate(kept)
+
+def list_dataset(data_dir):
+    """
+    [(path, label)] for data_dir/real (0) and data_dir/fake (1).
+    """
+    files = []
+    categories = {'real': 0, 'fake': 1}
+    for label_name, label_idx in categories.items():
+        folder = os.path.join(data_dir, label_name)
+        files.extend((os.path.join(folder, filename), label_idx) for filename in sorted(os.listdir(folder)))
+    return files
+
+def load_dataset(data_dir, workers: int = None):
+    files = list_dataset(data_dir)
+    print(f"Featurizing {len(files)} images on {workers or os.cpu_count()} cores...")
+    X, kept = featurize_paths([path for path, _ in files], workers)
+    y = np.array([label for _, label in files], dtype=int)[kept]
+    return X, y
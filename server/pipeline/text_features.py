@@ -0,0 +1,83 @@
+import re
+import zlib
+from itertools import chain
+import numpy as np
+
+# bump when the feature math changes; the backend refuses a model built for another version
+TEXT_FEATURES_VERSION = "stylometry-1"
+
+FEATURE_NAMES = [
+    "log_chars", "log_words",
+    "sentence_len_mean", "sentence_len_std", "burstiness",
+    "type_token_ratio", "hapax_ratio",
+    "word_len_mean", "word_len_std",
+    "repeated_bigrams", "repeated_trigrams",
+    "commas", "periods", "exclamations", "questions", "semicolons_colons",
+    "dashes", "quotes", "parentheses", "uppercase", "digits", "non_ascii", "newlines",
+    "lowercase_sentence_starts", "lowercase_i", "repeated_chars",
+    "compression_ratio",
+]
+
+WORD_RE = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)*")
+SENTENCE_END_RE = re.compile(r"[.!?]+(?:\s+|$)|\n+")
+REPEATED_CHAR_RE = re.compile(r"(.)\1{2,}")
+
+# byte -> punctuation/character class, so the whole profile is one bincount
+CHAR_CLASSES = ["other", ",", ".", "!", "?", ";:", "-", "quote", "paren", "upper", "digit", "non_ascii", "\n"]
+_CLASS_TABLE = np.zeros(256, dtype=np.uint8)
+for _chars, _cls in [(",", 1), (".", 2), ("!", 3), ("?", 4), (";:", 5), ("-", 6), ("\"'`", 7), ("()[]", 8), ("\n", 12)]:
+    for _c in _chars:
+        _CLASS_TABLE[ord(_c)] = _cls
+_CLASS_TABLE[ord("A"):ord("Z") + 1] = 9
+_CLASS_TABLE[ord("0"):ord("9") + 1] = 10
+_CLASS_TABLE[128:] = 11
+
+def text_features(text: str):
+    """
+    Stylometric feature vector (FEATURE_NAMES order) for one text, or None when it has no words.
+    Everything past tokenization (one regex pass per sentence) is numpy on the word/byte arrays.
+    """
+    raw = text.encode("utf-8")
+    # one findall per sentence: word lists and sentence lengths in the same pass
+    sentences = [words for words in map(WORD_RE.findall, SENTENCE_END_RE.split(text)) if words]
+    if not raw or not sentences:
+        return None
+    words = list(chain.from_iterable(sentences))
+    n_chars, n_words = len(raw), len(words)
+
+    lengths = np.fromiter(map(len, sentences), dtype=np.float64, count=len(sentences))
+    length_mean, length_std = lengths.mean(), lengths.std()
+    # -1 perfectly regular ... +1 very bursty (human writing mixes short and long sentences)
+    burstiness = (length_std - length_mean) / (length_std + length_mean)
+
+    # vocabulary
+    vocab, ids, counts = np.unique(list(map(str.lower, words)), return_inverse=True, return_counts=True)
+    word_lengths = np.fromiter(map(len, words), dtype=np.float64, count=n_words)
+
+    def repeated(n):
+        if n_words <= n:
+            return 0.0
+        size = len(vocab)
+        grams = ids[:n_words - n + 1].astype(np.int64)
+        for k in range(1, n):
+            grams = grams * size + ids[k:n_words - n + 1 + k]
+        return 1.0 - len(np.unique(grams)) / len(grams)
+
+    # punctuation / character profile per character
+    profile = np.bincount(_CLASS_TABLE[np.frombuffer(raw, dtype=np.uint8)], minlength=len(CHAR_CLASSES)) / n_chars
+
+    # sloppy typing: sentences starting lowercase, "i" for "I", "sooo", "!!!"
+    lowercase_starts = np.mean([sentence[0][0].islower() for sentence in sentences])
+    lowercase_i = words.count("i") / n_words
+    repeated_chars = len(REPEATED_CHAR_RE.findall(text)) / n_chars * 100
+
+    return np.array([
+        np.log1p(n_chars), np.log1p(n_words),
+        length_mean, length_std, burstiness,
+        len(vocab) / n_words, np.count_nonzero(counts == 1) / n_words,
+        word_lengths.mean(), word_lengths.std(),
+        repeated(2), repeated(3),
+        *profile[1:12], profile[12],
+        lowercase_starts, lowercase_i, repeated_chars,
+        len(zlib.compress(raw, 6)) / n_chars,
+    ], dtype=np.float64)
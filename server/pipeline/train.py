@@ -1,72 +1,119 @@
-import os
-import cv2
-import numpy as np
+import argparse
 import joblib
+import numpy as np
 from pathlib import Path
 from sklearn.svm import SVC
-from scipy.fftpack import fft2, fftshift
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.kernel_approximation import RBFSampler, Nystroem
+from sklearn.linear_model import SGDClassifier
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.frozen import FrozenEstimator
+from feature_store import load_dataset
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 
 MODEL_PATH = Path("../model/")
 
-def extract_fft_features(file_path):
-    # Grayscale and Standardize
-    img = cv2.imread(file_path, cv2.IMREAD_GRAYSCALE)
-    
-    if img is None: return None
-    
-    img = cv2.resize(img, (256, 256))
-
-    # Convert to Fast Fourier Frequency Domain
-    f_shift = fftshift(fft2(img))
-    magnitude_spectrum = 20 * np.log(np.abs(f_shift) + 1e-9)
-
-    h, w = magnitude_spectrum.shape
-    center = (h // 2, w // 2)
-    y, x = np.indices((h, w))
-    r = np.sqrt((x - center[0])**2 + (y - center[1])**2).astype(int)
-    
-    tbin = np.bincount(r.ravel(), magnitude_spectrum.ravel())
-    nr = np.bincount(r.ravel())
-    radial_profile = tbin / nr
-    
-    return radial_profile[:128]
-
-def load_dataset(data_dir):
-    X, y = [], []
-    categories = {'real': 0, 'fake': 1}
-    
-    for label_name, label_idx in categories.items():
-        folder = os.path.join(data_dir, label_name)
-        
-        print(f"Loading {label_name}...")
-        
-        for filename in os.listdir(folder):
-            path = os.path.join(folder, filename)
-            features = extract_fft_features(path)
-            
-            if features is not None:
-                X.append(features)
-                y.append(label_idx)
-    
-    return np.array(X), np.array(y)
+def train_svc(X_train, y_train):
+    # Support Vector Machine (exact kernel, O(n^2) memory / O(n^2..n^3) time)
+    clf = SVC(kernel = 'rbf', probability=True, C = 1.0, gamma = 'scale')
+    clf.fit(X_train, y_train)
+    return clf
+
+def iter_batches(X, y, idx, batch_size, rng=None):
+    """
+    Mini-batches of rows `idx` read from X (usually a memmap). Only one batch is ever
+    in memory; shuffling the index order (not the data) keeps SGD unbiased.
+    """
+    if rng is not None:
+        idx = rng.permutation(idx)
+    for start in range(0, len(idx), batch_size):
+        # sorted reads are sequential on disk
+        batch = np.sort(idx[start:start + batch_size])
+        yield np.asarray(X[batch]), y[batch]
+
+def train_stream(X, y, train_idx, kernel="rff", n_components=2048, epochs=5, batch_size=4096,
+                 alpha=1e-4, calibration_size=20000, seed=42):
+    """
+    Out-of-core alternative to the SVC: standardize -> approximate RBF kernel features
+    (random Fourier features or Nystroem) -> linear logistic model fitted with partial_fit,
+    then sigmoid calibration on a held-out slice. Memory depends on batch_size and
+    n_components, not on the dataset size.
+    """
+    rng = np.random.default_rng(seed)
+    fit_idx, calib_idx = train_test_split(
+        train_idx, test_size=min(calibration_size, max(len(train_idx) // 10, 1)),
+        random_state=seed, stratify=y[train_idx]
+    )
+
+    # pass 1: feature means/variances
+    scaler = StandardScaler()
+    for X_batch, _ in iter_batches(X, y, fit_idx, batch_size):
+        scaler.partial_fit(X_batch)
+
+    # gamma="scale" of the SVC is 1 / (n_features * X.var()); standardized features have var 1
+    gamma = 1.0 / X.shape[1]
+    if kernel == "nystroem":
+        # landmarks from a bounded random sample
+        sample = np.sort(rng.choice(fit_idx, size=min(len(fit_idx), n_components), replace=False))
+        kernel_map = Nystroem(gamma=gamma, n_components=len(sample), random_state=seed)
+        kernel_map.fit(scaler.transform(np.asarray(X[sample])))
+    else:
+        kernel_map = RBFSampler(gamma=gamma, n_components=n_components, random_state=seed)
+        kernel_map.fit(np.zeros((1, X.shape[1])))
+
+    clf = SGDClassifier(loss="log_loss", alpha=alpha, random_state=seed)
+    classes = np.unique(y)
+    for epoch in range(epochs):
+        for X_batch, y_batch in iter_batches(X, y, fit_idx, batch_size, rng):
+            clf.partial_fit(kernel_map.transform(scaler.transform(X_batch)), y_batch, classes=classes)
+        print(f"Epoch {epoch + 1}/{epochs} done")
+
+    model = Pipeline([("scaler", scaler), ("kernel", kernel_map), ("clf", clf)])
+    # the calibration slice is capped, so this stays bounded too
+    calibrated = CalibratedClassifierCV(FrozenEstimator(model), method="sigmoid")
+    calibrated.fit(np.asarray(X[np.sort(calib_idx)]), y[np.sort(calib_idx)])
+    return calibrated
+
+def predict_batches(model, X, idx, batch_size=4096):
+    return np.concatenate([
+        model.predict(np.asarray(X[idx[start:start + batch_size]]))
+        for start in range(0, len(idx), batch_size)
+    ])
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the FFT deepfake classifier")
+    parser.add_argument("--mode", choices=["svc", "stream"], default="svc",
+                        help="svc: exact RBF SVM (small datasets); stream: kernel approximation + SGD, out-of-core")
+    parser.add_argument("--data", default="../data/")
+    parser.add_argument("--kernel", choices=["rff", "nystroem"], default="rff")
+    parser.add_argument("--components", type=int, default=2048)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=4096)
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    X, y = load_dataset("../data/")
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, random_state = 42)
+    args = parse_args()
+    X, y = load_dataset(args.data)
+    train_idx, test_idx = train_test_split(np.arange(len(y)), test_size = 0.2, random_state = 42)
+    test_idx = np.sort(test_idx)
 
-    print("Training SVM...")
-    
-    # Support Vector Machine
-    clf = SVC(kernel = 'rbf', probability=True, C = 1.0, gamma = 'scale')
-    clf.fit(X_train, y_train)
+    if args.mode == "svc":
+        print("Training SVM...")
+        clf = train_svc(np.asarray(X[np.sort(train_idx)]), y[np.sort(train_idx)])
+        model_file = "deepfake_fft_model.pkl"
+    else:
+        print(f"Training streaming model ({args.kernel}, {args.components} components)...")
+        clf = train_stream(X, y, train_idx, args.kernel, args.components, args.epochs, args.batch_size)
+        model_file = "deepfake_fft_stream.pkl"
+
+    y_pred = predict_batches(clf, X, test_idx)
+    y_test = y[test_idx]
 
-    y_pred = clf.predict(X_test)
-    
     print(f"Accuracy: {accuracy_score(y_test, y_pred) * 100:.2f}%")
     print(classification_report(y_test, y_pred))
 
-    joblib.dump(clf, f"{MODEL_PATH}/deepfake_fft_model.pkl")
-    
-    print(f"Model saved: {MODEL_PATH}/deepfake_fft_model.pkl")
\ No newline at end of file
+    joblib.dump(clf, f"{MODEL_PATH}/{model_file}")
+
+    print(f"Model saved: {MODEL_PATH}/{model_file}")
@@ -0,0 +1,103 @@
+"""
+Trains the text pre-screener the backend runs in front of Gemini (backend/app/text_model.py):
+stylometric features (text_features.py) -> standardized logistic regression, exported as
+plain JSON so the backend needs neither sklearn nor pickles to score a text.
+
+Data: either a directory with `human/` and `ai/` folders of .txt files, or a CSV with a
+`text` column and a 0/1 `generated` (or `label`) column, e.g. Kaggle's
+"LLM - Detect AI Generated Text" train_essays.csv.
+"""
+
+import csv
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, classification_report
+from text_features import text_features, FEATURE_NAMES, TEXT_FEATURES_VERSION
+
+MODEL_PATH = Path("../model/text_prescreen.json")
+
+def load_texts(data: str):
+    path = Path(data)
+    if path.is_dir():
+        texts, labels = [], []
+        for label, folder in ((0, "human"), (1, "ai")):
+            for file in sorted((path / folder).glob("*.txt")):
+                texts.append(file.read_text(encoding="utf-8", errors="replace"))
+                labels.append(label)
+        return texts, np.array(labels)
+
+    csv.field_size_limit(2**31 - 1)
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    label_column = "generated" if "generated" in rows[0] else "label"
+    return [row["text"] for row in rows], np.array([int(float(row[label_column])) for row in rows])
+
+def featurize(texts: list, workers: int = None):
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        features = list(pool.map(text_features, texts, chunksize=256))
+    keep = np.array([f is not None for f in features])
+    return np.stack([f for f in features if f is not None]), keep
+
+def coverage_report(probabilities, y_true, human_threshold: float, ai_threshold: float):
+    """
+    What the backend would answer locally at these thresholds, and how often it'd be right.
+    """
+    confident = (probabilities >= ai_threshold) | (probabilities <= human_threshold)
+    share = confident.mean()
+    accuracy = ((probabilities[confident] >= 0.5) == y_true[confident]).mean() if confident.any() else float("nan")
+    print(f"Thresholds {human_threshold:.2f}/{ai_threshold:.2f}: {share * 100:.1f}% of texts skip Gemini, "
+          f"{accuracy * 100:.2f}% of those correct")
+
+def export(scaler, clf, path: Path, metrics: dict):
+    model = {
+        "version": TEXT_FEATURES_VERSION,
+        "features": FEATURE_NAMES,
+        "mean": scaler.mean_.tolist(),
+        "scale": scaler.scale_.tolist(),
+        "coef": clf.coef_[0].tolist(),
+        "intercept": float(clf.intercept_[0]),
+        "metrics": metrics
+    }
+    path.write_text(json.dumps(model, indent=2))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the stylometric text pre-screener")
+    parser.add_argument("--data", default="../data/text/")
+    parser.add_argument("--output", default=str(MODEL_PATH))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--C", type=float, default=1.0, help="inverse L2 regularization strength")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    texts, y = load_texts(args.data)
+    print(f"Loaded {len(texts)} texts ({int(y.sum())} AI, {int(len(y) - y.sum())} human)")
+
+    start = time.perf_counter()
+    X, keep = featurize(texts, args.workers)
+    y = y[keep]
+    total_kb = sum(len(t.encode("utf-8")) for t in texts) / 1024
+    print(f"Featurized in {time.perf_counter() - start:.1f}s ({total_kb:.0f} KB of text)")
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+    scaler = StandardScaler().fit(X_train)
+    clf = LogisticRegression(C=args.C, max_iter=1000)
+    clf.fit(scaler.transform(X_train), y_train)
+
+    probabilities = clf.predict_proba(scaler.transform(X_test))[:, 1]
+    y_pred = (probabilities >= 0.5).astype(int)
+    print(f"Accuracy: {accuracy_score(y_test, y_pred) * 100:.2f}%")
+    print(classification_report(y_test, y_pred))
+    for human_threshold, ai_threshold in ((0.05, 0.95), (0.03, 0.97), (0.01, 0.99)):
+        coverage_report(probabilities, y_test, human_threshold, ai_threshold)
+
+    export(scaler, clf, Path(args.output), {"accuracy": round(float(accuracy_score(y_test, y_pred)), 4), "test_size": len(y_test)})
+    print(f"Model saved: {args.output}")
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the pipeline scripts import each other by module name (run from server/pipeline/)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "pipeline"))
+# app.py / llm.py are top-level modules too (hypercorn app:app from server/)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,60 @@
+import io
+import base64
+import asyncio
+import pytest
+from werkzeug.datastructures import FileStorage
+import app as server
+from llm import StubBackend, STUB_RESULTS, set_llm
+
+PNG = base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==")
+
+@pytest.fixture(autouse=True)
+def stub_llm(monkeypatch):
+    monkeypatch.setattr(server, "slots", None)
+    set_llm(StubBackend("fixed:0", seed=0))
+    yield
+    set_llm(None)
+
+def post(**kwargs):
+    async def run():
+        return await server.app.test_client().post("/analyze", **kwargs)
+    return asyncio.run(run())
+
+@pytest.mark.parametrize("request_kwargs", [
+    {"json": {"image": "data:image/png;base64," + base64.b64encode(PNG).decode(), "text": "caption"}},
+    {"files": {"image": FileStorage(io.BytesIO(PNG), filename="shot.png", content_type="image/png")}, "form": {"text": "caption"}},
+    {"data": PNG, "headers": {"Content-Type": "application/octet-stream"}},
+    {"json": {"text": "just a caption"}},
+])
+def test_every_upload_shape_gets_a_verdict(request_kwargs):
+    response = post(**request_kwargs)
+    assert response.status_code == 200
+    assert asyncio.run(response.get_json()) in STUB_RESULTS
+
+def test_bad_uploads_are_refused(monkeypatch):
+    assert post(json={}).status_code == 400
+    assert post(json={"image": "not base64!"}).status_code == 400
+    # the bytes decide the type, not the header
+    assert post(data=b"GIF87a" + bytes(16), headers={"Content-Type": "image/png"}).status_code == 200
+    assert post(data=b"plain text", headers={"Content-Type": "application/octet-stream"}).status_code == 415
+
+    monkeypatch.setattr(server, "MAX_UPLOAD_BYTES", len(PNG) - 1)
+    assert post(data=PNG, headers={"Content-Type": "image/png"}).status_code == 413
+
+def test_saturated_server_answers_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(server, "MAX_CONCURRENT", 2)
+    monkeypatch.setattr(server, "QUEUE_TIMEOUT", 0.1)
+    set_llm(StubBackend("fixed:0.5", seed=0))
+
+    async def burst():
+        client = server.app.test_client()
+        responses = await asyncio.gather(*(client.post("/analyze", json={"text": f"claim {i}"}) for i in range(5)))
+        # every slot was given back
+        assert not server.get_slots().locked()
+        return responses
+
+    responses = asyncio.run(burst())
+    assert sorted(r.status_code for r in responses) == [200, 200, 429, 429, 429]
+    for response in responses:
+        if response.status_code == 429:
+            assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,46 @@
+import os
+import cv2
+import numpy as np
+from features import extract_fft_features
+from feature_store import FeatureStore
+
+def write_image(path, seed: int):
+    img = np.random.default_rng(seed).integers(0, 255, (120, 160), dtype=np.uint8)
+    cv2.imwrite(str(path), img)
+    return str(path)
+
+def test_modified_file_is_featurized_again(tmp_path):
+    paths = [write_image(tmp_path / f"img_{i}.png", i) for i in range(4)]
+    store = FeatureStore(tmp_path / "store")
+    assert store.update(paths, workers=1) == 4
+    assert store.update(paths, workers=1) == 0
+
+    # new content under the same name (and a different mtime, in case the size matches)
+    write_image(paths[2], 99)
+    stat = os.stat(paths[2])
+    os.utime(paths[2], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert store.stale([os.path.abspath(p) for p in paths]) == [os.path.abspath(paths[2])]
+    assert store.update(paths, workers=1) == 1
+
+    X, kept = store.load(paths)
+    assert kept.tolist() == [0, 1, 2, 3]
+    np.testing.assert_allclose(X, np.stack([extract_fft_features(p) for p in paths]))
+
+def test_store_survives_reopening_and_drops_old_extractor_versions(tmp_path):
+    paths = [write_image(tmp_path / f"img_{i}.png", i) for i in range(3)]
+    FeatureStore(tmp_path / "store").update(paths, workers=1)
+
+    # a fresh process sees the manifest and has nothing to do
+    assert FeatureStore(tmp_path / "store").update(paths, workers=1) == 0
+    # a different feature extractor invalidates everything
+    assert FeatureStore(tmp_path / "store", version="other").update(paths, workers=1) == 3
+
+def test_load_after_compaction_is_in_dataset_order(tmp_path):
+    paths = [write_image(tmp_path / f"img_{i}.png", i) for i in range(4)]
+    store = FeatureStore(tmp_path / "store")
+    store.update(paths[:2], workers=1)
+    store.update(paths[2:], workers=1)
+
+    X, _ = store.load(list(reversed(paths)))
+    np.testing.assert_allclose(X, np.stack([extract_fft_features(p) for p in reversed(paths)]))
+    assert len(store.manifest["shards"]) == 1
@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+from scipy.fftpack import fft2, fftshift
+from features import extract_fft_features, featurize_paths, IMG_SIZE, N_BINS
+
+def reference_features(file_path):
+    # the original one-image-at-a-time code from train.py
+    img = cv2.resize(cv2.imread(str(file_path), cv2.IMREAD_GRAYSCALE), (256, 256))
+    magnitude_spectrum = 20 * np.log(np.abs(fftshift(fft2(img))) + 1e-9)
+    h, w = magnitude_spectrum.shape
+    y, x = np.indices((h, w))
+    r = np.sqrt((x - w // 2) ** 2 + (y - h // 2) ** 2).astype(int)
+    return (np.bincount(r.ravel(), magnitude_spectrum.ravel()) / np.bincount(r.ravel()))[:128]
+
+def write_images(folder, n: int = 6):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(n):
+        # odd sizes so the resize is exercised too
+        img = rng.integers(0, 255, (200 + 13 * i, 300 - 7 * i, 3), dtype=np.uint8)
+        path = folder / f"img_{i}.png"
+        cv2.imwrite(str(path), img)
+        paths.append(str(path))
+    return paths
+
+def test_batched_features_match_the_original_code(tmp_path):
+    paths = write_images(tmp_path)
+    expected = np.stack([reference_features(p) for p in paths])
+    assert (IMG_SIZE, N_BINS) == (256, 128)
+
+    single = np.stack([extract_fft_features(p) for p in paths])
+    np.testing.assert_allclose(single, expected, rtol=1e-6, atol=1e-6)
+
+    for workers, chunk_size in ((1, 512), (2, 4)):
+        X, kept = featurize_paths(paths, workers=workers, chunk_size=chunk_size)
+        assert kept.tolist() == list(range(len(paths)))
+        np.testing.assert_allclose(X, expected, rtol=1e-6, atol=1e-6)
+
+def test_unreadable_files_are_skipped(tmp_path):
+    paths = write_images(tmp_path, 3)
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"not an image")
+    X, kept = featurize_paths([paths[0], str(broken), paths[1]], workers=1)
+    assert kept.tolist() == [0, 2]
+    assert X.shape == (2, N_BINS)
+    assert extract_fft_features(str(broken)) is None